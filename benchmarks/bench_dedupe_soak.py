@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+Soak the event dedupe of the orchestrator, publishing millions of events.
+
+The subscribers are stubs, so only the publishing and dedupe is measured. The peak
+resident memory should stay flat once the dedupe window is full, and no event should
+be lost, even with many events created in the same microsecond.
+
+Usage
+-----
+python -m benchmarks.bench_dedupe_soak [events]
+"""
+
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import List
+
+from src.models.literals_types_constants import TopicsLiteral
+from src.models.message_event import MessageEvent
+from src.models.publish_subscribe_class import PublisherSubscriber
+from src.pub_sub_orchestrator import PubSubOrchestrator
+
+EVENTS = 2_000_000
+CHECKPOINTS = 10
+TOPICS: List[TopicsLiteral] = ["print", "record"]
+
+
+class CountingSubscriber(PublisherSubscriber):
+    """Count the events delivered."""
+
+    def __init__(self) -> None:
+        """Construct the subscriber."""
+        self.delivered = 0
+
+    async def listen(self, event: MessageEvent) -> None:  # noqa: U100
+        """
+        Count the event.
+
+        Parameters
+        ----------
+        event : MessageEvent
+            The event.
+        """
+        self.delivered += 1
+
+
+async def soak(events: int) -> None:
+    """
+    Publish the events, printing the throughput and memory at each checkpoint.
+
+    Parameters
+    ----------
+    events : int
+        The amount of events to publish.
+    """
+    orchestrator = PubSubOrchestrator("input.md", "mock", "critical")
+    subscriber = CountingSubscriber()
+    orchestrator.listeners = {topic: [subscriber] for topic in TOPICS}
+
+    print(  # noqa: T201
+        f"{'events':>10} {'events/s':>10} {'window':>8} {'max RSS KiB':>12}"
+    )
+    step = events // CHECKPOINTS
+    started = time.perf_counter()
+    for published in range(1, events + 1):
+        event = MessageEvent("system_message", "bench", "x")
+        await orchestrator.publish(TOPICS, event)
+        if published % 3 == 0:  # Republished, to be deduped
+            await orchestrator.publish(TOPICS, event)
+
+        if published % step == 0:
+            rate = published / (time.perf_counter() - started)
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(  # noqa: T201
+                f"{published:>10} {rate:>10.0f}"
+                f" {len(orchestrator.processed_events):>8} {rss:>12}"
+            )
+
+    lost = events * len(TOPICS) - subscriber.delivered
+    print(f"delivered {subscriber.delivered}, lost or duplicated {lost}")  # noqa: T201
+
+
+def main() -> None:
+    """Run the soak in a temporary directory, where the recorder creates its DB."""
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else EVENTS
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            asyncio.run(soak(events))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the per event cost and memory of `MessageEvent`.
+
+It's compared with the previous layout, a regular dataclass with a `datetime.now()`
+default. The cost of a log call filtered out by the debug level is measured too.
+
+Usage
+-----
+python -m benchmarks.bench_message_event
+"""
+
+import asyncio
+import timeit
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+
+from src.logger import Logger
+from src.models.message_event import MessageEvent
+from src.models.publish_subscribe_class import PublisherSubscriber
+
+NUMBER = 200_000
+
+
+@dataclass
+class LegacyMessageEvent:
+    """
+    The previous layout of `MessageEvent`.
+
+    Parameters
+    ----------
+    event_type : str
+        The type of the event.
+    author : str
+        The author of the event.
+    contents : Any
+        The contents of the event.
+    system_type : Optional[str]
+        The system type of event.
+    created_at : datetime
+        The time the event was created.
+    """
+
+    event_type: str
+    author: Optional[str] = None
+    contents: Any = None
+    system_type: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.now)
+
+
+class Subscriber(PublisherSubscriber):
+    """A subscriber that only logs."""
+
+    async def listen(self, event: MessageEvent) -> None:  # noqa: U100
+        """
+        Do nothing.
+
+        Parameters
+        ----------
+        event : MessageEvent
+            The event.
+        """
+
+
+def bytes_per_event(build: Callable[[], Any]) -> float:
+    """
+    Measure the memory held by each event.
+
+    Parameters
+    ----------
+    build : Callable[[], Any]
+        Build an event.
+
+    Returns
+    -------
+    : float
+        The bytes per event.
+    """
+    tracemalloc.start()
+    events: List[Any] = [build() for _ in range(NUMBER)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del events
+    return current / NUMBER
+
+
+def usecs_per_call(call: Callable[[], Any]) -> float:
+    """
+    Measure the time of a call.
+
+    Parameters
+    ----------
+    call : Callable[[], Any]
+        The call.
+
+    Returns
+    -------
+    : float
+        The microseconds per call.
+    """
+    return min(timeit.repeat(call, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+async def filtered_log_usecs() -> float:
+    """
+    Measure a log call, filtered out by the debug level.
+
+    Returns
+    -------
+    : float
+        The microseconds per call.
+    """
+    subscriber = Subscriber()
+    subscriber.logger = Logger(system_message=print, debug_level="warning")
+    started = asyncio.get_running_loop().time()
+    for _ in range(NUMBER):
+        await subscriber.log("A trace message", "trace")
+    return (asyncio.get_running_loop().time() - started) / NUMBER * 1e6
+
+
+def main() -> None:
+    """Print the per event cost and memory."""
+    builds = {
+        "legacy dataclass": lambda: LegacyMessageEvent("system_message", "a", "x"),
+        "slotted event": lambda: MessageEvent("system_message", "a", "x"),
+    }
+    print(f"{'layout':<18} {'us/event':>9} {'bytes/event':>12}")  # noqa: T201
+    for name, build in builds.items():
+        usecs = usecs_per_call(build)
+        print(f"{name:<18} {usecs:>9.3f} {bytes_per_event(build):>12.0f}")  # noqa: T201
+
+    usecs = usecs_per_call(lambda: MessageEvent("system_message").created_at)
+    print(f"{'lazy created_at':<18} {usecs:>9.3f}")  # noqa: T201
+    usecs = asyncio.run(filtered_log_usecs())
+    print(f"{'filtered log':<18} {usecs:>9.3f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
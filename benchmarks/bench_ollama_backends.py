@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the time to first token and the per token overhead, of each chat backend.
+
+A local stub server mimics the `/api/chat` endpoint of Ollama, streaming a fixed answer
+as fast as it can, so only the client side is measured: the langchain `ChatOllama`
+wrappers against the native pooled client. Each client is measured alone, and through
+`Chatter._scheduled` as in production, with its slot, metrics and interrupt relay.
+
+Usage
+-----
+python -m benchmarks.bench_ollama_backends [turns] [tokens]
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import AsyncIterator, Callable, Dict, List, Tuple
+
+from aiohttp import web
+from langchain_community.chat_models import ChatOllama
+from langchain_core.messages import HumanMessage
+from langchain_core.messages.base import BaseMessage
+
+from src.chatter import Chatter
+from src.logger import Logger
+from src.models.literals_types_constants import TopicsLiteral
+from src.models.message_event import MessageEvent
+
+TURNS = 50
+TOKENS = 500
+PORT = 11535
+
+
+async def no_publish(
+    topics: List[TopicsLiteral], event: MessageEvent  # noqa: U100
+) -> None:
+    """Drop the events of the chatter."""
+
+
+def stub_app(tokens: int) -> web.Application:
+    """
+    Build a stub of the chat endpoint of Ollama.
+
+    Parameters
+    ----------
+    tokens : int
+        The amount of tokens of each answer.
+
+    Returns
+    -------
+    : web.Application
+        The stub.
+    """
+
+    async def chat(request: web.Request) -> web.StreamResponse:
+        await request.read()
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        line = {"model": "stub", "message": {"role": "assistant", "content": "tok "}}
+        chunk = (json.dumps({**line, "done": False}) + "\n").encode()
+        await response.write(chunk * tokens)
+        done = {
+            **line,
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "prompt_eval_count": 10,
+            "prompt_eval_duration": 1_000_000,
+            "eval_count": tokens,
+            "eval_duration": 100_000_000,
+        }
+        await response.write((json.dumps(done) + "\n").encode())
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/api/chat", chat)
+    return app
+
+
+async def measure(
+    stream: Callable[[], AsyncIterator], turns: int
+) -> Tuple[List[float], List[float]]:
+    """
+    Measure the time to first token and the time per token, of each turn.
+
+    Parameters
+    ----------
+    stream : Callable[[], AsyncIterator]
+        Start the stream of an answer.
+    turns : int
+        The amount of turns.
+
+    Returns
+    -------
+    : Tuple[List[float], List[float]]
+        The seconds to the first token, and per token, of each turn.
+    """
+    first_tokens, per_token = [], []
+    for _ in range(turns):
+        started = time.perf_counter()
+        first = 0.0
+        tokens = 0
+        async for _chunk in stream():
+            if tokens == 0:
+                first = time.perf_counter() - started
+            tokens += 1
+        first_tokens.append(first)
+        per_token.append((time.perf_counter() - started - first) / max(tokens - 1, 1))
+    return first_tokens, per_token
+
+
+async def main(turns: int, tokens: int) -> None:
+    """
+    Serve the stub, and print the latencies of each backend.
+
+    Parameters
+    ----------
+    turns : int
+        The amount of turns per backend.
+    tokens : int
+        The amount of tokens of each answer.
+    """
+    runner = web.AppRunner(stub_app(tokens))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{PORT}"
+    from src.libs.ollama_native import OLLAMA  # The client reads OLLAMA_HOST
+
+    messages = [BaseMessage(type="human", content="Hello")]
+    langchain = ChatOllama(model="stub", base_url=f"http://127.0.0.1:{PORT}")
+    chatter = Chatter(no_publish, model="stub")
+    chatter.logger = Logger(system_message=print)
+    backends: Dict[str, Callable[[], AsyncIterator]] = {
+        "langchain": lambda: langchain.astream([HumanMessage(content="Hello")]),
+        "native": lambda: OLLAMA.stream("stub", messages),
+    }
+    for name, stream in list(backends.items()):
+        backends[f"{name} chatter"] = lambda stream=stream: chatter._scheduled(stream())
+
+    print(f"{'backend':<18} {'TTFT p50 ms':>12} {'us/token':>9}")  # noqa: T201
+    for name, stream in backends.items():
+        await measure(stream, 3)  # Warm up the connections
+        first_tokens, per_token = await measure(stream, turns)
+        print(  # noqa: T201
+            f"{name:<18} {statistics.median(first_tokens) * 1000:>12.2f}"
+            f" {statistics.median(per_token) * 1e6:>9.1f}"
+        )
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    asyncio.run(main(*(args + [TURNS, TOKENS][len(args) :])))
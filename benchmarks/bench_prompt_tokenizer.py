@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the prompt enrichment, per prompt cost against prompt size and tag count.
+
+The prompts go through `Enricher.enrich`, with stub tag handlers registered, so only
+the scanning, dispatching to the thread pool and joining is measured.
+
+Usage
+-----
+python -m benchmarks.bench_prompt_tokenizer
+"""
+
+import asyncio
+import time
+from typing import Dict
+
+from src.libs.enricher import Enricher
+from src.libs.prompt_tokenizer import TagHandler, TagNode
+from src.models.literals_types_constants import TagKindsLiteral
+
+TAGS = [
+    "<-- include: file://~/notes.txt -->",
+    "<-- include: https://www.example.com -->",
+    "<-- search: python llm library -->",
+    "<-- ask: a question -->",
+    "<-- run: `ls -la` -->",
+    "<!-- a comment -->",
+]
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+TAG_COUNTS = [0, 6, 60, 600]
+
+
+def _stub(node: TagNode) -> str:
+    """
+    Render a tag without doing any I/O.
+
+    Parameters
+    ----------
+    node : TagNode
+        The tag to render.
+
+    Returns
+    -------
+    : str
+        The stubbed block.
+    """
+    return f"{node.padding}**{node.argument}**:\n\n{node.padding}```\n{node.padding}```"
+
+
+HANDLERS: Dict[TagKindsLiteral, TagHandler] = {
+    "ask": _stub,
+    "include-file": _stub,
+    "include-http": _stub,
+    "run": _stub,
+    "search": _stub,
+}
+
+
+def build_prompt(size: int, tags: int) -> str:
+    """
+    Build a prompt of about `size` characters, with `tags` tags spread on it.
+
+    Parameters
+    ----------
+    size : int
+        The approximate amount of characters.
+    tags : int
+        The amount of tags.
+
+    Returns
+    -------
+    : str
+        The prompt.
+    """
+    line = "Some free text of the prompt, with a few words on each line.\n"
+    lines = [line] * max(size // len(line), 1)
+    step = max(len(lines) // (tags + 1), 1)
+    for i in range(tags):
+        lines.insert((i + 1) * step, TAGS[i % len(TAGS)] + "\n")
+    return "".join(lines)
+
+
+async def main() -> None:
+    """Print the per prompt cost, in microseconds."""
+    enricher = Enricher(HANDLERS)
+    print(f"{'size':>10} {'tags':>6} {'us/prompt':>12}")  # noqa: T201
+    for size in SIZES:
+        for tags in TAG_COUNTS:
+            prompt = build_prompt(size, tags)
+            number = max(10_000_000 // (size * 10), 3)
+            started = time.perf_counter()
+            for _ in range(number):
+                await enricher.enrich(prompt)
+            usecs = (time.perf_counter() - started) / number * 1e6
+            print(f"{size:>10} {tags:>6} {usecs:>12.1f}")  # noqa: T201
+    enricher.executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
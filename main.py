@@ -3,12 +3,31 @@
 """The CLI runner for ollama watch dog with a tail."""
 
 import asyncio
+import os
+from typing import Optional, cast, get_args
 
 import click
 from twisted.internet import asyncioreactor
 
-from src.models.literals_types_constants import EventsErrorTypes
+from src.libs.journal import Journal
+from src.libs.metrics_server import dump_metrics_periodically, listen_metrics
+from src.libs.model_warmer import ModelWarmer
+from src.libs.response_cache import open_response_cache
+from src.libs.tracing import Tracer
+from src.models.literals_types_constants import (
+    PROMPT_QUEUE_POLICY,
+    PROMPT_QUEUE_SIZE,
+    WARM_KEEP_ALIVE,
+    WATCHER_QUIET_WINDOW,
+    EventBusModesLiteral,
+    EventsErrorTypes,
+    IngestModesLiteral,
+    LlmBackendsLiteral,
+    QueuePoliciesLiteral,
+    WatcherBackendsLiteral,
+)
 from src.pub_sub_orchestrator import PubSubOrchestrator
+from src.session_manager import SessionManager
 
 asyncioreactor.install(asyncio.get_event_loop())
 
@@ -16,10 +35,128 @@ from twisted.internet import reactor  # noqa: E402
 
 
 @click.command()
-@click.argument("prompt_file", default="input.md", type=click.Path(exists=True))
+@click.argument("prompt_file", default="input.md")
 @click.option("--model", default="mock", help="Model to use.")
+@click.option(
+    "--backend",
+    default="langchain",
+    type=click.Choice(get_args(LlmBackendsLiteral)),
+    help="Chat with Ollama through langchain, or directly with a pooled client.",
+)
+@click.option(
+    "--warm/--no-warm",
+    default=False,
+    help="Load the model at startup, and keep it loaded while chatting.",
+)
+@click.option(
+    "--keep-alive",
+    default=None,
+    type=float,
+    help=f"Seconds Ollama keeps the model loaded, {WARM_KEEP_ALIVE:.0f} with --warm.",
+)
+@click.option(
+    "--reuse-context/--no-reuse-context",
+    default=False,
+    help="Send only the new prompt, with the context Ollama returned last turn.",
+)
+@click.option(
+    "--response-cache",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Replay the answers of the turns asked before, cached in this SQLite file.",
+)
 @click.option("--error-level", default="warning", help="choose a debug level")
-def run(prompt_file: str, model: str, error_level: EventsErrorTypes) -> None:
+@click.option(
+    "--debounce",
+    default=WATCHER_QUIET_WINDOW,
+    help="Seconds without changes to wait, before reading the prompt file.",
+)
+@click.option(
+    "--watcher",
+    default="auto",
+    type=click.Choice(get_args(WatcherBackendsLiteral)),
+    help="How to watch the prompt file, auto uses inotify on Linux.",
+)
+@click.option(
+    "--ingest",
+    default="whole",
+    type=click.Choice(get_args(IngestModesLiteral)),
+    help="Send the whole prompt file, or only the text appended to it.",
+)
+@click.option(
+    "--queue-size",
+    default=PROMPT_QUEUE_SIZE,
+    type=click.IntRange(min=1),
+    help="Maximum prompts waiting for the current turn to finish.",
+)
+@click.option(
+    "--queue-policy",
+    default=PROMPT_QUEUE_POLICY,
+    type=click.Choice(get_args(QueuePoliciesLiteral)),
+    help="When the queue is full: drop the oldest, merge into the newest, or reject.",
+)
+@click.option(
+    "--interrupt/--no-interrupt",
+    default=True,
+    help="Cancel the answer being streamed when a new prompt is saved.",
+)
+@click.option(
+    "--bus",
+    default="inline",
+    type=click.Choice(get_args(EventBusModesLiteral)),
+    help="Await each subscriber, or queue the events to each subscriber's workers.",
+)
+@click.option(
+    "--journal",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Append the published events to this journal, to replay them.",
+)
+@click.option(
+    "--trace",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Write the spans of each turn to this Chrome trace file.",
+)
+@click.option(
+    "--session",
+    default=None,
+    help="The session to record the conversation in, for a single prompt file.",
+)
+@click.option(
+    "--metrics-port",
+    default=None,
+    type=click.IntRange(min=1, max=65535),
+    help="Serve the metrics on this local port, at /metrics and /metrics.json.",
+)
+@click.option(
+    "--metrics-dump",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Dump the metrics as JSON to this file, periodically.",
+)
+def run(
+    prompt_file: str,
+    model: str,
+    backend: LlmBackendsLiteral,
+    warm: bool,
+    keep_alive: Optional[float],
+    reuse_context: bool,
+    response_cache: Optional[str],
+    error_level: EventsErrorTypes,
+    debounce: float,
+    watcher: WatcherBackendsLiteral,
+    ingest: IngestModesLiteral,
+    queue_size: int,
+    queue_policy: QueuePoliciesLiteral,
+    interrupt: bool,
+    bus: EventBusModesLiteral,
+    journal: Optional[str],
+    trace: Optional[str],
+    session: Optional[str],
+    metrics_port: Optional[int],
+    metrics_dump: Optional[str],
+) -> None:
     """
     Ollama Watch-Dog With a Tail, is an utility to create a chat-bot CLI with Ollama.
 
@@ -47,27 +184,153 @@ def run(prompt_file: str, model: str, error_level: EventsErrorTypes) -> None:
 
     <-- run: `ls *` : Includes execution and results of the bash command.
 
+    <-- run: `ls *` idempotent --> : Same, but the results are cached for a while.
+
     <!-- I'll be ommited --> : Be aware that comments are NOT send to the prompt.
 
+    Warm up
+    -------
+    With `--warm`, the model is loaded at startup, so the first turn is as fast as the
+    next ones, and it's kept loaded while a prompt was asked in the last hour.
+
+    Context reuse
+    -------------
+    With `--reuse-context`, each turn sends only the new prompt along with the context
+    Ollama returned with the last answer, through the native client. The whole
+    history is sent again when it doesn't follow the last answer, like after a
+    summary or a cancelled answer.
+
+    Response cache
+    --------------
+    With `--response-cache`, the answer of a turn is stored in a SQLite file, by the
+    model, its options and the messages asked. The same turn asked again, by this or
+    another process sharing the file, replays the stored answer instead of generating
+    it.
+
+    Metrics
+    -------
+    The latency of each stage (debounce, enrichment per tag, DB writes, time to first
+    token, token rate, rendering, summarization), the events per topic, the cache hits
+    and the queue depths are served in the Prometheus text format with
+    `--metrics-port`, or dumped as JSON with `--metrics-dump`.
+
+    With `--trace`, each turn is written as a waterfall of the subscribers handling
+    its events, to open in `chrome://tracing` or https://ui.perfetto.dev.
+
+    Multiple sessions
+    -----------------
+    When the prompt file is a directory, or a glob, each matching prompt file has its
+    own session and history, and its answers are written next to it, to
+    "<prompt file>.out". New prompt files are picked up while running.
 
     Usage
     -----
     ollama-dog "prompt.md" "conversation.md" --model="codebooga:34b-v0.1-q5_0"
 
+    ollama-dog "prompts/" --model="codebooga:34b-v0.1-q5_0"
+
     Parameters
     ----------
     prompt_file : str
-        The file to watch for prompts.
+        The file to watch for prompts, or a directory or glob of them.
     model : str
         The model to use.
+    backend : LlmBackendsLiteral
+        Whether to chat with Ollama through langchain, or directly.
+    warm : bool
+        Whether to load the model at startup, and keep it loaded while chatting.
+    keep_alive : Optional[float]
+        The seconds Ollama keeps the model loaded, negative for ever.
+    reuse_context : bool
+        Whether to send only the new prompt, with the context of the last answer.
+    response_cache : Optional[str]
+        The SQLite file to cache the answers of the turns in.
     error_level : EventsErrorTypes
         The debug level to use.
+    debounce : float
+        The seconds without changes to wait, before reading the prompt file.
+    watcher : WatcherBackendsLiteral
+        How to watch the prompt file.
+    ingest : IngestModesLiteral
+        Whether to send the whole prompt file, or only the text appended to it.
+    queue_size : int
+        The maximum amount of prompts waiting for the current turn.
+    queue_policy : QueuePoliciesLiteral
+        What to do with a new prompt when the queue is full.
+    interrupt : bool
+        Whether a new prompt cancels the answer being streamed.
+    bus : EventBusModesLiteral
+        Whether to await the subscribers, or queue the events to them.
+    journal : Optional[str]
+        The journal file to append the published events to.
+    trace : Optional[str]
+        The Chrome trace file to write the spans of each turn to.
+    session : Optional[str]
+        The session to record the conversation in, for a single prompt file.
+    metrics_port : Optional[int]
+        The local port to serve the metrics on.
+    metrics_dump : Optional[str]
+        The JSON file to dump the metrics to, periodically.
     """
-    orchestrator = PubSubOrchestrator(
-        prompt_file=prompt_file, model=model, debug_level=error_level
+    multiple = not os.path.isfile(prompt_file) and bool(
+        os.path.isdir(prompt_file) or set("*?[") & set(prompt_file)
     )
+    if session is not None and multiple:
+        raise click.BadParameter(
+            "a directory or glob has a session per prompt file, named after it.",
+            param_hint="--session",
+        )
+    if warm and keep_alive is None:
+        keep_alive = WARM_KEEP_ALIVE
+    responses = open_response_cache(response_cache) if response_cache else None
+    session_options = {
+        "debounce": debounce,
+        "watcher_backend": watcher,
+        "ingest": ingest,
+        "queue_size": queue_size,
+        "queue_policy": queue_policy,
+        "interrupt": interrupt,
+        "bus": bus,
+        "journal": Journal(journal) if journal else None,
+        "backend": backend,
+        "keep_alive": keep_alive,
+        "reuse_context": reuse_context,
+        "tracer": Tracer(trace) if trace else None,
+        "response_cache": responses,
+    }
+    runner: PubSubOrchestrator | SessionManager
+    if os.path.isfile(prompt_file):
+        runner = PubSubOrchestrator(
+            prompt_file=prompt_file,
+            model=model,
+            debug_level=error_level,
+            session_id=session,
+            **session_options,
+        )
+    elif multiple:
+        runner = SessionManager(
+            prompt_file, model=model, debug_level=error_level, **session_options
+        )
+    else:
+        raise click.BadParameter(
+            f'"{prompt_file}" is not a file, a directory or a glob.',
+            param_hint="PROMPT_FILE",
+        )
+    asyncio.ensure_future(runner.start())
+
+    if warm and model != "mock":
+        warmer = ModelWarmer([model], cast(float, keep_alive), logger=runner.logger)
+        asyncio.ensure_future(warmer.run())
+    if metrics_port is not None:
+        listen_metrics(metrics_port)
+    if metrics_dump is not None:
+        asyncio.ensure_future(dump_metrics_periodically(metrics_dump))
 
-    asyncio.ensure_future(orchestrator.start())
+    for closeable in ("journal", "tracer"):
+        if session_options[closeable] is not None:
+            reactor.addSystemEventTrigger(  # type: ignore
+                "before", "shutdown", session_options[closeable].close
+            )
     reactor.run()  # type: ignore
 
 
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+"""Replay a journal of ollama watch dog, to restore a session or to benchmark."""
+
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import List, Optional
+
+import click
+
+from src.libs.journal import (
+    Journal,
+    JournalRecord,
+    decode_event,
+    interrupted_turn,
+    read_journal,
+)
+from src.models.literals_types_constants import EventsErrorTypes
+from src.pub_sub_orchestrator import PubSubOrchestrator
+
+
+@click.group()
+def cli() -> None:
+    """Replay a journal written with `main.py --journal`."""
+
+
+async def _restore(
+    journal: str,
+    prompt_file: str,
+    session_id: str,
+    model: str,
+    error_level: EventsErrorTypes,
+) -> None:
+    """
+    Publish again the events of a session that a crash interrupted.
+
+    Parameters
+    ----------
+    journal : str
+        The journal file, the restored events are appended to it.
+    prompt_file : str
+        The prompt file of the session.
+    session_id : str
+        The session to restore.
+    model : str
+        The model to use.
+    error_level : EventsErrorTypes
+        The debug level to use.
+    """
+    pending = interrupted_turn(list(read_journal(journal)), session_id)
+    orchestrator = PubSubOrchestrator(
+        prompt_file, model, error_level, session_id=session_id, journal=Journal(journal)
+    )
+    if not pending:
+        await orchestrator.logger.log(f'Session "{session_id}" is complete', "info")
+
+    for record in pending:
+        topic = "summarize" if record["event_type"] == "chat_summary" else "chain"
+        await orchestrator.logger.log(
+            f'Restoring the "{record["event_type"]}" of {record["event_id"]}', "info"
+        )
+        await orchestrator.logger.block(True)
+        await orchestrator.publish([topic], decode_event(record))
+        await orchestrator.logger.wait_unblocked()
+    orchestrator.journal.close()  # type: ignore
+
+
+@cli.command()
+@click.argument("journal", type=click.Path(exists=True, dir_okay=False))
+@click.argument("prompt_file", default="input.md")
+@click.option("--session", default=None, help="The session, the last one by default.")
+@click.option("--model", default="mock", help="Model to use.")
+@click.option("--error-level", default="info", help="choose a debug level")
+def restore(
+    journal: str,
+    prompt_file: str,
+    session: Optional[str],
+    model: str,
+    error_level: EventsErrorTypes,
+) -> None:
+    """
+    Finish the turn of a session that a crash interrupted.
+
+    The prompt without a recorded answer is chained and asked again, and a summary
+    that wasn't recorded is asked again. Run it from the directory of the session's
+    `sqlite.db`, before starting `main.py` with the same `--session`.
+
+    \f
+    Parameters
+    ----------
+    journal : str
+        The journal file.
+    prompt_file : str
+        The prompt file of the session.
+    session : Optional[str]
+        The session to restore, the last one journaled by default.
+    model : str
+        The model to use.
+    error_level : EventsErrorTypes
+        The debug level to use.
+    """
+    records = list(read_journal(journal))
+    if not records:
+        raise click.ClickException(f'"{journal}" has no events.')
+    session_id = session or records[-1]["session"]
+    asyncio.run(_restore(journal, prompt_file, session_id, model, error_level))
+
+
+async def _bench(prompts: List[JournalRecord], speed: float, delay: float) -> None:
+    """
+    Re-drive the prompts through a new session, printing the latency of each turn.
+
+    Parameters
+    ----------
+    prompts : List[JournalRecord]
+        The journaled prompts.
+    speed : float
+        How much faster than recorded the prompts arrive, 0 for back to back.
+    delay : float
+        The seconds between the tokens of the mock model.
+    """
+    orchestrator = PubSubOrchestrator("input.md", "mock", "critical", output=os.devnull)
+    orchestrator.chatter.mock_delay = delay
+
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for record in prompts:
+        arrival = 0.0
+        if speed > 0:
+            arrival = (record["ts"] - prompts[0]["ts"]) / speed
+            await asyncio.sleep(max(0.0, arrival - (time.perf_counter() - started)))
+        else:
+            arrival = time.perf_counter() - started
+
+        await orchestrator.logger.block(True)
+        await orchestrator.publish(["record"], decode_event(record))
+        await orchestrator.logger.wait_unblocked()
+        latencies.append(time.perf_counter() - started - arrival)
+
+    elapsed = time.perf_counter() - started
+    quantiles = statistics.quantiles(latencies, n=20) if len(latencies) > 1 else []
+    print(f"turns       {len(latencies)}")  # noqa: T201
+    print(f"turns/s     {len(latencies) / elapsed:.1f}")  # noqa: T201
+    print(f"p50 latency {statistics.median(latencies) * 1000:.1f} ms")  # noqa: T201
+    if quantiles:
+        print(f"p95 latency {quantiles[18] * 1000:.1f} ms")  # noqa: T201
+
+
+@cli.command()
+@click.argument("journal", type=click.Path(exists=True, dir_okay=False))
+@click.option("--session", default=None, help="Only the prompts of this session.")
+@click.option(
+    "--speed",
+    default=0.0,
+    help="How much faster than recorded the prompts arrive, 0 for back to back.",
+)
+@click.option("--delay", default=0.0, help="Seconds between the mock model tokens.")
+def bench(journal: str, session: Optional[str], speed: float, delay: float) -> None:
+    """
+    Re-drive the journaled prompts through the pipeline, against the mock model.
+
+    \f
+    Parameters
+    ----------
+    journal : str
+        The journal file.
+    session : Optional[str]
+        Only replay the prompts of this session.
+    speed : float
+        How much faster than recorded the prompts arrive, 0 for back to back.
+    delay : float
+        The seconds between the tokens of the mock model.
+    """
+    prompts = [
+        record
+        for record in read_journal(journal)
+        if record["event_type"] == "human_raw_message"
+        and "record" in record["topics"]
+        and session in (None, record["session"])
+    ]
+    if not prompts:
+        raise click.ClickException(f'"{journal}" has no prompts.')
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)  # Where the recorder creates its DB
+        try:
+            asyncio.run(_bench(prompts, speed, delay))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    cli()
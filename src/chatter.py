@@ -2,13 +2,26 @@
 
 
 import asyncio
-from typing import AsyncIterator, List, Union, cast
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Union, cast
 
 from langchain_community.chat_models import ChatOllama
 from langchain_core.messages import HumanMessage
 from langchain_core.messages.ai import AIMessage
 from langchain_core.messages.base import BaseMessage, BaseMessageChunk
 
+from src.libs.fair_scheduler import LLM_SCHEDULER
+from src.libs.metrics import METRICS
+from src.libs.ollama_native import OLLAMA, OllamaContext
+from src.libs.response_cache import replay, response_key
+from src.libs.ttl_cache import TTLCache
+from src.models.literals_types_constants import (
+    MOCK_TOKEN_DELAY,
+    RESPONSE_CACHE_OPTIONS,
+    STREAM_TRUNCATED_MARKER,
+    TOKEN_RATE_BUCKETS,
+    LlmBackendsLiteral,
+)
 from src.models.message_event import MessageEvent
 from src.models.publish_subscribe_class import PublisherCallback, PublisherSubscriber
 
@@ -20,6 +33,12 @@ class Chatter(PublisherSubscriber):
         self,
         publish: PublisherCallback,
         model: str = "mock",
+        session_id: str = "",
+        backend: LlmBackendsLiteral = "langchain",
+        keep_alive: Optional[float] = None,
+        reuse_context: bool = False,
+        response_cache: Optional[TTLCache[str]] = None,
+        interrupt: bool = True,
     ) -> None:
         """
         Construct the LLM chat with SQLite.
@@ -30,9 +49,32 @@ class Chatter(PublisherSubscriber):
             The model to use for the LLM.
         publish : PublisherCallback
             publish a new event to parent
+        session_id : str
+            The session chatting, to schedule it fairly with the other sessions.
+        backend : LlmBackendsLiteral
+            Whether to stream through langchain, or directly from Ollama.
+        keep_alive : Optional[float]
+            The seconds Ollama keeps the model loaded after a request, its default if
+            None.
+        reuse_context : bool
+            Whether to send only the new prompt, with the context Ollama returned
+            with the last answer, instead of the whole history.
+        response_cache : Optional[TTLCache[str]]
+            The answers of the turns asked before, replayed instead of asking again.
+        interrupt : bool
+            Whether the answer being streamed can be cancelled, by a new prompt.
         """
         self.model = model
-        self.llm = ChatOllama(model=model)
+        self.session_id = session_id
+        self.backend = backend
+        self.mock_delay = MOCK_TOKEN_DELAY
+        self.cancelled = 0
+        self.keep_alive = keep_alive
+        self.reuse_context = reuse_context
+        self.context = OllamaContext()
+        self.response_cache = response_cache
+        self.interrupt = interrupt
+        self.llm = ChatOllama(model=model, keep_alive=keep_alive)
         self.publish = publish  # type: ignore[reportAttributeAccessIssue]
 
     async def _mock_astream(self) -> AsyncIterator[BaseMessageChunk]:
@@ -44,13 +86,217 @@ class Chatter(PublisherSubscriber):
         AsyncIterator[BaseMessageChunk]
             An asynchronous iterator of BaseMessageChunk objects.
         """
-        await asyncio.sleep(0.3)
+        await asyncio.sleep(self.mock_delay)
         yield BaseMessageChunk(type="ai", content="hola ")
-        await asyncio.sleep(0.3)
+        await asyncio.sleep(self.mock_delay)
         yield BaseMessageChunk(type="ai", content="mundo")
-        await asyncio.sleep(0.3)
+        await asyncio.sleep(self.mock_delay)
         yield BaseMessageChunk(type="ai", content=".")
 
+    def cancel_stream(self) -> bool:
+        """
+        Cancel the answer of the turn in flight, streaming or not asked yet.
+
+        Returns
+        -------
+        : bool
+            Whether there was a turn to cancel.
+        """
+        return self.cancel_turn()
+
+    async def _cancelled(
+        self, stream: AsyncIterator[BaseMessageChunk]
+    ) -> BaseMessageChunk:
+        """
+        Close a cancelled stream, and count it.
+
+        Parameters
+        ----------
+        stream : AsyncIterator[BaseMessageChunk]
+            The stream of the answer.
+
+        Returns
+        -------
+        : BaseMessageChunk
+            The marker of the truncation.
+        """
+        await stream.aclose()  # type: ignore
+        self.cancelled += 1
+        METRICS.inc("llm_streams_cancelled_total", model=self.model)
+        await self.log("Cancelled the answer, the prompt changed", "info")
+        return BaseMessageChunk(type="ai", content=STREAM_TRUNCATED_MARKER)
+
+    async def _until_interrupted(
+        self, stream: AsyncIterator[BaseMessageChunk], interrupt: asyncio.Event
+    ) -> AsyncIterator[BaseMessageChunk]:
+        """
+        Relay a stream until it's interrupted, then close it.
+
+        The stream is read by a single task, into a queue, yielding to the relay after
+        each chunk. On an interrupt the task is cancelled, which closes the HTTP request
+        to Ollama, so the server stops generating, and a marker of the truncation is
+        yielded after the chunks read. An answer cancelled before it's streamed isn't
+        asked at all.
+
+        Parameters
+        ----------
+        stream : AsyncIterator[BaseMessageChunk]
+            The stream of the answer.
+        interrupt : asyncio.Event
+            Set to cancel the stream.
+
+        Yields
+        ------
+        AsyncIterator[BaseMessageChunk]
+            The chunks of the answer.
+        """
+        if interrupt.is_set():
+            yield await self._cancelled(stream)
+            return
+
+        chunks: asyncio.Queue[Optional[BaseMessageChunk]] = asyncio.Queue()
+
+        async def read() -> None:
+            async for chunk in stream:
+                chunks.put_nowait(chunk)
+                await asyncio.sleep(0)  # Relay it, even when the next one is buffered
+
+        reading = asyncio.ensure_future(read())
+        reading.add_done_callback(lambda _: chunks.put_nowait(None))
+        interrupted = asyncio.ensure_future(interrupt.wait())
+        interrupted.add_done_callback(lambda _: reading.cancel())
+        try:
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+            if not reading.cancelled():
+                reading.result()  # Raise the error of the stream, if any
+                return
+
+            yield await self._cancelled(stream)
+        finally:
+            interrupted.cancel()
+            reading.cancel()
+
+    async def _scheduled(
+        self,
+        stream: AsyncIterator[BaseMessageChunk],
+        timings: Optional[Dict[str, float]] = None,
+        cache_key: Optional[str] = None,
+        interrupt: Optional[asyncio.Event] = None,
+    ) -> AsyncIterator[BaseMessageChunk]:
+        """
+        Hold a slot of the LLM backend while the stream is consumed.
+
+        The wait for the slot, the time to the first token, and the token rate are
+        observed. When interruptible, the wait for the slot and the stream stop early
+        once the turn is cancelled, otherwise the complete answer is stored in the
+        response cache.
+
+        Parameters
+        ----------
+        stream : AsyncIterator[BaseMessageChunk]
+            The stream of the answer.
+        timings : Optional[Dict[str, float]]
+            The timings Ollama reports, filled once the stream is complete.
+        cache_key : Optional[str]
+            The key of the turn in the response cache, if the answer is cached.
+        interrupt : Optional[asyncio.Event]
+            The cancel flag of the turn, the one of the turn in flight if None.
+
+        Yields
+        ------
+        AsyncIterator[BaseMessageChunk]
+            The chunks of the answer.
+        """
+        requested = time.perf_counter()
+        if interrupt is None:
+            interrupt = self.turn_cancel()
+        cancel = interrupt if self.interrupt else None
+        # Without the slot once cancelled, then the stream is closed unread
+        async with LLM_SCHEDULER.slot(self.session_id, cancel):
+            started = time.perf_counter()
+            METRICS.observe("llm_slot_wait_seconds", started - requested)
+            tokens = 0
+            answer: List[str] = []
+            if self.interrupt:
+                stream = self._until_interrupted(stream, interrupt)
+            async for chunk in stream:
+                if tokens == 0:
+                    METRICS.observe(
+                        "llm_first_token_seconds",
+                        time.perf_counter() - started,
+                        model=self.model,
+                    )
+                tokens += 1
+                answer.append(cast(str, chunk.content))
+                yield chunk
+
+            elapsed = time.perf_counter() - started
+            METRICS.inc("llm_tokens_total", tokens, model=self.model)
+            METRICS.observe("llm_stream_seconds", elapsed, model=self.model)
+            if tokens and elapsed > 0:
+                METRICS.observe(
+                    "llm_tokens_per_second",
+                    tokens / elapsed,
+                    buckets=TOKEN_RATE_BUCKETS,
+                    model=self.model,
+                )
+            if timings and self.logger.is_enabled("trace"):
+                await self.log(
+                    f"Ollama evaluated {timings['prompt_eval_count']:.0f} prompt tokens"
+                    f" in {timings['prompt_eval_duration']:.2f}s, and generated"
+                    f" {timings['eval_count']:.0f} tokens in"
+                    f" {timings['eval_duration']:.2f}s"
+                    + (", reusing the context" if timings.get("reused_context") else "")
+                )
+
+        if cache_key is not None and answer and not interrupt.is_set():
+            cache = cast(TTLCache[str], self.response_cache)
+            await asyncio.get_running_loop().run_in_executor(
+                None, cache.put, cache_key, "".join(answer)
+            )
+
+    def _options(self) -> Dict[str, Any]:
+        """
+        Get the options of the model that change its answers, the ones set.
+
+        Returns
+        -------
+        : Dict[str, Any]
+            The options, by name.
+        """
+        options = {name: getattr(self.llm, name) for name in RESPONSE_CACHE_OPTIONS}
+        return {name: value for name, value in options.items() if value is not None}
+
+    async def _cached_answer(self, cache_key: str) -> Optional[str]:
+        """
+        Get the answer of a turn asked before, counting the hits and misses.
+
+        Parameters
+        ----------
+        cache_key : str
+            The key of the turn.
+
+        Returns
+        -------
+        : Optional[str]
+            The cached answer, or None on a miss.
+        """
+        cache = cast(TTLCache[str], self.response_cache)
+        answer = await asyncio.get_running_loop().run_in_executor(
+            None, cache.get, cache_key
+        )
+        outcome = "misses" if answer is None else "hits"
+        METRICS.inc(f"llm_response_cache_{outcome}_total", model=self.model)
+        if self.logger.is_enabled("info"):
+            rate = cache.hits / (cache.hits + cache.misses)
+            await self.log(
+                f"Response cache: {cache.hits} hits, {cache.misses} misses"
+                f" ({rate:.0%} hit rate)",
+                "info",
+            )
+        return answer
+
     def _convert_base_message(
         self, messages: List[BaseMessage]
     ) -> List[Union[HumanMessage, AIMessage]]:
@@ -86,6 +332,11 @@ class Chatter(PublisherSubscriber):
         event : MessageEvent
             The event to process.
         """
+        if event.event_type == "cancel_stream":
+            if not self.cancel_stream():
+                await self.log("No turn is in flight, nothing to cancel")
+            return
+
         if not isinstance(event.contents, list) or not isinstance(
             event.contents[0], BaseMessage
         ):
@@ -94,17 +345,44 @@ class Chatter(PublisherSubscriber):
             await self.log(msg, "error")
             return
 
-        await self.log(f'Chatting with "{self.model}"')
+        if self.logger.is_enabled("trace"):
+            await self.log(f'Chatting with "{self.model}"')
+        timings: Dict[str, float] = {}
+        messages = cast(List[BaseMessage], event.contents)
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = response_key(self.model, self._options(), messages)
+            answer = await self._cached_answer(cache_key)
+            if answer is not None:
+                await self.log('Replaying the cached answer, as the "print" event')
+                await self.publish(
+                    ["print"],
+                    MessageEvent("ai_message", self.model, contents=replay(answer)),
+                )
+                return
+
         if self.model == "mock":
             stream = self._mock_astream()
-        else:
+        elif self.reuse_context:
             await self.log(event.contents, "debug")
-            stream = self.llm.astream(
-                self._convert_base_message(cast(List[BaseMessage], event.contents))
+            stream = OLLAMA.generate(
+                self.model, messages, self.context, timings, self.keep_alive
             )
+        elif self.backend == "native":
+            await self.log(event.contents, "debug")
+            stream = OLLAMA.stream(self.model, messages, timings, self.keep_alive)
+        else:
+            await self.log(event.contents, "debug")
+            stream = self.llm.astream(self._convert_base_message(messages))
 
         await self.log('Streaming the "print" event')
         await self.publish(
             ["print"],
-            MessageEvent("ai_message", self.model, contents=stream),
+            MessageEvent(
+                "ai_message",
+                self.model,
+                contents=self._scheduled(
+                    stream, timings, cache_key, self.turn_cancel()
+                ),
+            ),
         )
@@ -0,0 +1,157 @@
+"""
+Read only the region appended to a file since the last read.
+
+For a prompt file that grows along the conversation, this avoids reading and copying
+the whole file on every save. Only a byte offset and the digest of a small window of
+bytes before it are kept, so the memory used doesn't grow with the file. When the
+window changed, or the file shrank, the file was rewritten and is read from the start.
+Large files are read through mmap.
+"""
+
+import codecs
+import hashlib
+import mmap
+import os
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from src.models.literals_types_constants import APPEND_CHECK_WINDOW, MMAP_THRESHOLD
+
+
+def content_digest(content: bytes) -> bytes:
+    """
+    Hash some content, to detect duplicates without keeping a copy of it.
+
+    Parameters
+    ----------
+    content : bytes
+        The content to hash.
+
+    Returns
+    -------
+    : bytes
+        The digest.
+    """
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+@dataclass
+class AppendedRegion:
+    """
+    A region appended to a file, not yet committed.
+
+    Parameters
+    ----------
+    text : str
+        The decoded text of the region.
+    end : int
+        The offset up to which the file was decoded.
+    tail : bytes
+        The digest of the window of bytes before the end.
+    rewritten : bool
+        Whether the file was rewritten, and read from the start.
+    """
+
+    text: str
+    end: int
+    tail: bytes
+    rewritten: bool = False
+
+
+class AppendReader(object):
+    """Read only the region appended to a file since the last read."""
+
+    def __init__(
+        self,
+        filename: str,
+        window: int = APPEND_CHECK_WINDOW,
+        mmap_threshold: int = MMAP_THRESHOLD,
+    ) -> None:
+        """
+        Construct the reader.
+
+        Parameters
+        ----------
+        filename : str
+            The file to read.
+        window : int
+            The bytes before the offset that are checked, to detect a rewrite.
+        mmap_threshold : int
+            The file size from which the file is read through mmap.
+        """
+        self.filename = filename
+        self.window = window
+        self.mmap_threshold = mmap_threshold
+        self.offset = 0
+        self._tail = content_digest(b"")
+
+    def _region(self, file: BinaryIO, size: int, start: int, end: int) -> bytes:
+        """
+        Read a region of the file.
+
+        Parameters
+        ----------
+        file : BinaryIO
+            The opened file.
+        size : int
+            The size of the file.
+        start : int
+            The start offset of the region.
+        end : int
+            The end offset of the region.
+
+        Returns
+        -------
+        : bytes
+            The bytes of the region.
+        """
+        if size >= self.mmap_threshold:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                return view[start:end]
+        file.seek(start)
+        return file.read(end - start)
+
+    def read(self) -> Optional[AppendedRegion]:
+        """
+        Read the region appended since the last commit.
+
+        Returns
+        -------
+        : Optional[AppendedRegion]
+            The appended region, or None if nothing was appended.
+        """
+        with open(self.filename, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            start = self.offset
+            rewritten = size < start or (
+                content_digest(
+                    self._region(file, size, max(0, start - self.window), start)
+                )
+                != self._tail
+            )
+            if rewritten:
+                start = 0
+            if size == start:
+                return None
+            data = self._region(file, size, start, size)
+
+            # Leave an incomplete trailing character for the next read
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            text = decoder.decode(data)
+            end = size - len(decoder.getstate()[0])
+            tail = content_digest(
+                self._region(file, size, max(0, end - self.window), end)
+            )
+        return AppendedRegion(text, end, tail, rewritten)
+
+    def commit(self, region: AppendedRegion) -> None:
+        """
+        Move the offset past a read region.
+
+        Parameters
+        ----------
+        region : AppendedRegion
+            The region read.
+        """
+        self.offset = region.end
+        self._tail = region.tail
@@ -1,23 +1,133 @@
-"""Searches for a string on the web with search-web."""
+"""
+Asks a question to a web LLM, like perplexity.
 
+A single async client, with pooled keep-alive connections, is shared by all the
+prompts. The questions are sent concurrently up to a limit, and the answers are
+cached for a while, so saving a prompt again doesn't repeat paid and slow calls.
 
+Environment
+-----------
+LLM_API_KEY : The API key of the web LLM.
+LLM_BASE_URL : An OpenAI compatible endpoint, perplexity by default.
+LLM_MODEL : The model to ask, "pplx-70b-online" by default.
+"""
+
+
+import asyncio
 import os
-import re
-from typing import cast
+from typing import Optional, cast
+
+import httpx
+from openai import AsyncOpenAI
+
+from src.libs.prompt_tokenizer import TagNode
+from src.libs.ttl_cache import TTLCache
+from src.models.literals_types_constants import (
+    ASK_CACHE_ENTRIES,
+    ASK_CACHE_TTL,
+    ASK_CONCURRENCY,
+)
+
+SYSTEM_PROMPT = (
+    "You are an artificial intelligence assistant"
+    "and you need to engage in a precise, concise, "
+    "focused conversation with another artificial "
+    "intelligence assistant."
+)
+
+
+class WebLlm(object):
+    """A long lived, pooled and cached client of a web LLM."""
 
-from openai import OpenAI
+    def __init__(
+        self,
+        concurrency: int = ASK_CONCURRENCY,
+        cache_ttl: float = ASK_CACHE_TTL,
+        cache_entries: int = ASK_CACHE_ENTRIES,
+    ) -> None:
+        """
+        Construct the web LLM client.
 
+        Parameters
+        ----------
+        concurrency : int
+            The maximum questions asked at the same time.
+        cache_ttl : float
+            The seconds an answer is cached.
+        cache_entries : int
+            The maximum amount of cached answers.
+        """
+        self.concurrency = concurrency
+        self.cache: TTLCache[str] = TTLCache(cache_ttl, cache_entries)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client: Optional[AsyncOpenAI] = None
 
-def ask_web_llm(
-    content: str,
-) -> str:
+    @property
+    def client(self) -> AsyncOpenAI:
+        """
+        Get the shared client, creating it on first use.
+
+        Returns
+        -------
+        : AsyncOpenAI
+            The client.
+        """
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=os.getenv("LLM_API_KEY"),
+                base_url=os.getenv("LLM_BASE_URL", "https://api.perplexity.ai"),
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.concurrency,
+                        max_keepalive_connections=self.concurrency,
+                    )
+                ),
+            )
+        return self._client
+
+    async def ask(self, question: str) -> str:
+        """
+        Ask a question, or get its cached answer.
+
+        Parameters
+        ----------
+        question : str
+            The question to ask.
+
+        Returns
+        -------
+        : str
+            The answer.
+        """
+        key = question.strip()
+        if (answer := self.cache.get(key)) is not None:
+            return answer
+
+        async with self._semaphore:
+            completion = await self.client.chat.completions.create(
+                model=os.getenv("LLM_MODEL", "pplx-70b-online"),
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": question},
+                ],
+            )
+
+        answer = cast(str, completion.choices[0].message.content)
+        self.cache.put(key, answer)
+        return answer
+
+
+WEB_LLM = WebLlm()
+
+
+async def ask_web_llm(node: TagNode) -> str:
     """
     Ask perplexity (or chat gpt-4) for a query and returns the results.
 
     Parameters
     ----------
-    content: str
-        The string to search for on the internet.
+    node : TagNode
+        The "ask" tag, with the question to ask.
 
     Returns
     -------
@@ -25,44 +135,14 @@ def ask_web_llm(
         The results from the search, with markdown response syntax.
         to be used as a next step in the conversation.
     """
-    api_key: str | None = os.getenv("LLM_API_KEY")
-    client: OpenAI = OpenAI(api_key=api_key, base_url="https://api.perplexity.ai")
-
-    include_pattern = r"(\s*)(<-- *ask: (.*?)(?!-->) *-->)(?!-->)"
-    content_list = content.split("\n")
-
-    for i, line in enumerate(content_list):
-        if match := re.search(include_pattern, line):
-            padding = match[1]
-            question = match[3]
-
-            include_content = client.chat.completions.create(
-                model="pplx-70b-online",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (  # noqa: PAR001
-                            "You are an artificial intelligence assistant"
-                            "and you need to engage in a precise, concise, "
-                            "focused conversation with another artificial "
-                            "intelligence assistant."
-                        ),
-                    },
-                    {
-                        "role": "user",
-                        "content": question,
-                    },
-                ],
-            )
-            include_content = cast(str, include_content.choices[0].message.content)
+    padding = node.padding
+    question = node.argument
 
-            # Not add the padding if found
-            include_content = [
-                padding + line + "\n" for line in include_content.split("\n")
-            ]
+    include_content = await WEB_LLM.ask(question)
 
-            code_block = [f'{padding}**Asking __perplexity llm__ "{question}"**:\n\n']
-            code_block += [f"{padding}\n"] + include_content + [f"\n{padding}"]
-            content_list[i] = "".join(code_block)
+    # Not add the padding if found
+    include_content = [padding + line + "\n" for line in include_content.split("\n")]
 
-    return "\n".join(content_list)
+    code_block = [f'{padding}**Asking __perplexity llm__ "{question}"**:\n\n']
+    code_block += [f"{padding}\n"] + include_content + [f"\n{padding}"]
+    return "".join(code_block)
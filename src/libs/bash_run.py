@@ -1,9 +1,13 @@
 """
 Replaces "run" tags by running in bash the command.
 
+The commands run as asyncio subprocesses, a few at a time, and are killed after a
+timeout. Their output is streamed, keeping only its head and tail when too long.
+The output of commands flagged as "idempotent" is cached for a while.
+
 Example
 -------
->>> <-- run: "ls" -->
+>>> <-- run: `ls` -->
 <<< **ls**:
 <<<
 <<< ```bash
@@ -13,51 +17,207 @@ Example
 <<< ```
 """
 
-import re
+import asyncio
+import contextlib
+import os
 import shlex
-import subprocess  # noqa: S404
+import signal
+from typing import List, Optional, Tuple
+
+from src.libs.prompt_tokenizer import TagNode
+from src.libs.ttl_cache import TTLCache
+from src.models.literals_types_constants import (
+    RUN_CACHE_ENTRIES,
+    RUN_CACHE_TTL,
+    RUN_CONCURRENCY,
+    RUN_MAX_BYTES,
+    RUN_TIMEOUT,
+)
+
+
+class HeadTailBuffer(object):
+    """Capture an output, keeping only its head and tail when too long."""
+
+    def __init__(self, max_bytes: int) -> None:
+        """
+        Construct the buffer.
+
+        Parameters
+        ----------
+        max_bytes : int
+            The maximum bytes to keep, half from the head and half from the tail.
+        """
+        self.max_bytes = max_bytes
+        self.total = 0
+        self._head = bytearray()
+        self._tail = bytearray()
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Capture the next chunk of the output.
+
+        Parameters
+        ----------
+        chunk : bytes
+            The chunk.
+        """
+        half = self.max_bytes // 2
+        self.total += len(chunk)
+        if len(self._head) < half:
+            taken = half - len(self._head)
+            self._head += chunk[:taken]
+            chunk = chunk[taken:]
+        self._tail += chunk
+        del self._tail[:-half]
+
+    async def read(self, stream: asyncio.StreamReader) -> None:
+        """
+        Capture a stream, up to its end.
+
+        Parameters
+        ----------
+        stream : asyncio.StreamReader
+            The stream to capture.
+        """
+        while chunk := await stream.read(64 * 1024):
+            self.feed(chunk)
+
+    def getvalue(self) -> str:
+        """
+        Get the captured output.
+
+        Returns
+        -------
+        : str
+            The captured output, with a marker where it was truncated.
+        """
+        dropped = self.total - len(self._head) - len(self._tail)
+        if not dropped:
+            return (self._head + self._tail).decode("utf-8", "replace")
+
+        marker = f"\n[... {dropped} bytes truncated ...]\n".encode()
+        return (self._head + marker + self._tail).decode("utf-8", "replace")
 
 
-def bash_run(content: str) -> str:
+class CommandRunner(object):
+    """Run commands as asyncio subprocesses."""
+
+    def __init__(
+        self,
+        timeout: float = RUN_TIMEOUT,
+        max_bytes: int = RUN_MAX_BYTES,
+        concurrency: int = RUN_CONCURRENCY,
+        cache_ttl: float = RUN_CACHE_TTL,
+    ) -> None:
+        """
+        Construct the command runner.
+
+        Parameters
+        ----------
+        timeout : float
+            The seconds a command can run, before it's killed.
+        max_bytes : int
+            The maximum output bytes to capture from a command.
+        concurrency : int
+            The maximum commands running in parallel.
+        cache_ttl : float
+            The seconds the output of an idempotent command is cached.
+        """
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.cache: TTLCache[Tuple[str, Optional[int]]] = TTLCache(
+            cache_ttl, RUN_CACHE_ENTRIES
+        )
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(
+        self, cmd: List[str], idempotent: bool = False
+    ) -> Tuple[str, Optional[int]]:
+        """
+        Run a command, and capture its output.
+
+        Parameters
+        ----------
+        cmd : List[str]
+            The command and its arguments.
+        idempotent : bool
+            Whether the output can be cached.
+
+        Returns
+        -------
+        : Tuple[str, Optional[int]]
+            The output, stdout and stderr, and the exit status (None on timeout).
+        """
+        key = shlex.join(cmd)
+        if idempotent and (cached := self.cache.get(key)) is not None:
+            return cached
+
+        async with self._semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,
+            )
+            output = HeadTailBuffer(self.max_bytes)
+            status: Optional[int] = None
+            try:
+                await asyncio.wait_for(
+                    output.read(process.stdout), self.timeout  # type: ignore
+                )
+                status = await process.wait()
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if status is None:
+                    # Kill the whole group, so children don't outlive the command
+                    with contextlib.suppress(ProcessLookupError):
+                        os.killpg(process.pid, signal.SIGKILL)
+                    await process.wait()
+            result = (output.getvalue(), status)
+
+        if idempotent and result[1] == 0:
+            self.cache.put(key, result)
+        return result
+
+
+COMMAND_RUNNER = CommandRunner()
+
+
+async def bash_run(node: TagNode) -> str:
     """
     Replace content of bash command.
 
     Parameters
     ----------
-    content : str
-        The content string to process.
+    node : TagNode
+        The "run" tag, with the command to run.
 
     Returns
     -------
     : str
-        The content string with bash output.
+        The bash output, wrapped in a code block.
     """
-    include_pattern = r"(\s*)<--\s*run:\s*\`(.+)\`\s*-->"
+    padding = node.padding
+    cmd = shlex.split(node.argument)
 
-    content_list = content.split("\n")
-    for i, line in enumerate(content_list):
-        if match := re.search(include_pattern, line):
-            padding = match[1]
-            cmd = shlex.split(match[2])
+    try:
+        output, status = await COMMAND_RUNNER.run(cmd, node.flags == "idempotent")
+        include_content = [
+            f"{padding}{line.rstrip(' ')}\n" for line in output.split("\n") if line
+        ]
+        if status is None:
+            include_content.append(
+                f"{padding}<-- Timed out after {COMMAND_RUNNER.timeout}s -->\n"
+            )
+        elif status != 0:
+            include_content.append(f"{padding}<-- Exited with status {status} -->\n")
 
-            try:
-                include_content = [
-                    f"{padding}{line.rstrip(' ')}\n"
-                    for line in (
-                        subprocess.check_output(cmd)  # noqa: S603
-                        .decode("utf-8")
-                        .split("\n")
-                    )
-                    if line
-                ]
-
-            except subprocess.CalledProcessError as e:
-                include_content = [
-                    "<-- An error occurred while running the command. -->",
-                    str(e),
-                ]
-            code_block = [f"{padding}**{' '.join(cmd)}**:\n\n"]
-            code_block += [f"{padding}```bash\n"] + include_content + [f"{padding}```"]
-            content_list[i] = "".join(code_block)
-
-    return "\n".join(content_list)
+    except OSError as e:
+        include_content = [
+            "<-- An error occurred while running the command. -->",
+            str(e),
+        ]
+    code_block = [f"{padding}**{' '.join(cmd)}**:\n\n"]
+    code_block += [f"{padding}```bash\n"] + include_content + [f"{padding}```"]
+    return "".join(code_block)
@@ -0,0 +1,77 @@
+"""
+Remember the most recent keys, to drop the duplicated ones.
+
+Only the last `size` keys are kept, in a ring, so the memory stays flat no matter how
+long the daemon runs.
+"""
+
+from collections import deque
+from typing import Deque, Hashable, Set
+
+from src.models.literals_types_constants import DEDUPE_WINDOW
+
+
+class DedupeWindow(object):
+    """A fixed size window of the most recent keys."""
+
+    def __init__(self, size: int = DEDUPE_WINDOW) -> None:
+        """
+        Construct the window.
+
+        Parameters
+        ----------
+        size : int
+            The amount of recent keys remembered.
+        """
+        self.size = size
+        self._ring: Deque[Hashable] = deque()
+        self._keys: Set[Hashable] = set()
+
+    def __len__(self) -> int:
+        """
+        Get the amount of remembered keys.
+
+        Returns
+        -------
+        : int
+            The amount of keys.
+        """
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        Check if a key is remembered.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key.
+
+        Returns
+        -------
+        : bool
+            Whether the key was seen recently.
+        """
+        return key in self._keys
+
+    def add(self, key: Hashable) -> bool:
+        """
+        Remember a key, forgetting the oldest one if the window is full.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key.
+
+        Returns
+        -------
+        : bool
+            Whether the key is new, False if it's a duplicate.
+        """
+        if key in self._keys:
+            return False
+        if len(self._ring) >= self.size:
+            self._keys.discard(self._ring.popleft())
+        self._ring.append(key)
+        self._keys.add(key)
+        return True
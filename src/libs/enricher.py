@@ -0,0 +1,219 @@
+"""
+Resolve all the tags of a prompt concurrently.
+
+Blocking handlers run on a bounded thread pool, coroutine handlers run on the event
+loop. Each tag has its own timeout and the whole prompt has a deadline, a tag that
+doesn't make it in time is replaced by an inline error marker. This way the prompt
+latency is the one of its slowest tag, and the event loop is never blocked.
+
+The resolved tags are memoized, keyed by their text and a fingerprint of their inputs
+(like the modification time of an included file), so saving a prompt again only
+resolves the tags that are new or whose inputs changed. Only the tags whose
+fingerprint tracks their inputs should have one: a tag cached by its handler for a
+while must reach that cache on every prompt, or it would outlive its TTL here.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from src.libs.metrics import METRICS
+from src.libs.prompt_tokenizer import (
+    AsyncTagHandler,
+    TagFingerprint,
+    TagHandler,
+    TagNode,
+    TextSpan,
+    tokenize,
+)
+from src.models.literals_types_constants import (
+    ENRICH_DEADLINE,
+    ENRICH_WORKERS,
+    TAG_TIMEOUT,
+    TagKindsLiteral,
+)
+
+
+def error_marker(node: TagNode, reason: str) -> str:
+    """
+    Build the inline error marker of a tag.
+
+    Parameters
+    ----------
+    node : TagNode
+        The tag that failed.
+    reason : str
+        Why it failed.
+
+    Returns
+    -------
+    : str
+        The error marker.
+    """
+    return f"{node.padding}<-- {node.kind} {reason}: {node.argument} -->"
+
+
+class Enricher(object):
+    """Resolve all the tags of a prompt concurrently."""
+
+    def __init__(
+        self,
+        handlers: Dict[TagKindsLiteral, TagHandler | AsyncTagHandler],
+        fingerprints: Optional[Dict[TagKindsLiteral, TagFingerprint]] = None,
+        max_workers: int = ENRICH_WORKERS,
+        tag_timeout: float = TAG_TIMEOUT,
+        deadline: float = ENRICH_DEADLINE,
+    ) -> None:
+        """
+        Construct the enricher.
+
+        Parameters
+        ----------
+        handlers : Dict[TagKindsLiteral, TagHandler | AsyncTagHandler]
+            The handler of each tag kind. Tags without handler keep their line.
+        fingerprints : Optional[Dict[TagKindsLiteral, TagFingerprint]]
+            The fingerprint of the inputs of each tag kind. Tags without fingerprint,
+            or with a None fingerprint, are resolved on every prompt.
+        max_workers : int
+            The size of the thread pool running the blocking handlers.
+        tag_timeout : float
+            The seconds a single tag has to resolve.
+        deadline : float
+            The seconds all the tags of a prompt have to resolve.
+        """
+        self.handlers = handlers
+        self.fingerprints = fingerprints or {}
+        self.tag_timeout = tag_timeout
+        self.deadline = deadline
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="enricher"
+        )
+        self.errors: List[str] = []
+        self.reused = 0
+        self.memo: Dict[Tuple[Hashable, ...], str] = {}
+
+    def _memo_key(self, node: TagNode) -> Optional[Tuple[Hashable, ...]]:
+        """
+        Get the memo key of a tag, its text and the fingerprint of its inputs.
+
+        Parameters
+        ----------
+        node : TagNode
+            The tag.
+
+        Returns
+        -------
+        : Optional[Tuple[Hashable, ...]]
+            The memo key, or None if the tag can't be memoized.
+        """
+        fingerprint = self.fingerprints.get(node.kind)
+        if fingerprint is None or (inputs := fingerprint(node)) is None:
+            return None
+        return (node.kind, node.argument, node.flags, node.padding, inputs)
+
+    async def _resolve(
+        self, node: TagNode, memo_key: Optional[Tuple[Hashable, ...]]
+    ) -> str:
+        """
+        Resolve a single tag, within its timeout, and memoize it.
+
+        Parameters
+        ----------
+        node : TagNode
+            The tag to resolve.
+        memo_key : Optional[Tuple[Hashable, ...]]
+            The key to memoize the rendered tag with, if any.
+
+        Returns
+        -------
+        : str
+            The rendered tag, or its error marker.
+        """
+        handler = self.handlers.get(node.kind)
+        if handler is None:
+            return node.line
+
+        if asyncio.iscoroutinefunction(handler):
+            resolving = handler(node)
+        else:
+            loop = asyncio.get_running_loop()
+            resolving = loop.run_in_executor(self.executor, handler, node)
+
+        started = time.perf_counter()
+        try:
+            rendered = await asyncio.wait_for(resolving, self.tag_timeout)
+            if memo_key is not None:
+                self.memo[memo_key] = rendered
+            return rendered
+        except asyncio.TimeoutError:
+            reason = f"timed out after {self.tag_timeout}s"
+        except Exception as e:  # noqa: B902
+            reason = f"failed with {e!r}"
+        finally:
+            METRICS.observe(
+                "enrich_tag_seconds", time.perf_counter() - started, kind=node.kind
+            )
+
+        self.errors.append(f'"{node.line.strip()}" {reason}')
+        return error_marker(node, reason)
+
+    async def enrich(self, prompt: str) -> str:
+        """
+        Tokenize the prompt, and resolve all of its tags concurrently.
+
+        Parameters
+        ----------
+        prompt : str
+            The raw content from the prompt file.
+
+        Returns
+        -------
+        : str
+            The enhanced prompt.
+        """
+        self.errors = []
+        self.reused = 0
+        nodes = tokenize(prompt)
+
+        # Only the tags of the current prompt are kept memoized
+        memo, self.memo = self.memo, {}
+        memoized: Dict[int, str] = {}
+
+        # Identical tags share a single task
+        resolving: Dict[Tuple[str, ...], asyncio.Task] = {}
+        tasks: Dict[int, asyncio.Task] = {}
+        for i, node in enumerate(nodes):
+            if not isinstance(node, TagNode) or node.kind == "comment":
+                continue
+
+            memo_key = self._memo_key(node)
+            if memo_key is not None and memo_key in memo:
+                self.memo[memo_key] = memoized[i] = memo[memo_key]
+                self.reused += 1
+                continue
+
+            key = (node.kind, node.argument, node.flags, node.padding)
+            if key not in resolving:
+                resolving[key] = asyncio.ensure_future(self._resolve(node, memo_key))
+            tasks[i] = resolving[key]
+
+        if resolving:
+            await asyncio.wait(resolving.values(), timeout=self.deadline)
+
+        parts: List[str] = []
+        for i, node in enumerate(nodes):
+            if isinstance(node, TextSpan):
+                parts.append(node.text)
+            elif i in memoized:
+                parts.append(memoized[i])
+            elif i not in tasks:
+                continue
+            elif tasks[i].done():
+                parts.append(tasks[i].result())
+            else:
+                tasks[i].cancel()
+                reason = f"missed the {self.deadline}s deadline"
+                self.errors.append(f'"{node.line.strip()}" {reason}')
+                parts.append(error_marker(node, reason))
+        return "\n".join(parts)
@@ -0,0 +1,154 @@
+"""
+A fair scheduler in front of the shared LLM backend.
+
+Ollama only runs a few generations at a time, so with many sessions a chatty one could
+starve the others. The sessions waiting for a slot are served round-robin: once a
+session gets a slot, it goes to the back of the line. A request can give up waiting,
+when its turn is cancelled.
+"""
+
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Hashable, Optional
+
+from src.models.literals_types_constants import LLM_CONCURRENCY
+
+
+class FairScheduler(object):
+    """Round-robin slots of a shared backend, among sessions."""
+
+    def __init__(self, concurrency: int = LLM_CONCURRENCY) -> None:
+        """
+        Construct the scheduler.
+
+        Parameters
+        ----------
+        concurrency : int
+            The maximum amount of slots in use at the same time.
+        """
+        self.concurrency = concurrency
+        self.active = 0
+        self.granted: Dict[Hashable, int] = {}
+        self._waiting: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+
+    @property
+    def waiting(self) -> int:
+        """
+        Get the amount of requests waiting for a slot.
+
+        Returns
+        -------
+        : int
+            The waiting requests.
+        """
+        return sum(len(futures) for futures in self._waiting.values())
+
+    def _grant(self) -> None:
+        """Hand the free slots to the waiting sessions, round-robin."""
+        while self.active < self.concurrency and self._waiting:
+            session, futures = next(iter(self._waiting.items()))
+            future = futures.popleft()
+            if futures:
+                self._waiting.move_to_end(session)
+            else:
+                del self._waiting[session]
+
+            if future.done():  # Cancelled while waiting
+                continue
+            self.active += 1
+            future.set_result(None)
+
+    def _forget(self, session: Hashable, future: asyncio.Future) -> None:
+        """
+        Remove a request that gave up waiting for a slot.
+
+        Parameters
+        ----------
+        session : Hashable
+            The session of the request.
+        future : asyncio.Future
+            The request.
+        """
+        futures = self._waiting.get(session)
+        if futures is not None and future in futures:
+            futures.remove(future)
+            if not futures:
+                del self._waiting[session]
+
+    def _release(self) -> None:
+        """Free a slot."""
+        self.active -= 1
+        self._grant()
+
+    @asynccontextmanager
+    async def slot(
+        self, session: Hashable, cancel: Optional[asyncio.Event] = None
+    ) -> AsyncIterator[bool]:
+        """
+        Hold a slot of the backend, waiting for the turn of the session.
+
+        Parameters
+        ----------
+        session : Hashable
+            The session asking for the slot.
+        cancel : Optional[asyncio.Event]
+            Set to give up waiting, the slot is then not held.
+
+        Yields
+        ------
+        : bool
+            Whether the slot is held, False if `cancel` was set first.
+        """
+        if cancel is not None and cancel.is_set():
+            yield False
+            return
+
+        if self.active < self.concurrency and not self._waiting:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(session, deque()).append(future)
+            try:
+                if cancel is None:
+                    await future
+                else:
+                    await self._until_cancelled(future, cancel)
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()  # Granted right as it was cancelled
+                raise
+            if future.cancelled():
+                self._forget(session, future)
+                yield False
+                return
+
+        self.granted[session] = self.granted.get(session, 0) + 1
+        try:
+            yield True
+        finally:
+            self._release()
+
+    async def _until_cancelled(
+        self, future: asyncio.Future, cancel: asyncio.Event
+    ) -> None:
+        """
+        Wait for a slot to be granted, cancelling the wait if `cancel` is set first.
+
+        Parameters
+        ----------
+        future : asyncio.Future
+            Resolved when the slot is granted.
+        cancel : asyncio.Event
+            Set to give up waiting.
+        """
+        cancelled = asyncio.ensure_future(cancel.wait())
+        try:
+            await asyncio.wait([future, cancelled], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            cancelled.cancel()
+            if not future.done():
+                future.cancel()
+
+
+LLM_SCHEDULER = FairScheduler()
@@ -6,80 +6,202 @@ An include tag is a line of comment that looks like this:
 
 This line will be replaced with the contents of the referenced "file.txt" wrapped
 in a code block.
+
+The code blocks are cached, keyed by the file real path, modification time and size,
+so an unchanged file is never read again.
 """
 
 import os
-import re
-from typing import cast
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from src.libs.prompt_tokenizer import TagNode
+from src.models.literals_types_constants import FILE_CACHE_BYTES
+
+CODE_MARKER_EXT = {
+    "py": "python",
+    "js": "javascript",
+    "txt": "",
+    "html": "html",
+    "css": "css",
+    "json": "json",
+    "java": "java",
+    "c": "c",
+    "cpp": "cpp",
+    "go": "go",
+    "rs": "rust",
+    "php": "php",
+    "rb": "ruby",
+    "swift": "swift",
+    "sh": "bash",
+    "sql": "sql",
+    "yml": "yaml",
+    "xml": "xml",
+}
+
+
+class FileIncludeCache(object):
+    """LRU cache of the formatted code blocks, bounded by a byte budget."""
+
+    def __init__(self, max_bytes: int = FILE_CACHE_BYTES) -> None:
+        """
+        Construct the cache.
+
+        Parameters
+        ----------
+        max_bytes : int
+            The byte budget of all the cached code blocks.
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (realpath, padding) -> ((st_mtime_ns, st_size), code block, bytes)
+        self._blocks: OrderedDict[
+            Tuple[str, str], Tuple[Tuple[int, int], str, int]
+        ] = OrderedDict()
+
+    def get(self, realpath: str, stat: os.stat_result, padding: str) -> Optional[str]:
+        """
+        Get the code block of a file, if it didn't change since it was cached.
+
+        Parameters
+        ----------
+        realpath : str
+            The real path of the file.
+        stat : os.stat_result
+            The current status of the file.
+        padding : str
+            The padding of the code block.
+
+        Returns
+        -------
+        : Optional[str]
+            The code block, or None on a miss.
+        """
+        with self._lock:
+            entry = self._blocks.get((realpath, padding))
+            if entry is None or entry[0] != (stat.st_mtime_ns, stat.st_size):
+                self.misses += 1
+                return None
+
+            self._blocks.move_to_end((realpath, padding))
+            self.hits += 1
+            return entry[1]
 
+    def put(
+        self, realpath: str, stat: os.stat_result, padding: str, block: str
+    ) -> None:
+        """
+        Cache the code block of a file, evicting the least recently used ones.
 
-def replace_include_tags(content: str) -> str:
+        Parameters
+        ----------
+        realpath : str
+            The real path of the file.
+        stat : os.stat_result
+            The status of the file when it was read.
+        padding : str
+            The padding of the code block.
+        block : str
+            The code block.
+        """
+        size = len(block.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if (previous := self._blocks.pop((realpath, padding), None)) is not None:
+                self.bytes -= previous[2]
+            while self._blocks and self.bytes + size > self.max_bytes:
+                self.bytes -= self._blocks.popitem(last=False)[1][2]
+
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            self._blocks[(realpath, padding)] = (stamp, block, size)
+            self.bytes += size
+
+
+FILE_INCLUDE_CACHE = FileIncludeCache()
+
+
+def _read_code_block(include_file: str, padding: str) -> str:
     """
-    Replace include tags.
+    Read the file, and wrap its padded contents in a code block.
 
     Parameters
     ----------
-    content : str
-        The content string to process.
+    include_file : str
+        The path of the file.
+    padding : str
+        The padding of the code block.
 
     Returns
     -------
     : str
-        The content string with include tags replaced.
+        The code block.
     """
-    include_pattern = r"(\s*)(<-- *include: file://*[^ ]* *-->)"
-    code_marker_ext = {
-        "py": "python",
-        "js": "javascript",
-        "txt": "",
-        "html": "html",
-        "css": "css",
-        "json": "json",
-        "java": "java",
-        "c": "c",
-        "cpp": "cpp",
-        "go": "go",
-        "rs": "rust",
-        "php": "php",
-        "rb": "ruby",
-        "swift": "swift",
-        "sh": "bash",
-        "sql": "sql",
-        "yml": "yaml",
-        "xml": "xml",
-    }
-
-    content_list = content.split("\n")
-    for i, line in enumerate(content_list):
-        if match := re.search(include_pattern, line):
-            padding = match[1]
-            include_tag = match[2]
-            file_name = cast(
-                dict,
-                re.search(
-                    r"(?P<file_name>^.*?)<--\s*include:\s*file://(?P<path>.*?)\s*-->",
-                    include_tag,
-                ),
-            )["path"]
-            include_file = os.path.expanduser(file_name)
-            filetype = ""
-
-            try:
-                with open(include_file, "r") as f:
-                    include_content = f.readlines()
-
-                include_content = [padding + line for line in include_content]
-
-                # Detecting filetype
-                extension = include_file.split(".")[-1]
-                filetype = code_marker_ext.get(extension, "")
-            except FileNotFoundError:
-                include_content = ["<-- include file not found -->", "\n"]
-
-            code_block = [f"{padding}**{file_name}**:\n\n"]
-            code_block += (
-                [f"{padding}```{filetype}\n"] + include_content + [f"{padding}```"]
-            )
-            content_list[i] = "".join(code_block)
-
-    return "\n".join(content_list)
+    with open(include_file, "r") as f:
+        include_content = f.readlines()
+
+    include_content = [padding + line for line in include_content]
+
+    # Detecting filetype
+    extension = include_file.split(".")[-1]
+    filetype = CODE_MARKER_EXT.get(extension, "")
+
+    code_block = [f"{padding}```{filetype}\n"] + include_content + [f"{padding}```"]
+    return "".join(code_block)
+
+
+def file_fingerprint(node: TagNode) -> Optional[Hashable]:
+    """
+    Fingerprint an include tag, by its file modification time and size.
+
+    Parameters
+    ----------
+    node : TagNode
+        The "include-file" tag.
+
+    Returns
+    -------
+    : Optional[Hashable]
+        The fingerprint, or None if the file can't be found.
+    """
+    try:
+        stat = os.stat(os.path.expanduser(node.argument))
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def replace_include_tag(node: TagNode) -> str:
+    """
+    Replace an include tag.
+
+    Parameters
+    ----------
+    node : TagNode
+        The "include-file" tag to replace.
+
+    Returns
+    -------
+    : str
+        The file contents, wrapped in a code block.
+    """
+    padding = node.padding
+    file_name = node.argument
+    include_file = os.path.expanduser(file_name)
+    title = f"{padding}**{file_name}**:\n\n"
+
+    try:
+        stat = os.stat(include_file)
+        realpath = os.path.realpath(include_file)
+        if (code_block := FILE_INCLUDE_CACHE.get(realpath, stat, padding)) is None:
+            code_block = _read_code_block(include_file, padding)
+            FILE_INCLUDE_CACHE.put(realpath, stat, padding, code_block)
+    except FileNotFoundError:
+        code_block = f"{padding}```\n<-- include file not found -->\n{padding}```"
+
+    return title + code_block
@@ -1,49 +1,511 @@
-"""Get websites content."""
+"""
+Get websites content.
+
+The extracted text of each website is cached on disk, along with its ETag and
+Last-Modified headers. A fresh entry is used as is, an stale one is revalidated with
+a conditional request, so an unchanged page costs a 304 instead of a full download and
+parse. All the requests go through a shared session, pooling the connections per host.
+
+The download is streamed up to a maximum size, and only the main content of the page,
+without navigation, scripts, styles and footers, is kept up to a maximum length. A
+request has a single deadline, from when it's sent: the body is read a socket read at a
+time, each one timing out at the deadline, so a website trickling its body can't keep a
+worker of the enricher blocked after its tag was dropped. Waiting for the headers is
+bounded per socket read, and waiting for a free pooled connection is bounded too.
+"""
+import hashlib
+import importlib.util
+import json
+import os
 import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Hashable, Optional, Tuple
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import (
+    EmptyPoolError,
+    HTTPError as Urllib3Error,
+    ReadTimeoutError,
+)
 
-from src.models.literals_types_constants import TIMEOUT
+from src.libs.prompt_tokenizer import TagNode
+from src.models.literals_types_constants import (
+    HTTP_CACHE_DIR,
+    HTTP_CACHE_FRESH,
+    HTTP_MAX_BYTES,
+    HTTP_MAX_CHARS,
+    HTTP_POOL_HOSTS,
+    HTTP_POOL_PER_HOST,
+    HTTP_POOL_TIMEOUT,
+    HTTP_READ_SIZE,
+    HTTP_TIMEOUT,
+)
 
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+BOILERPLATE_TAGS = [
+    "aside",
+    "footer",
+    "form",
+    "header",
+    "iframe",
+    "nav",
+    "noscript",
+    "script",
+    "style",
+    "svg",
+    "template",
+]
+_BLANK_LINES = re.compile(r"(\s*\n)+")
 
-def get_website_content(content: str) -> str:
+
+@dataclass
+class CachedWebsite:
     """
-    Replace the include tag with http(s) protocol.
+    A cached website.
+
+    Parameters
+    ----------
+    url : str
+        The url of the website.
+    text : str
+        The text extracted from the website.
+    fetched_at : float
+        When the website was fetched or revalidated, as a timestamp.
+    etag : Optional[str]
+        The ETag header of the response.
+    last_modified : Optional[str]
+        The Last-Modified header of the response.
+    """
+
+    url: str
+    text: str
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def read_capped(
+    response: requests.Response, max_bytes: int, deadline: Optional[float] = None
+) -> bytes:
+    """
+    Read a streamed response body, up to a maximum size and until a deadline.
+
+    The body is read a socket read at a time, whatever arrived, with the socket
+    timing out at the deadline, so a body trickling in can't outlive it.
 
     Parameters
     ----------
-    content : str
-        The content string to process.
+    response : requests.Response
+        The response, requested with `stream=True`.
+    max_bytes : int
+        The maximum bytes to read, the rest of the body is dropped.
+    deadline : Optional[float]
+        The `time.monotonic` after which the rest of the body is dropped.
+
+    Returns
+    -------
+    : bytes
+        The body, truncated to `max_bytes` or at the deadline.
+
+    Raises
+    ------
+    requests.ConnectionError
+        If the connection fails while reading.
+    """
+    chunks = []
+    size = 0
+    try:
+        while size < max_bytes:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                connection = response.raw.connection
+                if remaining <= 0:
+                    break
+                if connection is not None and connection.sock is not None:
+                    connection.sock.settimeout(remaining)
+            chunk = response.raw.read1(
+                min(HTTP_READ_SIZE, max_bytes - size), decode_content=True
+            )
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+    except ReadTimeoutError:
+        pass
+    except Urllib3Error as e:
+        raise requests.ConnectionError(e)
+    finally:
+        response.close()
+    return b"".join(chunks)
+
+
+def extract_text(html: bytes, max_chars: int) -> str:
+    """
+    Extract the main content text of a page, without boilerplate.
+
+    Parameters
+    ----------
+    html : bytes
+        The page, its encoding is detected by BeautifulSoup.
+    max_chars : int
+        The maximum characters to keep.
 
     Returns
     -------
     : str
-        The content string with the Website content.
+        The text, without blank lines, truncated to `max_chars`.
     """
-    include_pattern = r"(\s*)(<-- *include: *(http(s?)://[^ ]*) *-->)"
-    content_list = content.split("\n")
+    soup = BeautifulSoup(html, HTML_PARSER)
+    for element in soup.find_all(BOILERPLATE_TAGS):
+        element.decompose()
+
+    main = soup.find("main") or soup.find("article") or soup.body or soup
+    text = _BLANK_LINES.sub("\n", main.get_text("\n")).strip()
+    if len(text) > max_chars:
+        text = text[:max_chars] + "\n[...]"
+    return text
 
-    for i, line in enumerate(content_list):
-        if match := re.search(include_pattern, line):
-            padding = match[1]
-            url = match[3]
 
-            try:
-                response = requests.get(url, timeout=TIMEOUT)
-                soup = BeautifulSoup(response.text, "html.parser")
-                include_content = soup.get_text()
+class _BoundedWait(object):
+    """Wait `HTTP_POOL_TIMEOUT` for a free connection, instead of forever."""
 
-                # Replace double line breaks with a single line break
-                include_content = re.sub("\n+", "\n", include_content)
+    def _get_conn(self, timeout: Optional[float] = None) -> Any:
+        """
+        Get a pooled connection, waiting a bounded time for one to be free.
+
+        Parameters
+        ----------
+        timeout : Optional[float]
+            The seconds to wait, `HTTP_POOL_TIMEOUT` if None.
+
+        Returns
+        -------
+        : Any
+            The connection.
+        """
+        wait = HTTP_POOL_TIMEOUT if timeout is None else timeout
+        return super()._get_conn(wait)  # type: ignore[misc]
+
+
+class _BoundedHTTPPool(_BoundedWait, HTTPConnectionPool):
+    """An HTTP pool waiting a bounded time for a free connection."""
+
+
+class _BoundedHTTPSPool(_BoundedWait, HTTPSConnectionPool):
+    """An HTTPS pool waiting a bounded time for a free connection."""
+
+
+class BoundedPoolAdapter(HTTPAdapter):
+    """A blocking pool adapter, failing when no connection is free in time."""
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Create the pool manager, with the bounded pools.
+
+        Parameters
+        ----------
+        *args : Any
+            The arguments of `HTTPAdapter.init_poolmanager`.
+        **kwargs : Any
+            The keyword arguments of `HTTPAdapter.init_poolmanager`.
+        """
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _BoundedHTTPPool,
+            "https": _BoundedHTTPSPool,
+        }
+
+    def send(
+        self, request: requests.PreparedRequest, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        """
+        Send a request, as a connection error when no connection is free in time.
+
+        Parameters
+        ----------
+        request : requests.PreparedRequest
+            The request.
+        *args : Any
+            The arguments of `HTTPAdapter.send`.
+        **kwargs : Any
+            The keyword arguments of `HTTPAdapter.send`.
+
+        Returns
+        -------
+        : requests.Response
+            The response.
+
+        Raises
+        ------
+        requests.ConnectionError
+            If no pooled connection was free in time.
+        """
+        try:
+            return super().send(request, *args, **kwargs)
+        except EmptyPoolError as e:
+            raise requests.ConnectionError(e, request=request)
+
+
+def pooled_session(
+    pool_hosts: int = HTTP_POOL_HOSTS, pool_per_host: int = HTTP_POOL_PER_HOST
+) -> requests.Session:
+    """
+    Create a keep-alive session, with a bounded connection pool per host.
+
+    Parameters
+    ----------
+    pool_hosts : int
+        The amount of hosts to keep a connection pool for.
+    pool_per_host : int
+        The maximum connections to a single host.
+
+    Returns
+    -------
+    : requests.Session
+        The pooled session.
+    """
+    session = requests.Session()
+    adapter = BoundedPoolAdapter(
+        pool_connections=pool_hosts, pool_maxsize=pool_per_host, pool_block=True
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
-                # Not add the padding if found
-                include_content = [padding + line for line in include_content]
 
-            except FileNotFoundError:
-                include_content = ["<-- include website not found -->"]
+class HttpIncludeCache(object):
+    """On disk cache of the websites text, revalidated with conditional requests."""
+
+    def __init__(
+        self,
+        directory: str = HTTP_CACHE_DIR,
+        fresh_for: float = HTTP_CACHE_FRESH,
+        session: Optional[requests.Session] = None,
+        max_bytes: int = HTTP_MAX_BYTES,
+        max_chars: int = HTTP_MAX_CHARS,
+        timeout: Tuple[float, float] = HTTP_TIMEOUT,
+    ) -> None:
+        """
+        Construct the cache.
+
+        Parameters
+        ----------
+        directory : str
+            The directory where the cached websites are stored.
+        fresh_for : float
+            The seconds a cached website is used without revalidating it.
+        session : Optional[requests.Session]
+            The session to fetch with, a pooled session by default.
+        max_bytes : int
+            The maximum bytes to download from a website.
+        max_chars : int
+            The maximum characters to extract from a website.
+        timeout : Tuple[float, float]
+            The seconds to connect to a website, and to get it whole from when the
+            request is sent.
+        """
+        self.directory = directory
+        self.fresh_for = fresh_for
+        self.session = session or pooled_session()
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.timeout = timeout
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._websites: Dict[str, CachedWebsite] = {}
+
+    def _path(self, url: str) -> str:
+        """
+        Get the path where a website is cached.
+
+        Parameters
+        ----------
+        url : str
+            The url of the website.
+
+        Returns
+        -------
+        : str
+            The path of the cached website.
+        """
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest())
+
+    def get(self, url: str) -> Optional[CachedWebsite]:
+        """
+        Get a cached website, from memory or disk.
+
+        Parameters
+        ----------
+        url : str
+            The url of the website.
+
+        Returns
+        -------
+        : Optional[CachedWebsite]
+            The cached website, if any.
+        """
+        with self._lock:
+            if (website := self._websites.get(url)) is not None:
+                return website
+
+        try:
+            with open(self._path(url), "r") as f:
+                website = CachedWebsite(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+        with self._lock:
+            self._websites[url] = website
+        return website
+
+    def put(self, website: CachedWebsite) -> None:
+        """
+        Store a website, in memory and on disk.
+
+        Parameters
+        ----------
+        website : CachedWebsite
+            The website to store.
+        """
+        with self._lock:
+            self._websites[website.url] = website
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(website.url)
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(asdict(website), f)
+        os.replace(temporary_path, path)
+
+    def validator(self, url: str) -> Optional[Hashable]:
+        """
+        Get the validator of a website, while its cached text is fresh.
+
+        Parameters
+        ----------
+        url : str
+            The url of the website.
+
+        Returns
+        -------
+        : Optional[Hashable]
+            The ETag or Last-Modified header, or the fetch time if the website had
+            none. None when the website isn't cached or must be revalidated.
+        """
+        cached = self.get(url)
+        if cached is None or time.time() - cached.fetched_at >= self.fresh_for:
+            return None
+        return cached.etag or cached.last_modified or cached.fetched_at
+
+    def fetch(self, url: str) -> str:
+        """
+        Get the text of a website, revalidating or fetching it when needed.
+
+        Parameters
+        ----------
+        url : str
+            The url of the website.
+
+        Returns
+        -------
+        : str
+            The text extracted from the website.
+        """
+        cached = self.get(url)
+        if cached is not None and time.time() - cached.fetched_at < self.fresh_for:
+            with self._lock:
+                self.hits += 1
+            return cached.text
+
+        headers = {}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached is not None and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+        connect, total = self.timeout
+        deadline = time.monotonic() + total
+        response = self.session.get(
+            url, headers=headers, timeout=(min(connect, total), total), stream=True
+        )
+        if cached is not None and response.status_code == 304:
+            response.close()
+            with self._lock:
+                self.revalidated += 1
+            cached.fetched_at = time.time()
+            self.put(cached)
+            return cached.text
+
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
+
+        with self._lock:
+            self.misses += 1
+        body = read_capped(response, self.max_bytes, deadline)
+        text = extract_text(body, self.max_chars)
+        self.put(
+            CachedWebsite(
+                url=url,
+                text=text,
+                fetched_at=time.time(),
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        )
+        return text
+
+
+HTTP_INCLUDE_CACHE = HttpIncludeCache()
+
+
+def website_fingerprint(node: TagNode) -> Optional[Hashable]:
+    """
+    Fingerprint an include tag, by the validator of its cached website.
+
+    Parameters
+    ----------
+    node : TagNode
+        The "include-http" tag.
+
+    Returns
+    -------
+    : Optional[Hashable]
+        The fingerprint, or None if the website must be fetched or revalidated.
+    """
+    return HTTP_INCLUDE_CACHE.validator(node.argument)
+
+
+def get_website_content(node: TagNode) -> str:
+    """
+    Replace the include tag with http(s) protocol.
+
+    Parameters
+    ----------
+    node : TagNode
+        The "include-http" tag to replace.
+
+    Returns
+    -------
+    : str
+        The Website content, wrapped in a code block.
+    """
+    padding = node.padding
+    url = node.argument
+
+    try:
+        text = HTTP_INCLUDE_CACHE.fetch(url)
+        include_content = [f"{padding}{line}\n" for line in text.split("\n")]
+    except requests.RequestException:
+        include_content = ["<-- include website not found -->\n"]
 
-            code_block = [f"{padding}**{url}**:\n\n"]
-            code_block += [f"{padding}```\n"] + include_content + [f"{padding}```"]
-            content_list[i] = "".join(code_block)
-    return "\n".join(content_list)
+    code_block = [f"{padding}**{url}**:\n\n"]
+    code_block += [f"{padding}```\n"] + include_content + [f"{padding}```"]
+    return "".join(code_block)
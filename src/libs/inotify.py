@@ -0,0 +1,159 @@
+"""
+A minimal Linux inotify binding, read from the asyncio event loop.
+
+The inotify file descriptor is registered with `loop.add_reader`, so the events are
+delivered straight into the loop, without any thread.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+from typing import Callable, List, NamedTuple
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")
+
+
+class InotifyEvent(NamedTuple):
+    """
+    An inotify event.
+
+    Parameters
+    ----------
+    wd : int
+        The watch descriptor.
+    mask : int
+        The event mask.
+    cookie : int
+        Relates the IN_MOVED_FROM and IN_MOVED_TO events of a rename.
+    name : str
+        The name of the file, for events of watched directories.
+    """
+
+    wd: int
+    mask: int
+    cookie: int
+    name: str
+
+
+def _libc() -> ctypes.CDLL:
+    """
+    Load the C library.
+
+    Returns
+    -------
+    : ctypes.CDLL
+        The C library.
+    """
+    return ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+
+
+def is_supported() -> bool:
+    """
+    Check if inotify is available.
+
+    Returns
+    -------
+    : bool
+        Whether inotify can be used.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        return hasattr(_libc(), "inotify_init1")
+    except OSError:
+        return False
+
+
+class Inotify(object):
+    """An inotify instance, delivering its events into the asyncio event loop."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        callback: Callable[[List[InotifyEvent]], None],
+    ) -> None:
+        """
+        Create the inotify instance, and start reading it from the event loop.
+
+        Parameters
+        ----------
+        loop : asyncio.AbstractEventLoop
+            The event loop to read the events from.
+        callback : Callable[[List[InotifyEvent]], None]
+            Called on the event loop, with each batch of events.
+
+        Raises
+        ------
+        OSError
+            If the inotify instance can't be created.
+        """
+        self.loop = loop
+        self.callback = callback
+        self._libc = _libc()
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        loop.add_reader(self.fd, self._read)
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """
+        Watch a path.
+
+        Parameters
+        ----------
+        path : str
+            The file or directory to watch.
+        mask : int
+            The events to watch.
+
+        Returns
+        -------
+        : int
+            The watch descriptor.
+
+        Raises
+        ------
+        OSError
+            If the path can't be watched.
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def _read(self) -> None:
+        """Read the pending events, and hand them to the callback."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        events: List[InotifyEvent] = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            events.append(InotifyEvent(wd, mask, cookie, os.fsdecode(name)))
+        self.callback(events)
+
+    def stop(self) -> None:
+        """Stop reading the events, and close the inotify instance."""
+        self.loop.remove_reader(self.fd)
+        os.close(self.fd)
@@ -0,0 +1,272 @@
+"""
+An append-only journal of the events published by the sessions.
+
+Each event is a JSON line. The lines are written in batches, with a single fsync per
+batch, from a thread so the event loop isn't blocked. Streams aren't journaled, their
+text is, once the printer publishes it as a message to record.
+
+The journal is read back by `replay.py`, to restore the turn a crash interrupted, or to
+re-drive the recorded prompts through the pipeline.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.messages.base import BaseMessage
+
+from src.models.literals_types_constants import (
+    JOURNAL_BATCH,
+    JOURNAL_FLUSH_INTERVAL,
+    MessageContentType,
+    TopicsLiteral,
+)
+from src.models.message_event import MessageEvent
+
+JournalRecord = Dict[str, Any]
+
+
+def encode_contents(contents: Optional[MessageContentType]) -> Any:
+    """
+    Encode the contents of an event to JSON types.
+
+    Parameters
+    ----------
+    contents : Optional[MessageContentType]
+        The contents.
+
+    Returns
+    -------
+    : Any
+        The encoded contents, None for a stream.
+    """
+    if contents is None or isinstance(contents, str):
+        return contents
+    if isinstance(contents, BaseMessage):
+        return {"type": contents.type, "content": contents.content}
+    if isinstance(contents, list):
+        return [encode_contents(content) for content in contents]
+    return None
+
+
+def decode_contents(data: Any) -> Optional[MessageContentType]:
+    """
+    Decode the contents of an event, from JSON types.
+
+    Parameters
+    ----------
+    data : Any
+        The encoded contents.
+
+    Returns
+    -------
+    : Optional[MessageContentType]
+        The contents.
+    """
+    if isinstance(data, dict):
+        return BaseMessage(type=data["type"], content=data["content"])
+    if isinstance(data, list):
+        return [decode_contents(content) for content in data]  # type: ignore
+    return data
+
+
+def decode_event(record: JournalRecord) -> MessageEvent:
+    """
+    Build a new event, from a journal record.
+
+    Parameters
+    ----------
+    record : JournalRecord
+        The journal record.
+
+    Returns
+    -------
+    : MessageEvent
+        The event, given a new ID when published, in the trace of the recorded one.
+    """
+    event = MessageEvent(
+        record["event_type"],
+        author=record["author"],
+        contents=decode_contents(record["contents"]),
+        system_type=record["system_type"],
+    )
+    event.trace_id = record.get("trace_id")  # Not in the journals before tracing
+    return event
+
+
+def read_journal(path: str) -> Iterator[JournalRecord]:
+    """
+    Read the records of a journal, skipping a line torn by a crash.
+
+    Parameters
+    ----------
+    path : str
+        The journal file.
+
+    Yields
+    ------
+    : JournalRecord
+        The records, in the order they were published.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def interrupted_turn(
+    records: List[JournalRecord], session_id: str
+) -> List[JournalRecord]:
+    """
+    Find the events of a session that a crash left without an outcome.
+
+    That is the last prompt, if its answer was never recorded, and the last summary
+    request, if its summary was never recorded.
+
+    Parameters
+    ----------
+    records : List[JournalRecord]
+        The records of the journal.
+    session_id : str
+        The session.
+
+    Returns
+    -------
+    : List[JournalRecord]
+        The summary request and the prompt to publish again, in this order.
+    """
+    prompt: Optional[JournalRecord] = None
+    summary: Optional[JournalRecord] = None
+    for record in records:
+        if record["session"] != session_id:
+            continue
+        recorded = "record" in record["topics"]
+        match record["event_type"]:
+            case "human_raw_message" if recorded:
+                prompt = record
+            case "ai_message" if recorded:
+                prompt = None
+            case "chat_summary" if "summarize" in record["topics"]:
+                summary = record
+            case "chat_summary" if recorded:
+                summary = None
+    return [record for record in (summary, prompt) if record is not None]
+
+
+class Journal(object):
+    """An append-only, fsync-batched journal of events."""
+
+    def __init__(
+        self,
+        path: str,
+        interval: float = JOURNAL_FLUSH_INTERVAL,
+        batch: int = JOURNAL_BATCH,
+    ) -> None:
+        """
+        Open the journal.
+
+        Parameters
+        ----------
+        path : str
+            The journal file, appended to.
+        interval : float
+            The maximum seconds an event waits to be written.
+        batch : int
+            The amount of waiting events that triggers a write right away.
+        """
+        self.path = path
+        self.interval = interval
+        self.batch = batch
+        self.written = 0
+        self.syncs = 0
+        self._pending: List[str] = []
+        self._in_flight: List[List[str]] = []  # The batches handed to a thread
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._wake = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    def append(
+        self, session_id: str, topics: List[TopicsLiteral], event: MessageEvent
+    ) -> None:
+        """
+        Journal a published event.
+
+        Parameters
+        ----------
+        session_id : str
+            The session publishing the event.
+        topics : List[TopicsLiteral]
+            The topics the event was published to.
+        event : MessageEvent
+            The event.
+        """
+        record = {
+            "session": session_id,
+            "topics": topics,
+            "event_id": event.event_id,
+            "trace_id": event.trace_id,
+            "ts": event.created_at.timestamp(),
+            "event_type": event.event_type,
+            "author": event.author,
+            "system_type": event.system_type,
+            "contents": encode_contents(event.contents),
+        }
+        self._pending.append(json.dumps(record, ensure_ascii=False))
+        if self._flusher is None:
+            self._flusher = asyncio.ensure_future(self._flush_periodically())
+        if len(self._pending) >= self.batch:
+            self._wake.set()
+
+    def _write(self, lines: List[str]) -> None:
+        """
+        Write a batch of lines, and sync them to the disk.
+
+        Parameters
+        ----------
+        lines : List[str]
+            The JSON lines, of a batch in flight.
+        """
+        with self._lock:
+            if not any(batch is lines for batch in self._in_flight):
+                return  # Written by `close`, while waiting for the lock
+            self._in_flight.remove(lines)
+            self._file.write("".join(line + "\n" for line in lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.written += len(lines)
+            self.syncs += 1
+
+    async def flush(self) -> None:
+        """Write the waiting events, from a thread."""
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        self._in_flight.append(lines)
+        await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+
+    async def _flush_periodically(self) -> None:
+        """Write the waiting events, every interval or once a batch is waiting."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def close(self) -> None:
+        """Write the batches in flight and the waiting events, and close the journal."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+        if self._pending:
+            self._in_flight.append(self._pending)
+            self._pending = []
+        while self._in_flight:
+            self._write(self._in_flight[0])
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,92 @@
+"""
+The bounded queue and workers delivering the events of a topic to a subscriber.
+
+On an "ordered" topic a single worker delivers the events one at a time, in the order
+they were published. On an "unordered" topic several workers deliver them
+concurrently. Publishing waits while the queue is full, slowing down the publisher
+instead of buffering without limit.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+from src.models.literals_types_constants import (
+    BUS_QUEUE_SIZE,
+    BUS_UNORDERED_WORKERS,
+    TopicOrderingLiteral,
+)
+from src.models.message_event import MessageEvent
+from src.models.publish_subscribe_class import PublisherSubscriber
+
+ErrorCallback = Callable[
+    [PublisherSubscriber, MessageEvent, Exception], Awaitable[None]
+]
+DeliverCallback = Callable[[MessageEvent], Awaitable[None]]
+
+
+class Mailbox(object):
+    """The bounded queue and workers delivering events to a subscriber."""
+
+    def __init__(
+        self,
+        subscriber: PublisherSubscriber,
+        on_error: ErrorCallback,
+        ordering: TopicOrderingLiteral = "ordered",
+        size: int = BUS_QUEUE_SIZE,
+        deliver: Optional[DeliverCallback] = None,
+    ) -> None:
+        """
+        Construct the mailbox, and start its workers.
+
+        Parameters
+        ----------
+        subscriber : PublisherSubscriber
+            The subscriber to deliver the events to.
+        on_error : ErrorCallback
+            Called when the subscriber fails on an event.
+        ordering : TopicOrderingLiteral
+            Whether the events are delivered one at a time, in order.
+        size : int
+            The maximum amount of events waiting to be delivered.
+        deliver : Optional[DeliverCallback]
+            How to deliver an event, the `listen` of the subscriber by default.
+        """
+        self.subscriber = subscriber
+        self.on_error = on_error
+        self.ordering = ordering
+        self.deliver = deliver or subscriber.listen
+        self.queue: asyncio.Queue[MessageEvent] = asyncio.Queue(size)
+        self.delivered = 0
+
+        workers = 1 if ordering == "ordered" else BUS_UNORDERED_WORKERS
+        self._workers: List[asyncio.Task] = [
+            asyncio.ensure_future(self._work()) for _ in range(workers)
+        ]
+
+    async def _work(self) -> None:
+        """Deliver the events to the subscriber."""
+        while True:
+            event = await self.queue.get()
+            try:
+                await self.deliver(event)
+            except Exception as e:  # noqa: B902
+                await self.on_error(self.subscriber, event, e)
+            finally:
+                self.delivered += 1
+                self.queue.task_done()
+
+    async def put(self, event: MessageEvent) -> None:
+        """
+        Queue an event, waiting while the queue is full.
+
+        Parameters
+        ----------
+        event : MessageEvent
+            The event to deliver.
+        """
+        await self.queue.put(event)
+
+    def stop(self) -> None:
+        """Stop the workers, dropping the events not delivered yet."""
+        for worker in self._workers:
+            worker.cancel()
@@ -0,0 +1,300 @@
+"""
+Per-stage latency histograms, counters and gauges of the daemon.
+
+The stages time themselves into the shared `METRICS` registry, which renders them in
+the Prometheus text format, or as a dict to dump as JSON. Gauges are read from a
+callback when rendered, like the depth of a queue or the hits of a cache.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.models.literals_types_constants import LATENCY_BUCKETS, METRICS_PREFIX
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    """
+    Normalize labels, to a hashable key.
+
+    Parameters
+    ----------
+    labels : Dict[str, str]
+        The labels.
+
+    Returns
+    -------
+    : Labels
+        The labels, sorted by name.
+    """
+    return tuple(sorted(labels.items())) if len(labels) > 1 else tuple(labels.items())
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    """
+    Format labels, in the Prometheus text format.
+
+    Parameters
+    ----------
+    labels : Labels
+        The labels.
+    extra : Optional[Tuple[str, str]]
+        A label to add, like the bucket of a histogram.
+
+    Returns
+    -------
+    : str
+        The formatted labels, empty if there are none.
+    """
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Histogram(object):
+    """A cumulative histogram of observations."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """
+        Construct the histogram.
+
+        Parameters
+        ----------
+        buckets : Sequence[float]
+            The upper bounds of the buckets, the +Inf one is implicit.
+        """
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Add an observation.
+
+        Parameters
+        ----------
+        value : float
+            The observed value.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """
+        Get the cumulative count of each bucket.
+
+        Returns
+        -------
+        : List[Tuple[str, int]]
+            The upper bound and cumulative count of each bucket.
+        """
+        total = 0
+        cumulative = []
+        for bound, count in zip([*self.buckets, float("inf")], self.counts):
+            total += count
+            cumulative.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return cumulative
+
+
+class MetricsRegistry(object):
+    """The histograms, counters and gauges of the daemon."""
+
+    def __init__(self, prefix: str = METRICS_PREFIX) -> None:
+        """
+        Construct the registry.
+
+        Parameters
+        ----------
+        prefix : str
+            The prefix of the metric names.
+        """
+        self.prefix = prefix
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, Callable[[], float]]] = {}
+        self._buckets: Dict[str, Sequence[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        **labels: str,
+    ) -> None:
+        """
+        Observe a value, like the seconds of a stage.
+
+        Parameters
+        ----------
+        name : str
+            The histogram name.
+        value : float
+            The observed value.
+        buckets : Sequence[float]
+            The buckets of the histogram, used when it's created.
+        **labels : str
+            The labels of the observation.
+        """
+        key = _labels(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(self._buckets.setdefault(name, buckets))
+            series[key].observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """
+        Increment a counter.
+
+        Parameters
+        ----------
+        name : str
+            The counter name.
+        value : float
+            The increment.
+        **labels : str
+            The labels of the counter.
+        """
+        key = _labels(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def gauge(self, name: str, read: Callable[[], float], **labels: str) -> None:
+        """
+        Register a gauge, read when the metrics are rendered.
+
+        Parameters
+        ----------
+        name : str
+            The gauge name.
+        read : Callable[[], float]
+            Read the current value.
+        **labels : str
+            The labels of the gauge.
+        """
+        with self._lock:
+            self.gauges.setdefault(name, {})[_labels(labels)] = read
+
+    @contextmanager
+    def timed(self, name: str, **labels: str) -> Iterator[None]:
+        """
+        Observe the seconds a block of code takes.
+
+        Parameters
+        ----------
+        name : str
+            The histogram name.
+        **labels : str
+            The labels of the observation.
+
+        Yields
+        ------
+        : None
+            While the block runs.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def render_prometheus(self) -> str:
+        """
+        Render the metrics, in the Prometheus text format.
+
+        Returns
+        -------
+        : str
+            The metrics.
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name, counters in sorted(self.counters.items()):
+                lines.append(f"# TYPE {self.prefix}{name} counter")
+                for labels, value in counters.items():
+                    lines.append(f"{self.prefix}{name}{_format_labels(labels)} {value}")
+            for name, gauges in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {self.prefix}{name} gauge")
+                for labels, read in gauges.items():
+                    lines.append(
+                        f"{self.prefix}{name}{_format_labels(labels)} {read()}"
+                    )
+            for name, histograms in sorted(self.histograms.items()):
+                metric = f"{self.prefix}{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in histograms.items():
+                    for bound, count in histogram.cumulative():
+                        bucket = _format_labels(labels, ("le", bound))
+                        lines.append(f"{metric}_bucket{bucket} {count}")
+                    formatted = _format_labels(labels)
+                    lines.append(f"{metric}_sum{formatted} {histogram.sum}")
+                    lines.append(f"{metric}_count{formatted} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def as_dict(self) -> Dict[str, List[Dict]]:
+        """
+        Get the metrics, as JSON types.
+
+        Returns
+        -------
+        : Dict[str, List[Dict]]
+            The series of each metric, with their labels.
+        """
+        metrics: Dict[str, List[Dict]] = {}
+        with self._lock:
+            for name, counters in self.counters.items():
+                metrics[name] = [
+                    {"labels": dict(labels), "value": value}
+                    for labels, value in counters.items()
+                ]
+            for name, gauges in self.gauges.items():
+                metrics[name] = [
+                    {"labels": dict(labels), "value": read()}
+                    for labels, read in gauges.items()
+                ]
+            for name, histograms in self.histograms.items():
+                metrics[name] = [
+                    {
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "buckets": dict(histogram.cumulative()),
+                    }
+                    for labels, histogram in histograms.items()
+                ]
+        return metrics
+
+    def dump_json(self, path: str) -> None:
+        """
+        Dump the metrics to a JSON file, replacing it atomically.
+
+        Parameters
+        ----------
+        path : str
+            The JSON file.
+        """
+        metrics = {"ts": time.time(), "metrics": self.as_dict()}
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(metrics, file)
+        os.replace(f"{path}.tmp", path)
+
+
+METRICS = MetricsRegistry()
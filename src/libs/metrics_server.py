@@ -0,0 +1,98 @@
+"""
+Expose the metrics of the daemon, over a local HTTP endpoint or a JSON file.
+
+The endpoint runs on the twisted reactor, `/metrics` serves the Prometheus text format
+and `/metrics.json` the same metrics as JSON.
+"""
+
+import asyncio
+import json
+
+from twisted.internet.interfaces import IListeningPort
+from twisted.web.resource import Resource
+from twisted.web.server import Request, Site
+
+from src.libs.metrics import METRICS, MetricsRegistry
+from src.models.literals_types_constants import METRICS_DUMP_INTERVAL, METRICS_HOST
+
+
+class MetricsResource(Resource):
+    """Render the metrics, as Prometheus text or as JSON."""
+
+    isLeaf = True
+
+    def __init__(self, registry: MetricsRegistry = METRICS) -> None:
+        """
+        Construct the resource.
+
+        Parameters
+        ----------
+        registry : MetricsRegistry
+            The metrics to render.
+        """
+        super().__init__()
+        self.registry = registry
+
+    def render_GET(self, request: Request) -> bytes:  # noqa: N802
+        """
+        Render the metrics.
+
+        Parameters
+        ----------
+        request : Request
+            The request.
+
+        Returns
+        -------
+        : bytes
+            The metrics.
+        """
+        if request.path == b"/metrics.json":
+            request.setHeader(b"content-type", b"application/json")
+            return json.dumps(self.registry.as_dict()).encode()
+        if request.path == b"/metrics":
+            request.setHeader(b"content-type", b"text/plain; version=0.0.4")
+            return self.registry.render_prometheus().encode()
+        request.setResponseCode(404)
+        return b"Not found, try /metrics or /metrics.json\n"
+
+
+def listen_metrics(port: int, host: str = METRICS_HOST) -> IListeningPort:
+    """
+    Serve the metrics, on a local port.
+
+    Parameters
+    ----------
+    port : int
+        The port.
+    host : str
+        The interface to listen on, only the local one by default.
+
+    Returns
+    -------
+    : IListeningPort
+        The listening port.
+    """
+    from twisted.internet import reactor
+
+    return reactor.listenTCP(  # type: ignore
+        port, Site(MetricsResource()), interface=host
+    )
+
+
+async def dump_metrics_periodically(
+    path: str, interval: float = METRICS_DUMP_INTERVAL
+) -> None:
+    """
+    Dump the metrics to a JSON file, every interval.
+
+    Parameters
+    ----------
+    path : str
+        The JSON file, replaced on each dump.
+    interval : float
+        The seconds between the dumps.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.get_running_loop().run_in_executor(None, METRICS.dump_json, path)
@@ -0,0 +1,116 @@
+"""
+Keep the models loaded in Ollama, so the first turn doesn't pay for loading them.
+
+The models are loaded with an empty chat at startup, pinned for `keep_alive` seconds,
+and loaded again before that expires, as long as a session chatted recently. An idle
+daemon lets Ollama unload them.
+"""
+
+import asyncio
+import time
+from typing import List, Optional
+
+from src.libs.fair_scheduler import LLM_SCHEDULER
+from src.libs.ollama_native import OLLAMA
+from src.logger import Logger
+from src.models.literals_types_constants import (
+    WARM_ACTIVE_WINDOW,
+    WARM_KEEP_ALIVE,
+    EventsErrorTypes,
+)
+
+
+class ModelWarmer(object):
+    """Load the models at startup, and keep them loaded while they are used."""
+
+    def __init__(
+        self,
+        models: List[str],
+        keep_alive: float = WARM_KEEP_ALIVE,
+        active_window: float = WARM_ACTIVE_WINDOW,
+        logger: Optional[Logger] = None,
+    ) -> None:
+        """
+        Construct the warmer.
+
+        Parameters
+        ----------
+        models : List[str]
+            The models to keep loaded.
+        keep_alive : float
+            The seconds Ollama keeps a model loaded, a negative value keeps it forever.
+        active_window : float
+            The seconds since the last chat, during which the models are kept loaded.
+        logger : Optional[Logger]
+            The logger of the loads, and their failures.
+        """
+        self.models = list(dict.fromkeys(models))
+        self.keep_alive = keep_alive
+        self.active_window = active_window
+        self.logger = logger
+        self.loads = 0
+        self._granted = 0
+        self._active_at = time.monotonic()
+
+    @property
+    def interval(self) -> float:
+        """
+        Get the seconds between loads, half of the keep alive.
+
+        Returns
+        -------
+        : float
+            The seconds.
+        """
+        return self.keep_alive / 2
+
+    def is_active(self) -> bool:
+        """
+        Check if a session chatted within the active window.
+
+        Returns
+        -------
+        : bool
+            If the models should stay loaded.
+        """
+        granted = sum(LLM_SCHEDULER.granted.values())
+        if granted != self._granted:
+            self._granted = granted
+            self._active_at = time.monotonic()
+        return time.monotonic() - self._active_at < self.active_window
+
+    async def _log(self, message: str, message_type: EventsErrorTypes) -> None:
+        """
+        Log a message, if there is a logger.
+
+        Parameters
+        ----------
+        message : str
+            The message.
+        message_type : EventsErrorTypes
+            The type of the message.
+        """
+        if self.logger is not None:
+            await self.logger.log(message, message_type)
+
+    async def warm(self) -> None:
+        """Load the models, and pin them for the keep alive."""
+        for model in self.models:
+            try:
+                load = await OLLAMA.load(model, self.keep_alive)
+            except Exception as e:  # noqa: B902
+                await self._log(f'Failed to load "{model}": {e!r}', "warning")
+                continue
+            self.loads += 1
+            await self._log(f'Loaded "{model}" in {load:.2f}s', "info")
+
+    async def run(self) -> None:
+        """Load the models now, and again before they expire, while active."""
+        await self.warm()
+        if self.keep_alive < 0:
+            return  # Pinned forever
+
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.is_active():
+                await self.warm()
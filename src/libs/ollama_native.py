@@ -0,0 +1,372 @@
+"""
+Chats with Ollama directly, without the langchain wrappers.
+
+A single async client, with pooled keep-alive connections, is shared by the chatters
+and summarizers of all the sessions. The NDJSON lines of an answer are relayed as
+light chunks, instead of langchain messages, and the timings Ollama reports with its
+last line (load, prompt evaluation and evaluation) are observed as metrics.
+
+A session can also keep the context Ollama returns with a generated answer, its
+evaluated tokens, and send only the new prompt with it on the next turn, instead of
+the whole history, so the prompt evaluation doesn't grow with the conversation.
+
+Environment
+-----------
+OLLAMA_HOST : The Ollama server, "http://127.0.0.1:11434" by default.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Union, cast
+
+import httpx
+from langchain_core.messages.base import BaseMessage
+from ollama import AsyncClient
+
+from src.libs.metrics import METRICS
+from src.models.literals_types_constants import (
+    OLLAMA_KEEPALIVE_CONNECTIONS,
+    OLLAMA_ROLES,
+    TOKEN_RATE_BUCKETS,
+    TRANSCRIPT_NAMES,
+)
+
+
+@dataclass(slots=True)
+class OllamaChunk:
+    """
+    A chunk of a streamed answer, read like a langchain `BaseMessageChunk`.
+
+    Parameters
+    ----------
+    content : str
+        The text of the chunk.
+    type : str
+        The type of the message, always "ai".
+    """
+
+    content: str
+    type: str = "ai"
+
+
+def to_ollama_messages(messages: List[BaseMessage]) -> List[Dict[str, str]]:
+    """
+    Convert the messages to the chat messages of Ollama.
+
+    Parameters
+    ----------
+    messages : List[BaseMessage]
+        The messages, the ones without a chat role are skipped.
+
+    Returns
+    -------
+    : List[Dict[str, str]]
+        The role and content of each message.
+    """
+    return [
+        {"role": OLLAMA_ROLES[message.type], "content": cast(str, message.content)}
+        for message in messages
+        if message.type in OLLAMA_ROLES
+    ]
+
+
+def to_transcript(messages: List[BaseMessage]) -> str:
+    """
+    Render the messages as a single prompt, the history followed by the last one.
+
+    Parameters
+    ----------
+    messages : List[BaseMessage]
+        The messages, the ones without a chat role are skipped.
+
+    Returns
+    -------
+    : str
+        The prompt.
+    """
+    *history, prompt = messages
+    lines = [
+        f"{TRANSCRIPT_NAMES[message.type]}: {message.content}"
+        for message in history
+        if message.type in TRANSCRIPT_NAMES
+    ]
+    if not lines:
+        return cast(str, prompt.content)
+    return "\n\n".join(["Our conversation so far:", *lines, cast(str, prompt.content)])
+
+
+@dataclass
+class OllamaContext:
+    """
+    The context Ollama returned with the last answer of a session.
+
+    Parameters
+    ----------
+    tokens : Optional[List[int]]
+        The evaluated tokens of the conversation, None if there is none to reuse.
+    answer : str
+        The answer the tokens end with.
+    """
+
+    tokens: Optional[List[int]] = None
+    answer: str = field(default="", repr=False)
+
+    def delta(self, messages: List[BaseMessage]) -> Optional[str]:
+        """
+        Get the new prompt, if the messages continue the context.
+
+        They do when the message before the new prompt is the last answer. After a
+        summary, or a turn that didn't complete, they don't.
+
+        Parameters
+        ----------
+        messages : List[BaseMessage]
+            The history window, ending with the new prompt.
+
+        Returns
+        -------
+        : Optional[str]
+            The new prompt, or None if the whole history has to be sent.
+        """
+        if self.tokens is None or len(messages) < 2:
+            return None
+        previous, prompt = messages[-2], messages[-1]
+        if (
+            previous.type != "ai"
+            or str(previous.content).strip() != self.answer.strip()
+        ):
+            return None
+        return cast(str, prompt.content)
+
+
+def observe_timings(model: str, done: Mapping[str, Any]) -> Dict[str, float]:
+    """
+    Observe the timings Ollama reports with the last line of an answer.
+
+    Parameters
+    ----------
+    model : str
+        The model that answered.
+    done : Mapping[str, Any]
+        The last line of the answer.
+
+    Returns
+    -------
+    : Dict[str, float]
+        The durations, in seconds, and the counts of tokens.
+    """
+    timings = {
+        "load_duration": done.get("load_duration", 0) / 1e9,
+        "prompt_eval_count": done.get("prompt_eval_count", 0),
+        "prompt_eval_duration": done.get("prompt_eval_duration", 0) / 1e9,
+        "eval_count": done.get("eval_count", 0),
+        "eval_duration": done.get("eval_duration", 0) / 1e9,
+    }
+    METRICS.observe("ollama_load_seconds", timings["load_duration"], model=model)
+    METRICS.observe(
+        "ollama_prompt_eval_seconds", timings["prompt_eval_duration"], model=model
+    )
+    METRICS.observe("ollama_eval_seconds", timings["eval_duration"], model=model)
+    METRICS.inc(
+        "ollama_prompt_eval_tokens_total", timings["prompt_eval_count"], model=model
+    )
+    METRICS.inc("ollama_eval_tokens_total", timings["eval_count"], model=model)
+    if timings["eval_duration"] > 0:
+        METRICS.observe(
+            "ollama_eval_tokens_per_second",
+            timings["eval_count"] / timings["eval_duration"],
+            buckets=TOKEN_RATE_BUCKETS,
+            model=model,
+        )
+    return timings
+
+
+class OllamaNative(object):
+    """A long lived and pooled client of Ollama."""
+
+    def __init__(
+        self, keepalive_connections: int = OLLAMA_KEEPALIVE_CONNECTIONS
+    ) -> None:
+        """
+        Construct the Ollama client.
+
+        Parameters
+        ----------
+        keepalive_connections : int
+            The maximum idle connections kept open to Ollama.
+        """
+        self.keepalive_connections = keepalive_connections
+        self._client: Optional[AsyncClient] = None
+
+    @property
+    def client(self) -> AsyncClient:
+        """
+        Get the shared client, creating it on first use.
+
+        Returns
+        -------
+        : AsyncClient
+            The client.
+        """
+        if self._client is None:
+            self._client = AsyncClient(
+                limits=httpx.Limits(
+                    max_keepalive_connections=self.keepalive_connections
+                ),
+            )
+        return self._client
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[BaseMessage],
+        timings: Optional[Dict[str, float]] = None,
+        keep_alive: Optional[Union[float, str]] = None,
+    ) -> AsyncIterator[OllamaChunk]:
+        """
+        Stream the answer to a chat.
+
+        Closing the stream closes its request, so Ollama stops generating.
+
+        Parameters
+        ----------
+        model : str
+            The model to chat with.
+        messages : List[BaseMessage]
+            The chat messages.
+        timings : Optional[Dict[str, float]]
+            Filled with the timings Ollama reports, once the answer is complete.
+        keep_alive : Optional[Union[float, str]]
+            How long Ollama keeps the model loaded after the answer, its default if
+            None.
+
+        Yields
+        ------
+        : OllamaChunk
+            The chunks of the answer.
+        """
+        lines = await self.client.chat(
+            model=model,
+            messages=to_ollama_messages(messages),
+            stream=True,
+            keep_alive=keep_alive,
+        )
+        # Read to the end, so the connection goes back to the pool
+        async for line in cast(AsyncIterator[Mapping[str, Any]], lines):
+            if not line.get("done"):
+                yield OllamaChunk(line["message"]["content"])
+            elif timings is not None:
+                timings.update(observe_timings(model, line))
+
+    async def generate(
+        self,
+        model: str,
+        messages: List[BaseMessage],
+        context: OllamaContext,
+        timings: Optional[Dict[str, float]] = None,
+        keep_alive: Optional[Union[float, str]] = None,
+    ) -> AsyncIterator[OllamaChunk]:
+        """
+        Stream the answer to the last message, reusing the context when possible.
+
+        Only the new prompt is sent when the messages continue the context, the whole
+        history otherwise. The context is updated once the answer is complete, and
+        dropped if it doesn't.
+
+        Parameters
+        ----------
+        model : str
+            The model to ask.
+        messages : List[BaseMessage]
+            The history window, ending with the new prompt.
+        context : OllamaContext
+            The context of the session.
+        timings : Optional[Dict[str, float]]
+            Filled with the timings Ollama reports, once the answer is complete.
+        keep_alive : Optional[Union[float, str]]
+            How long Ollama keeps the model loaded after the answer, its default if
+            None.
+
+        Yields
+        ------
+        : OllamaChunk
+            The chunks of the answer.
+        """
+        prompt = context.delta(messages)
+        reused = prompt is not None
+        METRICS.inc("ollama_context_turns_total", model=model, reused=str(reused))
+        lines = await self.client.generate(
+            model=model,
+            prompt=prompt if reused else to_transcript(messages),  # type: ignore
+            context=context.tokens if reused else None,
+            stream=True,
+            keep_alive=keep_alive,
+        )
+        context.tokens = None
+
+        answer = []
+        async for line in cast(AsyncIterator[Mapping[str, Any]], lines):
+            if not line.get("done"):
+                answer.append(line["response"])
+                yield OllamaChunk(line["response"])
+                continue
+
+            context.tokens, context.answer = line.get("context"), "".join(answer)
+            if timings is not None:
+                timings.update(observe_timings(model, line))
+                timings["reused_context"] = reused
+
+    async def chat(
+        self,
+        model: str,
+        messages: List[BaseMessage],
+        keep_alive: Optional[Union[float, str]] = None,
+    ) -> str:
+        """
+        Get the whole answer to a chat.
+
+        Parameters
+        ----------
+        model : str
+            The model to chat with.
+        messages : List[BaseMessage]
+            The chat messages.
+        keep_alive : Optional[Union[float, str]]
+            How long Ollama keeps the model loaded after the answer, its default if
+            None.
+
+        Returns
+        -------
+        : str
+            The answer.
+        """
+        response = await self.client.chat(
+            model=model, messages=to_ollama_messages(messages), keep_alive=keep_alive
+        )
+        observe_timings(model, cast(Mapping[str, Any], response))
+        return response["message"]["content"]  # type: ignore
+
+    async def load(self, model: str, keep_alive: Optional[Union[float, str]]) -> float:
+        """
+        Load a model in Ollama, with an empty chat, and keep it loaded.
+
+        Parameters
+        ----------
+        model : str
+            The model to load.
+        keep_alive : Optional[Union[float, str]]
+            How long Ollama keeps the model loaded, its default if None.
+
+        Returns
+        -------
+        : float
+            The seconds Ollama took to load the model, 0 if it was loaded already.
+        """
+        response = await self.client.chat(
+            model=model, messages=[], keep_alive=keep_alive
+        )
+        load = cast(Mapping[str, Any], response).get("load_duration", 0) / 1e9
+        METRICS.observe("ollama_load_seconds", load, model=model)
+        return load
+
+
+OLLAMA = OllamaNative()
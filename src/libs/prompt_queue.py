@@ -0,0 +1,171 @@
+"""
+A bounded FIFO queue of the prompts waiting for the current turn to finish.
+
+When the queue is full, its policy decides what happens to a new prompt:
+
+- "latest": the oldest waiting prompt is dropped.
+- "coalesce": the prompt is merged into the newest waiting one.
+- "reject": the prompt is refused.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Optional
+
+from src.models.literals_types_constants import (
+    PROMPT_QUEUE_POLICY,
+    PROMPT_QUEUE_SIZE,
+    QueuePoliciesLiteral,
+)
+
+
+@dataclass
+class QueuedPrompt:
+    """
+    A prompt waiting in the queue.
+
+    Parameters
+    ----------
+    content : str
+        The prompt.
+    events : int
+        The amount of file events coalesced into the prompt.
+    enqueued_at : float
+        The monotonic time the prompt was queued at.
+    """
+
+    content: str
+    events: int = 1
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class PromptQueue(object):
+    """A bounded FIFO queue of prompts, with a policy for when it's full."""
+
+    def __init__(
+        self,
+        maxsize: int = PROMPT_QUEUE_SIZE,
+        policy: QueuePoliciesLiteral = PROMPT_QUEUE_POLICY,
+        merge: Optional[Callable[[str, str], str]] = None,
+    ) -> None:
+        """
+        Construct the queue.
+
+        Parameters
+        ----------
+        maxsize : int
+            The maximum amount of waiting prompts.
+        policy : QueuePoliciesLiteral
+            What to do with a new prompt when the queue is full.
+        merge : Optional[Callable[[str, str], str]]
+            Merge a waiting prompt and a new one, for the "coalesce" policy. By
+            default, the new prompt replaces the waiting one.
+        """
+        self.maxsize = maxsize
+        self.policy = policy
+        self.merge = merge
+        self._prompts: Deque[QueuedPrompt] = deque()
+        self._ready = asyncio.Event()
+
+        self.max_depth = 0
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.last_wait = 0.0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def depth(self) -> int:
+        """
+        Get the amount of waiting prompts.
+
+        Returns
+        -------
+        : int
+            The queue depth.
+        """
+        return len(self._prompts)
+
+    def put(self, content: str, events: int = 1) -> bool:
+        """
+        Queue a prompt, applying the policy if the queue is full.
+
+        Parameters
+        ----------
+        content : str
+            The prompt.
+        events : int
+            The amount of file events coalesced into the prompt.
+
+        Returns
+        -------
+        : bool
+            Whether the prompt was accepted.
+        """
+        if len(self._prompts) >= self.maxsize:
+            if self.policy == "reject":
+                self.rejected += 1
+                return False
+            if self.policy == "coalesce":
+                newest = self._prompts[-1]
+                newest.content = (
+                    self.merge(newest.content, content) if self.merge else content
+                )
+                newest.events += events
+                self.coalesced += 1
+                return True
+            self._prompts.popleft()
+            self.dropped += 1
+
+        self._prompts.append(QueuedPrompt(content, events))
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, len(self._prompts))
+        self._ready.set()
+        return True
+
+    async def get(self) -> QueuedPrompt:
+        """
+        Wait for the oldest prompt, and take it out of the queue.
+
+        Returns
+        -------
+        : QueuedPrompt
+            The prompt.
+        """
+        while not self._prompts:
+            self._ready.clear()
+            await self._ready.wait()
+
+        prompt = self._prompts.popleft()
+        self.dequeued += 1
+        self.last_wait = time.monotonic() - prompt.enqueued_at
+        self.total_wait += self.last_wait
+        self.max_wait = max(self.max_wait, self.last_wait)
+        return prompt
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Get the metrics of the queue.
+
+        Returns
+        -------
+        : Dict[str, float]
+            The depth, counters and wait times (in seconds) of the queue.
+        """
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "dequeued": self.dequeued,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "last_wait": self.last_wait,
+            "mean_wait": self.total_wait / self.dequeued if self.dequeued else 0.0,
+            "max_wait": self.max_wait,
+        }
@@ -0,0 +1,163 @@
+"""
+Tokenize a prompt into text spans and tag nodes, in a single pass.
+
+A tag is a line that contains one of the special prompt tags:
+
+>>> <-- include: file://file.txt -->
+>>> <-- include: https://www.example.com -->
+>>> <-- search: a needle -->
+>>> <-- ask: a question -->
+>>> <-- run: `ls` -->
+>>> <-- run: `git log -3` idempotent -->
+>>> <!-- a comment -->
+
+The whole line is replaced by the rendered tag, comments and empty lines are dropped.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, List, Optional
+
+from src.models.literals_types_constants import TagKindsLiteral
+
+_TAG = re.compile(
+    r"<!--.*?-->|<--\s*(?P<name>include|search|ask|run):\s*(?P<argument>.*?)\s*-->"
+)
+_COMMENT = re.compile(r"<!--.*?-->")
+_EMPTY_LINES = re.compile(r"\n{2,}")
+_HTTP_URL = re.compile(r"https?://\S*")
+_RUN_COMMAND = re.compile(r"`(.+)`(?:\s+(idempotent))?")
+
+
+@dataclass
+class TextSpan:
+    """
+    A span of free text from the prompt.
+
+    Parameters
+    ----------
+    text : str
+        The text, without empty lines.
+    """
+
+    text: str
+
+
+@dataclass
+class TagNode:
+    """
+    A special tag found in the prompt.
+
+    Parameters
+    ----------
+    kind : TagKindsLiteral
+        The kind of tag.
+    argument : str
+        The tag argument, a path, an url, a needle, a question or a command.
+    padding : str
+        The whitespace found before the tag.
+    line : str
+        The whole line where the tag was found.
+    flags : str
+        The flag after the tag argument, like "idempotent" on run tags.
+    """
+
+    kind: TagKindsLiteral
+    argument: str
+    padding: str
+    line: str
+    flags: str = ""
+
+
+PromptNode = TextSpan | TagNode
+TagHandler = Callable[[TagNode], str]
+AsyncTagHandler = Callable[[TagNode], Awaitable[str]]
+TagFingerprint = Callable[[TagNode], Optional[Hashable]]
+
+
+def _tag_node(match: re.Match, line: str, column: int) -> TagNode | TextSpan:
+    """
+    Build the node of a matched tag line.
+
+    Parameters
+    ----------
+    match : re.Match
+        The match of the tag.
+    line : str
+        The whole line where the tag was found.
+    column : int
+        The position of the tag in the line.
+
+    Returns
+    -------
+    : TagNode | TextSpan
+        The tag node, or a text span when the tag arguments aren't valid.
+    """
+    name, argument = match.group("name", "argument")
+    prefix = line[:column]
+    padding = prefix[len(prefix.rstrip(" \t")) :]
+    kind: Optional[TagKindsLiteral] = None
+    flags = ""
+
+    if name is None or _COMMENT.search(line):
+        kind, argument = "comment", ""
+    elif name == "include" and argument.startswith("file://"):
+        kind, argument = "include-file", argument[len("file://") :]
+    elif name == "include" and _HTTP_URL.fullmatch(argument):
+        kind = "include-http"
+    elif name == "run" and (command := _RUN_COMMAND.fullmatch(argument)):
+        kind, argument, flags = "run", command[1], command[2] or ""
+    elif name in ("search", "ask"):
+        kind = name
+
+    if kind is None:
+        return TextSpan(line)
+    return TagNode(kind, argument, padding, line, flags)
+
+
+def _append_text(nodes: List[PromptNode], text: str) -> None:
+    """
+    Append the text, without empty lines, as a text span.
+
+    Parameters
+    ----------
+    nodes : List[PromptNode]
+        The nodes to append to.
+    text : str
+        The text found between two tags.
+    """
+    text = _EMPTY_LINES.sub("\n", text).strip("\n")
+    if text:
+        nodes.append(TextSpan(text))
+
+
+def tokenize(prompt: str) -> List[PromptNode]:
+    """
+    Parse the prompt once, into text spans and tag nodes.
+
+    Parameters
+    ----------
+    prompt : str
+        The raw content from the prompt file.
+
+    Returns
+    -------
+    : List[PromptNode]
+        The text spans and tag nodes, in the prompt order.
+    """
+    nodes: List[PromptNode] = []
+    position = 0
+    for match in _TAG.finditer(prompt):
+        if match.start() < position:
+            continue  # Only the first tag of a line is processed
+
+        line_start = prompt.rfind("\n", 0, match.start()) + 1
+        line_end = prompt.find("\n", match.end())
+        line_end = len(prompt) if line_end == -1 else line_end
+
+        _append_text(nodes, prompt[position:line_start])
+        line = prompt[line_start:line_end]
+        nodes.append(_tag_node(match, line, match.start() - line_start))
+        position = line_end
+    _append_text(nodes, prompt[position:])
+    return nodes
@@ -0,0 +1,119 @@
+"""
+Cache the answers of the chat turns, by their exact prompt.
+
+A turn is keyed by a hash of the model, the options that change its answer, and the
+message window, normalized so a prompt saved again with other trailing whitespace
+still hits. The answers are kept in a `TTLCache`, persisted to SQLite when a database
+is given, so the processes and runs sharing it reuse each other's answers. A cached
+answer is replayed as a stream, so it's printed and recorded like a live one.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, AsyncIterator, List, Mapping, Optional
+
+from langchain_core.messages.base import BaseMessage
+
+from src.libs.metrics import METRICS
+from src.libs.ollama_native import OllamaChunk
+from src.libs.ttl_cache import TTLCache
+from src.models.literals_types_constants import (
+    RESPONSE_CACHE_ENTRIES,
+    RESPONSE_CACHE_TTL,
+)
+
+# A word and the whitespace after it, or leading whitespace
+_REPLAY_CHUNK = re.compile(r"\s+|\S+\s*")
+
+
+def normalize_content(content: Any) -> str:
+    """
+    Normalize the content of a message, ignoring the whitespace around its lines.
+
+    Parameters
+    ----------
+    content : Any
+        The content of the message.
+
+    Returns
+    -------
+    : str
+        The normalized content.
+    """
+    return "\n".join(line.rstrip() for line in str(content).strip().splitlines())
+
+
+def response_key(
+    model: str, options: Mapping[str, Any], messages: List[BaseMessage]
+) -> str:
+    """
+    Hash a chat turn, the model, its options and the message window.
+
+    Parameters
+    ----------
+    model : str
+        The model asked.
+    options : Mapping[str, Any]
+        The options of the model that change its answer.
+    messages : List[BaseMessage]
+        The history window, ending with the new prompt.
+
+    Returns
+    -------
+    : str
+        The key of the turn.
+    """
+    window = [
+        [message.type, normalize_content(message.content)] for message in messages
+    ]
+    turn = json.dumps([model, dict(sorted(options.items())), window], default=str)
+    return hashlib.blake2b(turn.encode(), digest_size=16).hexdigest()
+
+
+async def replay(answer: str) -> AsyncIterator[OllamaChunk]:
+    """
+    Stream a cached answer, a word at a time.
+
+    Parameters
+    ----------
+    answer : str
+        The cached answer.
+
+    Yields
+    ------
+    : OllamaChunk
+        The chunks of the answer.
+    """
+    for word in _REPLAY_CHUNK.findall(answer):
+        yield OllamaChunk(word)
+        await asyncio.sleep(0)  # Let the other sessions run
+
+
+def open_response_cache(
+    path: Optional[str],
+    ttl: float = RESPONSE_CACHE_TTL,
+    max_entries: int = RESPONSE_CACHE_ENTRIES,
+) -> TTLCache[str]:
+    """
+    Open the cache of the answers, and expose its hits and misses as metrics.
+
+    Parameters
+    ----------
+    path : Optional[str]
+        The SQLite database the answers are persisted to, only in memory if None.
+    ttl : float
+        The seconds an answer is reused.
+    max_entries : int
+        The maximum amount of answers, the least recently used are evicted.
+
+    Returns
+    -------
+    : TTLCache[str]
+        The answers, by the key of their turn.
+    """
+    cache: TTLCache[str] = TTLCache(ttl, max_entries, path=path, table="responses")
+    METRICS.gauge("cache_hits", lambda: cache.hits, cache="Response")
+    METRICS.gauge("cache_misses", lambda: cache.misses, cache="Response")
+    return cache
@@ -0,0 +1,148 @@
+"""
+Trace the events of a turn, from the prompt to its answer and summary.
+
+While tracing, every event carries the trace ID of its turn: an event published while
+a subscriber handles another event inherits its trace ID, through a context variable,
+and an event published outside of any turn starts a new one. Without a tracer, the
+events carry none, so they cost no ID.
+
+The `Tracer` writes a timed span for each subscriber handling an event, in the Chrome
+trace event format, so a file can be opened in `chrome://tracing` or Perfetto. Each
+turn is a process there, with a thread per subscriber, showing the waterfall of the
+turn.
+"""
+
+import itertools
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from src.libs.dedupe_window import DedupeWindow
+
+# The trace of the event being handled, if any
+TRACE_ID: ContextVar[Optional[int]] = ContextVar("trace_id", default=None)
+
+# Random high bits, so the traces of different runs don't collide in a file. It's
+# kept under 2**53, as the trace viewers parse the IDs as doubles.
+_next_trace_id = itertools.count(random.getrandbits(31) << 21).__next__
+
+
+def current_trace_id() -> int:
+    """
+    Get the trace ID of the event being handled, or start a new trace.
+
+    Returns
+    -------
+    : int
+        The trace ID.
+    """
+    trace_id = TRACE_ID.get()
+    return _next_trace_id() if trace_id is None else trace_id
+
+
+class Tracer(object):
+    """Write the spans of the subscribers, to a Chrome trace event file."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Open the trace file.
+
+        Parameters
+        ----------
+        path : str
+            The trace file, appended to.
+        """
+        self.path = path
+        self.spans = 0
+        self._lanes: Dict[str, int] = {}
+        self._named = DedupeWindow()  # The recently named turns and lanes
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() == 0:
+            # The closing bracket is optional in the JSON array format
+            self._file.write("[\n")
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        """
+        Write a trace event.
+
+        Parameters
+        ----------
+        record : Dict[str, Any]
+            The trace event.
+        """
+        self._file.write(json.dumps(record, ensure_ascii=False) + ",\n")
+
+    def _name(self, trace_id: int, lane: str) -> int:
+        """
+        Name the turn and lane of a span, the first time they are seen.
+
+        Parameters
+        ----------
+        trace_id : int
+            The trace ID, the process of the span.
+        lane : str
+            The lane of the span, its thread.
+
+        Returns
+        -------
+        : int
+            The thread ID of the lane.
+        """
+        tid = self._lanes.setdefault(lane, len(self._lanes) + 1)
+        meta = {"ph": "M", "pid": trace_id, "tid": tid}
+        if self._named.add(trace_id):
+            self._write(
+                {**meta, "name": "process_name", "args": {"name": f"turn {trace_id:x}"}}
+            )
+        if self._named.add((trace_id, tid)):
+            self._write({**meta, "name": "thread_name", "args": {"name": lane}})
+        return tid
+
+    @contextmanager
+    def span(self, name: str, lane: str, trace_id: int, **args: Any) -> Iterator[None]:
+        """
+        Time a block of code, as a span of a turn.
+
+        Parameters
+        ----------
+        name : str
+            The name of the span.
+        lane : str
+            The lane of the span, like the subscriber.
+        trace_id : int
+            The trace ID of the turn.
+        **args : Any
+            The attributes of the span.
+
+        Yields
+        ------
+        : None
+            While the block runs.
+        """
+        started = time.time_ns()
+        try:
+            yield
+        finally:
+            self._write(
+                {
+                    "name": name,
+                    "cat": lane,
+                    "ph": "X",
+                    "ts": started // 1000,
+                    "dur": (time.time_ns() - started) // 1000,
+                    "pid": trace_id,
+                    "tid": self._name(trace_id, lane),
+                    "args": args,
+                }
+            )
+            self.spans += 1
+
+    def close(self) -> None:
+        """Write the pending spans, and close the trace file."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
@@ -0,0 +1,176 @@
+"""
+A small, thread safe cache where entries expire after some time.
+
+Entries live in memory, and optionally in a SQLite table so they survive restarts and
+are shared between processes. The table is trimmed to `max_entries` too, dropping the
+expired entries and then the ones closest to expiring.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """LRU cache, where entries expire `ttl` seconds after they were stored."""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int,
+        path: Optional[str] = None,
+        table: str = "cache",
+    ) -> None:
+        """
+        Construct the cache.
+
+        Parameters
+        ----------
+        ttl : float
+            The seconds an entry is valid.
+        max_entries : int
+            The maximum amount of entries, the least recently used are evicted.
+        path : Optional[str]
+            The SQLite database where the entries are persisted, if any. The keys and
+            values must then be serializable to JSON.
+        table : str
+            The table of the SQLite database.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, Tuple[float, V]] = OrderedDict()
+        self._computing: Dict[Hashable, threading.Lock] = {}
+        self._db: Optional[sqlite3.Connection] = None
+
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            expired = f"DELETE FROM {table} WHERE expires_at < ?"  # noqa: S608
+            self._db.execute(expired, (time.time(),))
+            self._db.commit()
+
+    def _load(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        """
+        Load an entry from the SQLite database, the lock must be held.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key of the entry.
+
+        Returns
+        -------
+        : Optional[Tuple[float, Any]]
+            The expiration time and value, if persisted.
+        """
+        if self._db is None:
+            return None
+
+        select = f"SELECT expires_at, value FROM {self.table} WHERE key = ?"  # noqa
+        row = self._db.execute(select, (json.dumps(key),)).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """
+        Get a value, if it didn't expire.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key of the value.
+
+        Returns
+        -------
+        : Optional[V]
+            The value, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key) or self._load(key)
+            if entry is None or entry[0] < time.time():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: V) -> None:
+        """
+        Store a value, evicting the least recently used ones.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key of the value.
+        value : V
+            The value to store.
+        """
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            if self._db is not None:
+                insert = f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)"  # noqa
+                values = (json.dumps(key), json.dumps(value), expires_at)
+                self._db.execute(insert, values)
+                self._trim()
+                self._db.commit()
+
+    def _trim(self) -> None:
+        """Evict the expired and the extra entries of the database, holding the lock."""
+        assert self._db is not None  # noqa: S101
+        expired = f"DELETE FROM {self.table} WHERE expires_at < ?"  # noqa: S608
+        self._db.execute(expired, (time.time(),))
+        extra = (
+            f"DELETE FROM {self.table} WHERE key NOT IN "  # noqa: S608
+            f"(SELECT key FROM {self.table} ORDER BY expires_at DESC LIMIT ?)"
+        )
+        self._db.execute(extra, (self.max_entries,))
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], V]) -> V:
+        """
+        Get a value, or compute and store it on a miss.
+
+        Concurrent calls with the same key are collapsed, only one of them computes
+        the value, and the rest get it from the cache.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key of the value.
+        compute : Callable[[], V]
+            Computes the value.
+
+        Returns
+        -------
+        : V
+            The value.
+        """
+        with self._lock:
+            computing = self._computing.setdefault(key, threading.Lock())
+
+        with computing:
+            if (value := self.get(key)) is None:
+                value = compute()
+                self.put(key, value)
+
+        with self._lock:
+            self._computing.pop(key, None)
+        return value
@@ -1,12 +1,74 @@
-"""Searches for a string on the web with search-web."""
+"""
+Searches for a string on the web with search-web.
 
+The results are cached by normalized needle, so saving a prompt again, or repeating a
+needle within it, doesn't query again. Set the `SEARCH_CACHE_DB` environment variable
+to a SQLite database path, to keep the results between restarts.
+"""
 
-import re
+
+import os
+from typing import List
 
 from duckduckgo_search import DDGS
 
+from src.libs.prompt_tokenizer import TagNode
+from src.libs.ttl_cache import TTLCache
+from src.models.literals_types_constants import (
+    SEARCH_CACHE_ENTRIES,
+    SEARCH_CACHE_TTL,
+    SEARCH_MAX_RESULTS,
+)
+
+SEARCH_CACHE: TTLCache[List[str]] = TTLCache(
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_ENTRIES,
+    path=os.getenv("SEARCH_CACHE_DB"),
+    table="web_search",
+)
+
+
+def normalize_needle(needle: str) -> str:
+    """
+    Normalize a needle, ignoring its case and whitespace.
+
+    Parameters
+    ----------
+    needle : str
+        The string to search for.
+
+    Returns
+    -------
+    : str
+        The normalized needle.
+    """
+    return " ".join(needle.casefold().split())
+
 
-def search_online(content: str) -> str:
+def _search(needle: str, max_results: int) -> List[str]:
+    """
+    Search for a string on the web.
+
+    Parameters
+    ----------
+    needle : str
+        The string to search for.
+    max_results : int
+        The maximum amount of results.
+
+    Returns
+    -------
+    : List[str]
+        The results, as markdown list items.
+    """
+    with DDGS() as ddgs:
+        return [
+            f"- [{r.get('title')}]({r.get('href')}). " + f"{r.get('body')}\n"
+            for r in ddgs.text(needle, max_results=max_results)
+        ]
+
+
+def search_online(node: TagNode) -> str:
     """
     Search for a string on Google, amazon, etc...
 
@@ -16,8 +78,8 @@ def search_online(content: str) -> str:
 
     Parameters
     ----------
-    content: str
-        The string to search for on the internet.
+    node : TagNode
+        The "search" tag, with the string to search for on the internet.
 
     Returns
     -------
@@ -25,27 +87,17 @@ def search_online(content: str) -> str:
         The results from the search, with markdown response syntax.
         to be used as a next step in the conversation.
     """
-    include_pattern = r"(\s*)(<-- *search: (.*?)(?!-->) *-->)(?!-->)"
-    content_list = content.split("\n")
-
-    for i, line in enumerate(content_list):
-        if match := re.search(include_pattern, line):
-            padding = match[1]
-            needle = match[3]
-
-            with DDGS() as ddgs:
-                results = [
-                    f"- [{r.get('title')}]({r.get('href')}). " + f"{r.get('body')}\n"
-                    for r in ddgs.text(needle, max_results=7)
-                ]
-
-            include_content = results
+    padding = node.padding
+    needle = node.argument
 
-            # Not add the padding if found
-            include_content = [padding + line for line in include_content]
+    include_content = SEARCH_CACHE.get_or_compute(
+        (normalize_needle(needle), SEARCH_MAX_RESULTS),
+        lambda: _search(needle, SEARCH_MAX_RESULTS),
+    )
 
-            code_block = [f'{padding}**Web search "{needle}" results**:\n\n']
-            code_block += [f"{padding}\n"] + include_content + [f"\n{padding}"]
-            content_list[i] = "".join(code_block)
+    # Not add the padding if found
+    include_content = [padding + line for line in include_content]
 
-    return "\n".join(content_list)
+    code_block = [f'{padding}**Web search "{needle}" results**:\n\n']
+    code_block += [f"{padding}\n"] + include_content + [f"\n{padding}"]
+    return "".join(code_block)
@@ -1,6 +1,6 @@
-"""Singleton class logger."""
-
+"""The logger of a session."""
 
+import asyncio
 from typing import Any, Callable, cast
 
 from src.models.literals_types_constants import (
@@ -12,49 +12,7 @@ from src.models.message_event import MessageEvent
 
 
 class Logger(object):
-    """Singleton class logger."""
-
-    _instance = None
-
-    def __new__(
-        cls,
-        system_message: Callable[[MessageEvent], Any],
-        debug_level: EventsErrorTypes = "warning",
-    ) -> "Logger":
-        """
-        Ensure only one instance of Logger is created (Singleton pattern).
-
-        Parameters
-        ----------
-        system_message : Callable
-            The Callable object to print the system messages.
-        debug_level : EventsErrorTypes
-            The debug level to use.
-
-        Returns
-        -------
-        Logger
-            The singleton instance of the Logger class.
-        """
-        if cls._instance is None:
-            cls._instance = super(Logger, cls).__new__(cls)
-            cls._instance.system_message = system_message
-            cls._instance.debug_level = debug_level
-        return cls._instance
-
-    @classmethod
-    def get_instance(cls) -> "Logger":  # noqa: ANN102
-        """
-        Retrieve the singleton instance of the Logger class.
-
-        Returns
-        -------
-        Logger
-            The singleton instance of the Logger class.
-        """
-        if cls._instance is None:
-            cls._instance = cls()  # pyright: ignore
-        return cls._instance
+    """The logger of a session, it also holds its block flag and turn cancel flag."""
 
     def __init__(
         self,
@@ -62,7 +20,7 @@ class Logger(object):
         debug_level: EventsErrorTypes = "warning",
     ) -> None:
         """
-        Initialize the PubSubOrchestrator.
+        Initialize the Logger.
 
         Parameters
         ----------
@@ -73,7 +31,27 @@ class Logger(object):
         """
         self.system_message = system_message
         self.debug_level = debug_level
+        self._level = DEBUG_LEVELS[cast(EventsErrorTypes, debug_level)]
         self._block = False
+        self._unblocked = asyncio.Event()
+        self._unblocked.set()
+        self._turn_cancel = asyncio.Event()
+
+    def is_enabled(self, message_type: EventsErrorTypes) -> bool:
+        """
+        Check if the messages of a type are logged, before building them.
+
+        Parameters
+        ----------
+        message_type : EventsErrorTypes
+            The type of message.
+
+        Returns
+        -------
+        : bool
+            Whether the messages of the type are logged.
+        """
+        return DEBUG_LEVELS[message_type] <= self._level
 
     async def log(
         self, msg: MessageContentType, message_type: EventsErrorTypes = "trace"
@@ -88,10 +66,7 @@ class Logger(object):
         message_type : EventsErrorTypes
             The type of message to log.
         """
-        if (
-            DEBUG_LEVELS[message_type]
-            <= DEBUG_LEVELS[cast(EventsErrorTypes, self.debug_level)]
-        ):
+        if DEBUG_LEVELS[message_type] <= self._level:
             self.system_message(
                 MessageEvent(
                     event_type="system_message",
@@ -127,3 +102,37 @@ class Logger(object):
             await self.log("Waiting for new messages", "trace")
 
         self._block = value
+        if value:
+            self._turn_cancel = asyncio.Event()  # A new turn
+            self._unblocked.clear()
+        else:
+            self._unblocked.set()
+
+    async def wait_unblocked(self) -> None:
+        """Wait until new messages are not blocked."""
+        await self._unblocked.wait()
+
+    def turn_cancel(self) -> asyncio.Event:
+        """
+        Get the cancel flag of the turn in flight, a new one per turn.
+
+        Returns
+        -------
+        : asyncio.Event
+            Set once the turn is cancelled.
+        """
+        return self._turn_cancel
+
+    def cancel_turn(self) -> bool:
+        """
+        Cancel the turn in flight, if any.
+
+        Returns
+        -------
+        : bool
+            Whether there was a turn to cancel.
+        """
+        if not self._block or self._turn_cancel.is_set():
+            return False
+        self._turn_cancel.set()
+        return True
@@ -1,5 +1,6 @@
 """The allow topics and event types."""
 
+import os
 from typing import AsyncIterator, Dict, List, Literal
 
 from langchain_core.messages.base import BaseMessage, BaseMessageChunk
@@ -18,6 +19,7 @@ MessageContentType = (
 
 TopicsLiteral = Literal[
     "ask",
+    "cancel",
     "chain",
     "print",
     "record",
@@ -26,6 +28,7 @@ TopicsLiteral = Literal[
 ]
 EventsLiteral = Literal[
     "ai_message",
+    "cancel_stream",
     "chat",
     "chat_summary",
     "human_processed_message",
@@ -48,6 +51,37 @@ DEBUG_LEVELS: Dict[EventsErrorTypes, int] = {
     "trace": 4,
     "debug": 5,
 }
+TagKindsLiteral = Literal[
+    "ask",
+    "comment",
+    "include-file",
+    "include-http",
+    "run",
+    "search",
+]
+EventBusModesLiteral = Literal[
+    "inline",
+    "queued",
+]
+IngestModesLiteral = Literal[
+    "append",
+    "whole",
+]
+QueuePoliciesLiteral = Literal[
+    "coalesce",
+    "latest",
+    "reject",
+]
+TopicOrderingLiteral = Literal[
+    "ordered",
+    "unordered",
+]
+LlmBackendsLiteral = Literal["langchain", "native"]
+WatcherBackendsLiteral = Literal[
+    "auto",
+    "inotify",
+    "watchdog",
+]
 EventsLoadingTypes = Literal[
     "loaded",
     "loading",
@@ -63,6 +97,93 @@ CONSOLE_PADDING = 1
 RESPONSE_TIMEOUT = 10
 TIMEOUT = 3000
 SUMMARIZE_EVERY = 8
+TAG_TIMEOUT = 30
+ENRICH_DEADLINE = 60
+ENRICH_WORKERS = 8
+FILE_CACHE_BYTES = 64 * 1024 * 1024
+HTTP_CACHE_DIR = os.path.expanduser("~/.cache/ollama-watchdog/http")
+HTTP_CACHE_FRESH = 300
+HTTP_POOL_HOSTS = 16
+HTTP_POOL_PER_HOST = 4
+HTTP_POOL_TIMEOUT = 3
+HTTP_MAX_BYTES = 2 * 1024 * 1024
+HTTP_MAX_CHARS = 24_000  # About 6k tokens
+# Connect timeout, and deadline of the whole request from when it's sent
+HTTP_TIMEOUT = (3, TAG_TIMEOUT)
+HTTP_READ_SIZE = 16 * 1024
+ASK_CONCURRENCY = 4
+ASK_CACHE_TTL = 3600
+ASK_CACHE_ENTRIES = 256
+SEARCH_MAX_RESULTS = 7
+SEARCH_CACHE_TTL = 24 * 3600
+SEARCH_CACHE_ENTRIES = 256
+RUN_TIMEOUT = 20
+RUN_MAX_BYTES = 64 * 1024
+RUN_CONCURRENCY = 4
+RUN_CACHE_TTL = 600
+RUN_CACHE_ENTRIES = 64
+RESPONSE_CACHE_TTL = 7 * 24 * 3600
+RESPONSE_CACHE_ENTRIES = 1024
+WATCHER_QUIET_WINDOW = 0.2
+APPEND_CHECK_WINDOW = 4096
+MMAP_THRESHOLD = 1024 * 1024
+PROMPT_QUEUE_SIZE = 4
+PROMPT_QUEUE_POLICY: QueuePoliciesLiteral = "coalesce"
+LLM_CONCURRENCY = 1
+SESSION_GLOB = "*.md"
+SESSION_OUTPUT_SUFFIX = ".out"
+SESSION_RESCAN = 2.0
+BUS_QUEUE_SIZE = 16
+BUS_UNORDERED_WORKERS = 4
+DEDUPE_WINDOW = 4096
+JOURNAL_FLUSH_INTERVAL = 0.2
+JOURNAL_BATCH = 256
+MOCK_TOKEN_DELAY = 0.3
+OLLAMA_KEEPALIVE_CONNECTIONS = 4
+WARM_KEEP_ALIVE = 1800.0
+WARM_ACTIVE_WINDOW = 3600.0
+STREAM_TRUNCATED_MARKER = "\n\n*[Truncated, the prompt changed]*"
+METRICS_PREFIX = "ollama_watchdog_"
+METRICS_HOST = "127.0.0.1"
+METRICS_DUMP_INTERVAL = 10.0
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# The options of ChatOllama that change its answers, keying the cached ones
+RESPONSE_CACHE_OPTIONS = (
+    "mirostat",
+    "mirostat_eta",
+    "mirostat_tau",
+    "num_ctx",
+    "num_predict",
+    "repeat_last_n",
+    "repeat_penalty",
+    "temperature",
+    "stop",
+    "tfs_z",
+    "top_k",
+    "top_p",
+    "format",
+    "system",
+    "template",
+)
+
+# The chat roles of Ollama, by the type of a langchain message
+OLLAMA_ROLES: Dict[str, str] = {"human": "user", "ai": "assistant", "system": "system"}
+
+# The speakers of a conversation rendered as a single prompt
+TRANSCRIPT_NAMES: Dict[str, str] = {"human": "User", "ai": "Assistant"}
+
+# The summaries of a session can be recorded in any order, the rest can't
+TOPIC_ORDERING: Dict[TopicsLiteral, TopicOrderingLiteral] = {
+    "ask": "ordered",
+    "cancel": "ordered",
+    "chain": "ordered",
+    "print": "ordered",
+    "record": "ordered",
+    "summarize": "unordered",
+    "system": "ordered",
+}
 
 LOG_STYLES: Dict[EventsErrorTypes, str] = {
     "critical": "red bold",
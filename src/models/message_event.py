@@ -1,5 +1,15 @@
-"""Represents a file change event."""
+"""
+Represents a file change event.
 
+Every log line, stream and record goes through an event, so it's kept compact: it has
+slots instead of a `__dict__`, and its creation time is a monotonic clock, only
+converted to a `datetime` when displayed. Its ID is only given when it's published, so
+the log lines, printed right away, don't hold one. While tracing, it carries the trace
+ID of its turn, set when it's published too.
+"""
+
+import itertools
+import time
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
@@ -11,8 +21,13 @@ from src.models.literals_types_constants import (
     MessageContentType,
 )
 
+next_event_id = itertools.count(1).__next__
+
+# Converts the monotonic clock to the wall clock
+_WALL_OFFSET = time.time() - time.monotonic()
+
 
-@dataclass
+@dataclass(slots=True)
 class MessageEvent:
     """
     Represents a file change event.
@@ -27,12 +42,32 @@ class MessageEvent:
         The system type of event, optional.
     contents : MessageContentType
         The contents of the file.
-    created_at : datetime
-        The time the event was created.
+    created : float
+        The monotonic time the event was created, in seconds.
+    event_id : Optional[int]
+        A unique and increasing ID, of the events published by the process. None
+        until it's published.
+    trace_id : Optional[int]
+        The ID of the turn the event belongs to, inherited from the event being
+        handled when it was published. None when not tracing.
     """
 
     event_type: EventsLiteral
     author: Optional[str] = None
     contents: Optional[MessageContentType] = None
     system_type: Optional[EventsErrorTypes | EventsLoadingTypes] = None
-    created_at: datetime = field(default_factory=datetime.now)
+    created: float = field(default_factory=time.monotonic)
+    event_id: Optional[int] = None
+    trace_id: Optional[int] = None
+
+    @property
+    def created_at(self) -> datetime:
+        """
+        Get the time the event was created.
+
+        Returns
+        -------
+        : datetime
+            The local time the event was created.
+        """
+        return datetime.fromtimestamp(self.created + _WALL_OFFSET)
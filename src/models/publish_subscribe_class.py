@@ -1,5 +1,6 @@
 """Subscriber abstract class."""
 
+import asyncio
 from abc import abstractmethod
 from typing import Any, Callable, Coroutine, List, Optional
 
@@ -17,7 +18,16 @@ PublisherCallback = Callable[
 
 
 class PublisherSubscriber:
-    """Subscriber abstract class."""
+    """
+    Subscriber abstract class.
+
+    Attributes
+    ----------
+    logger : Logger
+        The logger of the session, set by the session owning the subscriber.
+    """
+
+    logger: Logger
 
     def is_blocked(self) -> bool:
         """
@@ -28,7 +38,7 @@ class PublisherSubscriber:
         : bool
             The block value
         """
-        return Logger.get_instance().is_blocked()
+        return self.logger.is_blocked()
 
     async def block(self, value: bool) -> None:
         """
@@ -39,7 +49,33 @@ class PublisherSubscriber:
         value : bool
             The value to set.
         """
-        await Logger.get_instance().block(value)
+        await self.logger.block(value)
+
+    async def wait_unblocked(self) -> None:
+        """Wait until new messages are not blocked."""
+        await self.logger.wait_unblocked()
+
+    def turn_cancel(self) -> asyncio.Event:
+        """
+        Get the cancel flag of the turn in flight, a new one per turn.
+
+        Returns
+        -------
+        : asyncio.Event
+            Set once the turn is cancelled.
+        """
+        return self.logger.turn_cancel()
+
+    def cancel_turn(self) -> bool:
+        """
+        Cancel the turn in flight, if any.
+
+        Returns
+        -------
+        : bool
+            Whether there was a turn to cancel.
+        """
+        return self.logger.cancel_turn()
 
     async def log(
         self, msg: MessageContentType, message_type: EventsErrorTypes = "trace"
@@ -47,6 +83,10 @@ class PublisherSubscriber:
         """
         Use the logger "print" to log messages.
 
+        A message filtered out by the debug level isn't sent to the logger, but it's
+        still built by the caller: guard a formatted message on a hot path with
+        `self.logger.is_enabled`.
+
         Parameters
         ----------
         msg : MessageContentType
@@ -54,7 +94,8 @@ class PublisherSubscriber:
         message_type : EventsErrorTypes
             The type of message to log.
         """
-        await Logger.get_instance().log(msg, message_type)
+        if self.logger.is_enabled(message_type):
+            await self.logger.log(msg, message_type)
 
     @abstractmethod
     def listen(
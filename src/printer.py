@@ -18,12 +18,13 @@ Todo
 """
 import re
 import textwrap
-from typing import AsyncIterator, cast
+from typing import AsyncIterator, Optional, cast
 
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.text import Text
 
+from src.libs.metrics import METRICS
 from src.models.literals_types_constants import (
     LOG_LINE_BG,
     LOG_STYLES,
@@ -38,7 +39,7 @@ class Printer(PublisherSubscriber):
     """Print with beautiful markdown."""
 
     def __init__(
-        self, publish: PublisherCallback
+        self, publish: PublisherCallback, console: Optional[Console] = None
     ) -> None:
         """
         Construct a new Printer.
@@ -47,8 +48,10 @@ class Printer(PublisherSubscriber):
         ----------
         publish : PublisherCallback
             publish a new event to parent
+        console : Optional[Console]
+            The console to print to, the terminal by default.
         """
-        self.console = Console()
+        self.console = console or Console()
         self._buffer = ""
         self._spinId = 0
         self.spinner = [
@@ -69,6 +72,8 @@ class Printer(PublisherSubscriber):
         self._column = self.console.width
         self.publish = publish  # type: ignore[reportAttributeAccessIssue]
         self._spin_char_len = len(self.spinner[0])
+        if not self.console.is_terminal:
+            self.spinner = None  # type: ignore[assignment]
 
     def _print_spinner(self) -> None:
         """Print a loading spinner."""
@@ -80,16 +85,20 @@ class Printer(PublisherSubscriber):
         spined_msg += self.spinner[self._spinId]
 
         # Print the new message
-        print("\r" + spined_msg, end="\r")  # noqa: T201
+        print("\r" + spined_msg, end="\r", file=self.console.file)  # noqa: T201
 
     def clear_and_render(self) -> None:
         """Clear the current line and render the pending buffer."""
         if not self._buffer:
             return
 
-        print("\r" + " " * (self.console.width - 1), end="\r")  # noqa: T201
-        md = Markdown(self._buffer, code_theme="native", justify="left")
-        self.console.print(md)
+        if self.console.is_terminal:
+            print(  # noqa: T201
+                "\r" + " " * (self.console.width - 1), end="\r", file=self.console.file
+            )
+        with METRICS.timed("render_seconds"):
+            md = Markdown(self._buffer, code_theme="native", justify="left")
+            self.console.print(md)
         self._buffer = ""
         self._column = self.console.width
 
@@ -223,12 +232,13 @@ class Printer(PublisherSubscriber):
         """
         if char == "\n":
             if self.is_multiline_block():
-                self.console.print(" ", end="")
+                if self.console.is_terminal:
+                    self.console.print(" ", end="")
                 self._column -= 1
             else:
                 self.clear_and_render()
                 self._column = self.console.width
-        elif self._column > 0:
+        elif self._column > 0 and self.console.is_terminal:
             self.console.print(char, end="")
             self._column -= 1
         elif self.spinner is not None:
@@ -1,17 +1,60 @@
 """Here we will define the prompt processing."""
 
+from typing import Dict, Tuple
 
-from src.libs.ask_webllm import ask_web_llm
+from src.libs.ask_webllm import WEB_LLM, ask_web_llm
 from src.libs.bash_run import bash_run
-from src.libs.file_include import replace_include_tags
-from src.libs.http_include import get_website_content
-from src.libs.remove_comments import remove_comments
-from src.libs.web_search import search_online
-from src.models.literals_types_constants import EventsErrorTypes
+from src.libs.enricher import Enricher
+from src.libs.file_include import (
+    FILE_INCLUDE_CACHE,
+    file_fingerprint,
+    replace_include_tag,
+)
+from src.libs.http_include import (
+    HTTP_INCLUDE_CACHE,
+    get_website_content,
+    website_fingerprint,
+)
+from src.libs.metrics import METRICS
+from src.libs.prompt_tokenizer import AsyncTagHandler, TagFingerprint, TagHandler
+from src.libs.web_search import SEARCH_CACHE, search_online
+from src.models.literals_types_constants import TagKindsLiteral
 from src.models.message_event import MessageEvent
 from src.models.publish_subscribe_class import PublisherCallback, PublisherSubscriber
 
 
+def cache_counters() -> Dict[str, Tuple[int, int]]:
+    """
+    Get the hits and misses of the tags caches.
+
+    Returns
+    -------
+    : Dict[str, Tuple[int, int]]
+        The hits and misses of each cache, by name.
+    """
+    http = HTTP_INCLUDE_CACHE
+    return {
+        "File include": (FILE_INCLUDE_CACHE.hits, FILE_INCLUDE_CACHE.misses),
+        "HTTP include": (http.hits + http.revalidated, http.misses),
+        "Ask": (WEB_LLM.cache.hits, WEB_LLM.cache.misses),
+        "Search": (SEARCH_CACHE.hits, SEARCH_CACHE.misses),
+    }
+
+
+def _register_cache_gauges() -> None:
+    """Expose the hits and misses of the tags caches, as metrics."""
+    for cache in cache_counters():
+        METRICS.gauge(
+            "cache_hits", lambda name=cache: cache_counters()[name][0], cache=cache
+        )
+        METRICS.gauge(
+            "cache_misses", lambda name=cache: cache_counters()[name][1], cache=cache
+        )
+
+
+_register_cache_gauges()
+
+
 class PromptProcessor(PublisherSubscriber):
     """The prompt processor interface."""
 
@@ -32,12 +75,27 @@ class PromptProcessor(PublisherSubscriber):
         """
         self.author = author
         self.publish = publish  # type: ignore[reportAttributeAccessIssue]
+        self.handlers: Dict[TagKindsLiteral, TagHandler | AsyncTagHandler] = {
+            "ask": ask_web_llm,
+            "include-file": replace_include_tag,
+            "include-http": get_website_content,
+            "run": bash_run,
+            "search": search_online,
+        }
+        # The other tags are cached by their handlers, with their own TTL
+        self.fingerprints: Dict[TagKindsLiteral, TagFingerprint] = {
+            "include-file": file_fingerprint,
+            "include-http": website_fingerprint,
+        }
+        self.enricher = Enricher(self.handlers, self.fingerprints)
 
-    def _chain_prompt(self, prompt: str) -> str:
+    async def _chain_prompt(self, prompt: str) -> str:
         """
         Process the prompt with several chains, and enhancers.
 
-        And then saves it in the DB.
+        The prompt is tokenized once, and all of its new or changed tags are resolved
+        concurrently without blocking the event loop. Failed tags are logged as
+        warnings.
 
         Parameters
         ----------
@@ -49,14 +107,20 @@ class PromptProcessor(PublisherSubscriber):
         : str
             The enhanced and chained prompt
         """
-        prompt = remove_comments(prompt)
-        prompt = get_website_content(prompt)
-        prompt = replace_include_tags(prompt)
-        prompt = search_online(prompt)
-        prompt = bash_run(prompt)
-        prompt = ask_web_llm(prompt)
+        with METRICS.timed("enrich_seconds"):
+            prompt = await self.enricher.enrich(prompt)
+        for error in self.enricher.errors:
+            await self.log(error, "warning")
+        await self.log(f"Reused {self.enricher.reused} unchanged tags")
+
+        await self._log_caches()
         return prompt
 
+    async def _log_caches(self) -> None:
+        """Log the hits and misses of the tags caches."""
+        for name, (hits, misses) in cache_counters().items():
+            await self.log(f"{name} cache: {hits} hits, {misses} misses")
+
     async def listen(self, event: MessageEvent) -> None:
         """
         Procese the event and returns the processed event.
@@ -70,7 +134,7 @@ class PromptProcessor(PublisherSubscriber):
         if not isinstance(event.contents, str):
             return
 
-        contents = self._chain_prompt(event.contents)
+        contents = await self._chain_prompt(event.contents)
         await self.log(contents, "debug")
         await self.log('Sending a "record" event')
         await self.publish(
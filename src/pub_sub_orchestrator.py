@@ -1,14 +1,46 @@
-"""Manages subscribers and publishes messages."""
+"""
+Manages subscribers and publishes messages.
+
+The events of different topics are delivered concurrently. Within a topic, the
+"inline" bus awaits each subscriber in turn, while the "queued" bus hands the event to
+the mailbox of each subscriber (a bounded queue with its own workers) and returns, so
+a slow subscriber doesn't stall the others. The ordering of each topic is set in
+`TOPIC_ORDERING`.
+
+With a `Tracer`, each subscriber handles an event within the trace of its turn, so the
+events it publishes join the same turn, and each delivery is written as a span.
+"""
 
 import asyncio
+import functools
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, TextIO, Tuple, cast
 from uuid import uuid4
 
+from rich.console import Console
+
 from src.chatter import Chatter
+from src.libs.dedupe_window import DedupeWindow
+from src.libs.journal import Journal
+from src.libs.mailbox import Mailbox
+from src.libs.metrics import METRICS
+from src.libs.tracing import TRACE_ID, Tracer, current_trace_id
+from src.libs.ttl_cache import TTLCache
 from src.logger import Logger
-from src.models.literals_types_constants import EventsErrorTypes, TopicsLiteral
-from src.models.message_event import MessageEvent
+from src.models.literals_types_constants import (
+    PROMPT_QUEUE_POLICY,
+    PROMPT_QUEUE_SIZE,
+    TOPIC_ORDERING,
+    WATCHER_QUIET_WINDOW,
+    EventBusModesLiteral,
+    EventsErrorTypes,
+    IngestModesLiteral,
+    LlmBackendsLiteral,
+    QueuePoliciesLiteral,
+    TopicsLiteral,
+    WatcherBackendsLiteral,
+)
+from src.models.message_event import MessageEvent, next_event_id
 from src.models.publish_subscribe_class import PublisherSubscriber
 from src.printer import Printer
 from src.prompt_processor import PromptProcessor
@@ -21,10 +53,28 @@ class PubSubOrchestrator(object):
     """Manages subscribers and publishes messages."""
 
     def __init__(
-        self, prompt_file: str, model: str, debug_level: EventsErrorTypes
+        self,
+        prompt_file: str,
+        model: str,
+        debug_level: EventsErrorTypes,
+        debounce: float = WATCHER_QUIET_WINDOW,
+        watcher_backend: WatcherBackendsLiteral = "auto",
+        ingest: IngestModesLiteral = "whole",
+        queue_size: int = PROMPT_QUEUE_SIZE,
+        queue_policy: QueuePoliciesLiteral = PROMPT_QUEUE_POLICY,
+        interrupt: bool = True,
+        session_id: Optional[str] = None,
+        output: Optional[str] = None,
+        bus: EventBusModesLiteral = "inline",
+        journal: Optional[Journal] = None,
+        backend: LlmBackendsLiteral = "langchain",
+        keep_alive: Optional[float] = None,
+        reuse_context: bool = False,
+        tracer: Optional[Tracer] = None,
+        response_cache: Optional[TTLCache[str]] = None,
     ) -> None:
         """
-        Initialize the PubSubOrchestrator.
+        Initialize the PubSubOrchestrator, the session of a prompt file.
 
         Parameters
         ----------
@@ -34,34 +84,106 @@ class PubSubOrchestrator(object):
             The LLM model to use.
         debug_level : EventsErrorTypes
             The debug level to use.
+        debounce : float
+            The seconds without changes to wait, before reading the prompt file.
+        watcher_backend : WatcherBackendsLiteral
+            How to watch the prompt file, "auto" uses inotify when supported.
+        ingest : IngestModesLiteral
+            Whether to send the whole prompt file, or only the text appended to it.
+        queue_size : int
+            The maximum amount of prompts waiting for the current turn.
+        queue_policy : QueuePoliciesLiteral
+            What to do with a new prompt when the queue is full.
+        interrupt : bool
+            Whether a new prompt cancels the answer being streamed.
+        session_id : Optional[str]
+            The session to record the conversation in, a new one by default.
+        output : Optional[str]
+            The file to print the conversation to, the terminal by default.
+        bus : EventBusModesLiteral
+            Whether to await the subscribers, or queue the events to them.
+        journal : Optional[Journal]
+            The journal to append the published events to.
+        backend : LlmBackendsLiteral
+            Whether to chat with Ollama through langchain, or directly.
+        keep_alive : Optional[float]
+            The seconds Ollama keeps the model loaded after a request.
+        reuse_context : bool
+            Whether to send only the new prompt, with the context of the last answer.
+        tracer : Optional[Tracer]
+            The tracer to write the span of each delivery to.
+        response_cache : Optional[TTLCache[str]]
+            The answers of the turns asked before, shared with the other sessions.
         """
         self.filename = prompt_file
         self.user = str(os.getenv("USER"))
+        self.session_id = session_id or str(uuid4())
+        self.bus = bus
+        self.journal = journal
+        self.tracer = tracer
+        self.mailboxes: Dict[Tuple[TopicsLiteral, int], Mailbox] = {}
 
-        self.printer = Printer(self.publish)
+        self.output: Optional[TextIO] = None
+        if output is not None:
+            self.output = open(output, "a", buffering=1)
+        self.printer = Printer(
+            self.publish, console=Console(file=self.output) if self.output else None
+        )
         self.logger = Logger(
             system_message=self.printer.system_message, debug_level=debug_level
         )
 
-        self.chatter = Chatter(self.publish, model=model)
+        self.chatter = Chatter(
+            self.publish,
+            model=model,
+            session_id=self.session_id,
+            backend=backend,
+            keep_alive=keep_alive,
+            reuse_context=reuse_context,
+            response_cache=response_cache,
+            interrupt=interrupt,
+        )
         self.prompt_processor = PromptProcessor(self.user, self.publish)
-        self.recorder = Recorder(str(uuid4()), "sqlite:///sqlite.db", self.publish)
-        self.summarizer = Summarizer(self.publish, model=model)
+        self.recorder = Recorder(self.session_id, "sqlite:///sqlite.db", self.publish)
+        self.summarizer = Summarizer(
+            self.publish,
+            model=model,
+            session_id=self.session_id,
+            backend=backend,
+            keep_alive=keep_alive,
+        )
         self.watcher = Watcher(
             self.filename,
             self.user,
             asyncio.get_event_loop(),
             self.publish,
+            quiet_window=debounce,
+            backend=watcher_backend,
+            ingest=ingest,
+            queue_size=queue_size,
+            queue_policy=queue_policy,
+            interrupt=interrupt,
         )
 
-        self.processed_events: set = set()  # Set to store processed event timestamps
+        self.processed_events = DedupeWindow()  # The recently processed events
         self.listeners: Dict[TopicsLiteral, list] = {
             "ask": [self.chatter],
+            "cancel": [self.chatter],
             "chain": [self.prompt_processor],
             "print": [self.printer],
             "record": [self.recorder],
             "summarize": [self.summarizer],
         }
+        for subscriber in [self.watcher, *sum(self.listeners.values(), [])]:
+            subscriber.logger = self.logger
+
+        queue = self.watcher.queue
+        for name in ("depth", "dropped", "coalesced", "rejected"):
+            METRICS.gauge(
+                f"prompt_queue_{name}",
+                lambda name=name: queue.metrics()[name],
+                session=self.session_id,
+            )
 
     def listen(
         self, topic: TopicsLiteral, subscribers: List[PublisherSubscriber]
@@ -77,6 +199,7 @@ class PubSubOrchestrator(object):
             The subscribers to add.
         """
         for subscriber in subscribers:
+            subscriber.logger = self.logger
             self.listeners[topic].append(subscriber)
 
     async def publish(
@@ -92,12 +215,135 @@ class PubSubOrchestrator(object):
         event : MessageEvent
             The event message to publish.
         """
+        if event.event_id is None:
+            event.event_id = next_event_id()
+        if self.tracer is not None and event.trace_id is None:
+            event.trace_id = current_trace_id()
+
+        fresh_topics: List[TopicsLiteral] = []
         for topic in topics:
-            event_id = f"{topic}-{event.created_at.timestamp()}"
-            if event_id not in self.processed_events:
+            if self.processed_events.add((topic, event.event_id)):
+                fresh_topics.append(topic)
+                METRICS.inc("events_total", topic=topic)
+        if self.journal is not None and fresh_topics:
+            self.journal.append(self.session_id, fresh_topics, event)
+
+        if self.bus == "queued":
+            for topic in fresh_topics:
                 for subscriber in self.listeners[topic]:
-                    await subscriber.listen(event)
-                self.processed_events.add(event_id)  # Mark event as processed
+                    await self._mailbox(topic, subscriber).put(event)
+        elif len(fresh_topics) == 1:
+            await self._deliver(fresh_topics[0], event)
+        elif fresh_topics:
+            await asyncio.gather(
+                *(self._deliver(topic, event) for topic in fresh_topics)
+            )
+
+    async def _deliver(self, topic: TopicsLiteral, event: MessageEvent) -> None:
+        """
+        Deliver an event to the subscribers of a topic, one after the other.
+
+        Parameters
+        ----------
+        topic: TopicsLiteral
+            The topic of the event.
+        event : MessageEvent
+            The event message to deliver.
+        """
+        for subscriber in self.listeners[topic]:
+            await self._listen(topic, subscriber, event)
+
+    async def _listen(
+        self, topic: TopicsLiteral, subscriber: PublisherSubscriber, event: MessageEvent
+    ) -> None:
+        """
+        Let a subscriber handle an event, within the trace of the event.
+
+        Parameters
+        ----------
+        topic: TopicsLiteral
+            The topic of the event.
+        subscriber : PublisherSubscriber
+            The subscriber.
+        event : MessageEvent
+            The event message to handle.
+        """
+        if self.tracer is None:
+            await subscriber.listen(event)
+            return
+
+        token = TRACE_ID.set(event.trace_id)
+        try:
+            lane = subscriber.__class__.__name__
+            with self.tracer.span(
+                f"{lane} {event.event_type}",
+                lane,
+                cast(int, event.trace_id),
+                topic=topic,
+                event_id=event.event_id,
+                session=self.session_id,
+            ):
+                await subscriber.listen(event)
+        finally:
+            TRACE_ID.reset(token)
+
+    def _mailbox(
+        self, topic: TopicsLiteral, subscriber: PublisherSubscriber
+    ) -> Mailbox:
+        """
+        Get the mailbox of a subscriber on a topic, starting it on first use.
+
+        Parameters
+        ----------
+        topic: TopicsLiteral
+            The topic of the events.
+        subscriber : PublisherSubscriber
+            The subscriber to deliver the events to.
+
+        Returns
+        -------
+        : Mailbox
+            The mailbox.
+        """
+        key = (topic, id(subscriber))
+        if key not in self.mailboxes:
+            mailbox = Mailbox(
+                subscriber,
+                self._on_error,
+                ordering=TOPIC_ORDERING[topic],
+                deliver=functools.partial(self._listen, topic, subscriber),
+            )
+            METRICS.gauge(
+                "mailbox_depth",
+                mailbox.queue.qsize,
+                session=self.session_id,
+                topic=topic,
+                subscriber=subscriber.__class__.__name__,
+            )
+            self.mailboxes[key] = mailbox
+        return self.mailboxes[key]
+
+    async def _on_error(
+        self, subscriber: PublisherSubscriber, event: MessageEvent, error: Exception
+    ) -> None:
+        """
+        Log a subscriber that failed on an event, and release the block of the turn.
+
+        Parameters
+        ----------
+        subscriber : PublisherSubscriber
+            The subscriber that failed.
+        event : MessageEvent
+            The event it failed on.
+        error : Exception
+            The error.
+        """
+        await self.logger.log(
+            f'{subscriber.__class__.__name__} failed on a "{event.event_type}": '
+            + repr(error),
+            "error",
+        )
+        await self.logger.block(False)
 
     async def start(self) -> None:
         """Asynchronously runs the main program."""
@@ -109,3 +355,7 @@ class PubSubOrchestrator(object):
                 await asyncio.sleep(3600)
         finally:
             observer.stop()
+            for mailbox in self.mailboxes.values():
+                mailbox.stop()
+            if self.output is not None:
+                self.output.close()
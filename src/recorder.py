@@ -1,10 +1,18 @@
-"""Record the conversation between AI and Human in a SQLite DB."""
+"""
+Record the conversation between AI and Human in a SQLite DB.
 
-from typing import Dict, cast
+The turn is released as soon as its answer is recorded. Every `SUMMARIZE_EVERY`
+messages, a summary is asked in the background, so the next prompt doesn't wait for
+it. The summaries are asked one at a time, so they're recorded in order.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Set, cast
 
 from langchain_community.chat_message_histories import SQLChatMessageHistory
 from langchain_core.messages.base import BaseMessage
 
+from src.libs.metrics import METRICS
 from src.models.literals_types_constants import (
     SUMMARIZE_EVERY,
     DatabasePrefixes,
@@ -47,6 +55,32 @@ class Recorder(PublisherSubscriber):
             )
         }
 
+        # Restored from the history, when resuming a session
+        self._last_human_processed_message: Optional[BaseMessage] = next(
+            (
+                msg
+                for msg in reversed(self.history["processed"].messages)
+                if msg.type == "human"
+            ),
+            None,
+        )
+        self._summaries = asyncio.Lock()
+        self._summarizing: Set[asyncio.Task] = set()
+
+    def _add_message(self, prefix: DatabasePrefixes, msg: BaseMessage) -> None:
+        """
+        Add a message to a history, timing the DB write.
+
+        Parameters
+        ----------
+        prefix : DatabasePrefixes
+            The history to add the message to.
+        msg : BaseMessage
+            The message.
+        """
+        with METRICS.timed("db_write_seconds", history=prefix):
+            self.history[prefix].add_message(msg)
+
     def _normalize_base_message(
         self, event: MessageEvent, msg_type: str = "human"
     ) -> BaseMessage:
@@ -80,22 +114,45 @@ class Recorder(PublisherSubscriber):
             The event containing the message.
         """
         msg = self._normalize_base_message(event, "ai")
-        self.history["processed"].add_message(msg)
-        self.history["unprocessed"].add_message(msg)
+        self._add_message("processed", msg)
+        self._add_message("unprocessed", msg)
+        await self.block(False)
 
-        if len(self.history["processed"].messages) % SUMMARIZE_EVERY != 0:
-            await self.block(False)
+        history = self.history["processed"].messages
+        if len(history) % SUMMARIZE_EVERY != 0:
             return
 
-        contents: MessageContentType = [self._last_human_processed_message, msg]
-        contents += self.history["processed"].messages[-SUMMARIZE_EVERY:]
+        contents: List[BaseMessage] = [
+            m for m in (self._last_human_processed_message, msg) if m is not None
+        ]
+        contents += history[-SUMMARIZE_EVERY:]
+        task = asyncio.ensure_future(self._summarize(event.author, contents))
+        self._summarizing.add(task)  # Referenced until done
+        task.add_done_callback(self._summarizing.discard)
 
-        await self.log('Sending a "summarize" event')
-        await self.publish(["summarize"], MessageEvent(
-            "chat_summary",
-            event.author,
-            contents=contents
-        ))
+    async def _summarize(
+        self, author: Optional[str], contents: List[BaseMessage]
+    ) -> None:
+        """
+        Ask for a summary, after the ones asked before.
+
+        Parameters
+        ----------
+        author : Optional[str]
+            The author of the last answer.
+        contents : List[BaseMessage]
+            The messages to summarize.
+        """
+        async with self._summaries:
+            await self.log('Sending a "summarize" event')
+            try:
+                await self.publish(["summarize"], MessageEvent(
+                    "chat_summary",
+                    author,
+                    contents=cast(MessageContentType, contents)
+                ))
+            except Exception as e:  # noqa: B902
+                await self.log(f"The summary failed with {e!r}", "error")
 
     async def _human_processed_message(self, event: MessageEvent) -> None:
         """
@@ -108,11 +165,16 @@ class Recorder(PublisherSubscriber):
         """
         msg = self._normalize_base_message(event)
 
+        # A turn replayed after a crash may have been recorded already
+        history = self.history["processed"].messages
+        last = history[-1] if history else None
+        if last is None or (last.type, last.content) != (msg.type, msg.content):
+            self._add_message("processed", msg)
+            history.append(msg)
         self._last_human_processed_message = msg
-        self.history["processed"].add_message(msg)
 
         contents: MessageContentType
-        contents = self.history["processed"].messages[-SUMMARIZE_EVERY:]
+        contents = history[-SUMMARIZE_EVERY:]
 
         await self.log('Sending "ask" event')
         await self.publish(["ask"], MessageEvent(
@@ -132,7 +194,7 @@ class Recorder(PublisherSubscriber):
         """
         msg = self._normalize_base_message(event)
 
-        self.history["unprocessed"].add_message(msg)
+        self._add_message("unprocessed", msg)
         await self.log('Sending ["print, "chain"] events')
         await self.publish(["print", "chain"], event)
 
@@ -146,8 +208,7 @@ class Recorder(PublisherSubscriber):
             The event containing the message.
         """
         msg = self._normalize_base_message(event, "ai")
-        self.history["processed"].add_message(msg)
-        await self.block(False)
+        self._add_message("processed", msg)
 
     async def listen(self, event: MessageEvent) -> None:
         """
@@ -158,7 +219,8 @@ class Recorder(PublisherSubscriber):
         event : MessageEvent
             The event containing the chunked response.
         """
-        await self.log(f'Recording a "{event.event_type}"')
+        if self.logger.is_enabled("trace"):
+            await self.log(f'Recording a "{event.event_type}"')
         if event.contents is None:
             await self.log(
                 "Cant record empty and None event.contents in {}" + str(
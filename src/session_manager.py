@@ -0,0 +1,143 @@
+"""
+Runs a session for each prompt file of a directory, or matching a glob.
+
+All the sessions share a single process, each with its own watcher, history, logger
+and output file. New prompt files are picked up while running.
+"""
+
+import asyncio
+import glob
+import os
+from typing import Any, Dict, List, Optional
+
+from src.logger import Logger
+from src.models.literals_types_constants import (
+    SESSION_GLOB,
+    SESSION_OUTPUT_SUFFIX,
+    SESSION_RESCAN,
+    EventsErrorTypes,
+    TopicsLiteral,
+)
+from src.models.message_event import MessageEvent
+from src.printer import Printer
+from src.pub_sub_orchestrator import PubSubOrchestrator
+
+
+class SessionManager(object):
+    """Runs a session for each prompt file of a directory, or matching a glob."""
+
+    def __init__(
+        self,
+        prompt_files: str,
+        model: str,
+        debug_level: EventsErrorTypes,
+        rescan: float = SESSION_RESCAN,
+        **session_options: Any,
+    ) -> None:
+        """
+        Initialize the SessionManager.
+
+        Parameters
+        ----------
+        prompt_files : str
+            A directory of prompt files, or a glob matching them.
+        model : str
+            The LLM model to use.
+        debug_level : EventsErrorTypes
+            The debug level to use.
+        rescan : float
+            The seconds between looking for new prompt files.
+        **session_options : Any
+            The options of each session, see `PubSubOrchestrator`.
+        """
+        self.pattern = prompt_files
+        if os.path.isdir(prompt_files):
+            self.pattern = os.path.join(prompt_files, SESSION_GLOB)
+        self.model = model
+        self.debug_level = debug_level
+        self.rescan = rescan
+        self.session_options = session_options
+        self.sessions: Dict[str, PubSubOrchestrator] = {}
+        self._tasks: List[asyncio.Task] = []
+
+        self.printer = Printer(self.publish)
+        self.logger = Logger(
+            system_message=self.printer.system_message, debug_level=debug_level
+        )
+
+    async def publish(
+        self, topics: List[TopicsLiteral], event: MessageEvent  # noqa: U100
+    ) -> Optional[MessageEvent]:
+        """
+        Publish nothing, the manager has no subscribers.
+
+        Parameters
+        ----------
+        topics: List[TopicsLiteral]
+            The topics to subscriber the event from.
+        event : MessageEvent
+            The event message to publish.
+        """
+        return None
+
+    def discover(self) -> List[str]:
+        """
+        Find the prompt files.
+
+        Returns
+        -------
+        : List[str]
+            The prompt files, without the output files of the sessions.
+        """
+        return sorted(
+            path
+            for path in glob.glob(self.pattern)
+            if os.path.isfile(path) and not path.endswith(SESSION_OUTPUT_SUFFIX)
+        )
+
+    def _open_session(self, prompt_file: str) -> PubSubOrchestrator:
+        """
+        Open the session of a prompt file.
+
+        The session is named after the absolute path of the file, so its history is
+        kept between restarts.
+
+        Parameters
+        ----------
+        prompt_file : str
+            The prompt file.
+
+        Returns
+        -------
+        : PubSubOrchestrator
+            The session.
+        """
+        session = PubSubOrchestrator(
+            prompt_file=prompt_file,
+            model=self.model,
+            debug_level=self.debug_level,
+            session_id=os.path.abspath(prompt_file),
+            output=prompt_file + SESSION_OUTPUT_SUFFIX,
+            **self.session_options,
+        )
+        self.sessions[prompt_file] = session
+        self._tasks.append(asyncio.ensure_future(session.start()))
+        return session
+
+    async def start(self) -> None:
+        """Asynchronously runs the sessions, opening new ones as files show up."""
+        await self.logger.log(f'Watching the prompt files "{self.pattern}"', "info")
+        try:
+            while True:
+                for prompt_file in self.discover():
+                    if prompt_file not in self.sessions:
+                        self._open_session(prompt_file)
+                        await self.logger.log(
+                            f'Opened a session for "{prompt_file}", its answers go to'
+                            f' "{prompt_file + SESSION_OUTPUT_SUFFIX}"',
+                            "info",
+                        )
+                await asyncio.sleep(self.rescan)
+        finally:
+            for task in self._tasks:
+                task.cancel()
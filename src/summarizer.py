@@ -1,13 +1,16 @@
 """The class that will store and summarize the history of conversations."""
 
-from typing import List, Union, cast
+from typing import List, Optional, Union, cast
 
 from langchain_community.chat_models import ChatOllama
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import BaseMessage, HumanMessage
 from langchain_core.messages.ai import AIMessage
-from langchain_core.messages import BaseMessage
 from langchain_core.messages.base import BaseMessageChunk
 
+from src.libs.fair_scheduler import LLM_SCHEDULER
+from src.libs.metrics import METRICS
+from src.libs.ollama_native import OLLAMA
+from src.models.literals_types_constants import LlmBackendsLiteral
 from src.models.message_event import MessageEvent
 from src.models.publish_subscribe_class import PublisherCallback, PublisherSubscriber
 
@@ -19,6 +22,9 @@ class Summarizer(PublisherSubscriber):
         self,
         publish: PublisherCallback,
         model: str = "mock",
+        session_id: str = "",
+        backend: LlmBackendsLiteral = "langchain",
+        keep_alive: Optional[float] = None,
     ) -> None:
         """
         Summarize with an LLM.
@@ -29,9 +35,19 @@ class Summarizer(PublisherSubscriber):
             The model to use for the LLM.
         publish : PublisherCallback
             publish a new event to parent
+        session_id : str
+            The session summarizing, to schedule it fairly with the other sessions.
+        backend : LlmBackendsLiteral
+            Whether to ask through langchain, or directly to Ollama.
+        keep_alive : Optional[float]
+            The seconds Ollama keeps the model loaded after a request, its default if
+            None.
         """
         self.model = model
-        self.llm = ChatOllama(model=model)
+        self.session_id = session_id
+        self.backend = backend
+        self.keep_alive = keep_alive
+        self.llm = ChatOllama(model=model, keep_alive=keep_alive)
         self.publish = publish  # type: ignore[reportAttributeAccessIssue]
 
     def _mock_invoke(self) -> BaseMessageChunk:
@@ -103,12 +119,24 @@ class Summarizer(PublisherSubscriber):
         )
         await self.log(summarization_prompt, "debug")
 
-        if self.model == "mock":
-            summary = self._mock_invoke()
-        else:
-            summary = self.llm.invoke(
-                self._convert_base_message(cast(List[BaseMessage], event.contents))
-            )
+        with METRICS.timed("summarize_seconds", model=self.model):
+            if self.model == "mock":
+                summary = self._mock_invoke()
+            elif self.backend == "native":
+                async with LLM_SCHEDULER.slot(self.session_id):
+                    summary = BaseMessageChunk(
+                        type="ai",
+                        content=await OLLAMA.chat(
+                            self.model, summarization_prompt, self.keep_alive
+                        ),
+                    )
+            else:
+                async with LLM_SCHEDULER.slot(self.session_id):
+                    summary = await self.llm.ainvoke(
+                        self._convert_base_message(
+                            cast(List[BaseMessage], event.contents)
+                        )
+                    )
 
         await self.log('Sending a "record" event')
         await self.publish(
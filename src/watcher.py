@@ -1,11 +1,41 @@
-"""Monitors file changes and publishes an event."""
+"""
+Monitors file changes and publishes an event.
+
+Editors emit several modify events per save (truncate, write, fsync, rename), so the
+events are coalesced: the file is only read once it's been quiet for a while, and its
+size and modification time are stable.
+
+On Linux, the file and its directory (for atomic-rename saves) are watched with
+inotify, right from the event loop. Elsewhere, a watchdog observer thread is used.
+
+In the "append" ingest mode, only the text appended since the last prompt is read and
+published. Duplicates are detected by hash, no copy of the file is kept.
+
+Prompts saved while a turn is in flight wait in a bounded queue, and are sent as soon
+as the turn finishes. With `interrupt`, a new prompt also cancels the answer being
+streamed, so its turn finishes right away.
+"""
 
 import asyncio
-from typing import Optional
+import os
+from typing import List, Optional, Tuple
 
 from watchdog.events import FileModifiedEvent, FileSystemEventHandler
 from watchdog.observers import Observer
 
+from src.libs import inotify
+from src.libs.append_reader import AppendedRegion, AppendReader, content_digest
+from src.libs.inotify import Inotify, InotifyEvent
+from src.libs.metrics import METRICS
+from src.libs.prompt_queue import PromptQueue
+from src.models.literals_types_constants import (
+    PROMPT_QUEUE_POLICY,
+    PROMPT_QUEUE_SIZE,
+    WATCHER_QUIET_WINDOW,
+    IngestModesLiteral,
+    QueuePoliciesLiteral,
+    WatcherBackendsLiteral,
+)
 from src.models.message_event import MessageEvent
 from src.models.publish_subscribe_class import PublisherCallback, PublisherSubscriber
 
@@ -20,6 +50,12 @@ class Watcher(FileSystemEventHandler, PublisherSubscriber):
         loop: asyncio.AbstractEventLoop,
         publish: PublisherCallback,
         filter_duplicated_content: Optional[bool] = True,
+        quiet_window: float = WATCHER_QUIET_WINDOW,
+        backend: WatcherBackendsLiteral = "auto",
+        ingest: IngestModesLiteral = "whole",
+        queue_size: int = PROMPT_QUEUE_SIZE,
+        queue_policy: QueuePoliciesLiteral = PROMPT_QUEUE_POLICY,
+        interrupt: bool = True,
     ) -> None:
         """
         Initialize the Watcher.
@@ -36,16 +72,156 @@ class Watcher(FileSystemEventHandler, PublisherSubscriber):
             publish a new event to parent
         filter_duplicated_content : bool, optional
             Whether to filter out events with duplicated content (default is True).
+        quiet_window : float
+            The seconds without changes to wait, before reading the file.
+        backend : WatcherBackendsLiteral
+            How to watch the file, "auto" uses inotify when supported.
+        ingest : IngestModesLiteral
+            Whether to publish the whole file, or only the text appended to it.
+        queue_size : int
+            The maximum amount of prompts waiting for the current turn.
+        queue_policy : QueuePoliciesLiteral
+            What to do with a new prompt when the queue is full.
+        interrupt : bool
+            Whether a new prompt cancels the answer being streamed.
         """
         FileSystemEventHandler.__init__(self)  # instead of super()
         self.publish = publish  # type: ignore[reportAttributeAccessIssue]
         self.filename: str = filename
         self.loop: asyncio.AbstractEventLoop = loop
         self.filter_duplicated_content = filter_duplicated_content
-        self.last_content: Optional[str] = None
+        self.last_digest: Optional[bytes] = None
+        self.ingest = ingest
+        self.interrupt = interrupt
+        self._reader = AppendReader(filename)
+        self.queue = PromptQueue(
+            queue_size,
+            queue_policy,
+            # An appended text adds to the waiting one, a whole file replaces it
+            merge=(lambda old, new: old + new) if ingest == "append" else None,
+        )
+        self._worker: Optional[asyncio.Task] = None
         self.user = author
+        self.quiet_window = quiet_window
+        self.coalesced_events = 0
+        self._pending_events = 0
+        self._first_event_at: Optional[float] = None
+        self._last_stat: Optional[Tuple[int, int]] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        if backend == "auto":
+            backend = "inotify" if inotify.is_supported() else "watchdog"
+        self.backend = backend
+        self._inotify: Optional[Inotify] = None
+        self._file_wd: Optional[int] = None
+        self._dir_wd: Optional[int] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        """
+        Get the size and modification time of the file.
+
+        Returns
+        -------
+        : Optional[Tuple[int, int]]
+            The size and modification time, or None if the file is missing.
+        """
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _schedule(self) -> None:
+        """Schedule a read of the file, once it's quiet. Runs on the event loop."""
+        self._pending_events += 1
+        if self._first_event_at is None:
+            self._first_event_at = self.loop.time()
+        self._last_stat = self._stat()
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self.loop.call_later(self.quiet_window, self._flush)
+
+    def _drop_pending(self) -> None:
+        """Drop the pending events, the file is read again on its next event."""
+        self._pending_events = 0
+        self._first_event_at = None
+        self._last_stat = None
+
+    def _flush(self) -> None:
+        """Read the file, if it was stable during the quiet window."""
+        self._timer = None
+        stat = self._stat()
+        if stat is None:
+            # Deleted or renamed away, its creation schedules a new read
+            self._drop_pending()
+            self.loop.create_task(self.log(f'"{self.filename}" is missing'))
+            return
+        if stat != self._last_stat:
+            self._last_stat = stat
+            self._timer = self.loop.call_later(self.quiet_window, self._flush)
+            return
+
+        region: Optional[AppendedRegion] = None
+        try:
+            if self.ingest == "append":
+                region = self._reader.read()
+                current_content = region.text if region else ""
+                digest = self.last_digest if region is None else region.tail
+            else:
+                with open(self.filename, "r") as file:
+                    current_content = file.read()
+                digest = content_digest(current_content.encode())
+        except OSError as e:
+            self._drop_pending()
+            self.loop.create_task(
+                self.log(f'Failed to read "{self.filename}": {e!r}', "warning")
+            )
+            return
+
+        if self._stat() != stat:  # Written while reading, wait for it to finish
+            self._timer = self.loop.call_later(self.quiet_window, self._flush)
+            return
 
-    def _on_modified(self, current_content: str) -> None:
+        events, self._pending_events = self._pending_events, 0
+        self.coalesced_events += events - 1
+        if self._first_event_at is not None:
+            METRICS.observe("debounce_seconds", self.loop.time() - self._first_event_at)
+            self._first_event_at = None
+        if self.ingest == "append" and not current_content.strip():
+            return  # Kept for the next prompt, once some text is appended
+
+        if self.filter_duplicated_content and self.last_digest == digest:
+            return
+
+        if not self.queue.put(current_content, events):
+            self.loop.create_task(
+                self.log("The prompt queue is full, the prompt was rejected", "warning")
+            )
+            return
+
+        self.last_digest = digest
+        if region is not None:
+            self._reader.commit(region)
+        if self.interrupt and self.is_blocked():
+            event_data = MessageEvent("cancel_stream", self.user)
+            self.loop.create_task(self.publish(["cancel"], event_data))
+
+    async def _drain(self) -> None:
+        """Send the queued prompts, one turn at a time."""
+        while True:
+            await self.wait_unblocked()
+            prompt = await self.queue.get()
+            METRICS.observe("queue_wait_seconds", self.queue.last_wait)
+            await self.log(
+                f"Prompt waited {self.queue.last_wait:.2f}s in the queue"
+                f" ({self.queue.depth} more waiting)"
+            )
+            try:
+                await self._on_modified(prompt.content, prompt.events)
+            except Exception as e:  # noqa: B902
+                await self.log(f"The turn failed with {e!r}", "error")
+                await self.block(False)
+
+    async def _on_modified(self, current_content: str, events: int) -> None:
         """
         Privately call when a file is modified.
 
@@ -53,30 +229,22 @@ class Watcher(FileSystemEventHandler, PublisherSubscriber):
         ----------
         current_content : str
             The content of the file.
+        events : int
+            The amount of file events coalesced into this change.
         """
-        self.last_content = current_content
         event_data = MessageEvent("human_raw_message", self.user, current_content)
-        asyncio.run_coroutine_threadsafe(
-            self.log(f'Changes detected on "{self.filename}"'),
-            self.loop,
-        )
-        asyncio.run_coroutine_threadsafe(
-            self.block(True),
-            self.loop,
-        )
-        asyncio.run_coroutine_threadsafe(
-            self.log('Sending "record" event'),
-            self.loop,
-        )
-        coroutine = self.publish(["record"], event_data)
-        asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        await self.log(f'Changes detected on "{self.filename}" ({events} events)')
+        await self.block(True)
+        await self.log('Sending "record" event')
+        await self.publish(["record"], event_data)
 
     def on_modified(self, event: FileModifiedEvent) -> None:
         """
         Call when a file is modified.
 
-        If filtering is enabled, it checks for content changes before
-        triggering the event publish.
+        The event is handed to the event loop, where the events of a save are
+        coalesced before reading the file. If filtering is enabled, it checks for
+        content changes before triggering the event publish.
 
         Parameters
         ----------
@@ -85,26 +253,68 @@ class Watcher(FileSystemEventHandler, PublisherSubscriber):
         """
         if not event.src_path.endswith(self.filename):
             return
-        with open(event.src_path, "r") as file:
-            current_content = file.read()
+        self.loop.call_soon_threadsafe(self._schedule)
 
-        if (
-            not self.filter_duplicated_content
-            or (self.last_content != current_content)
-            and not self.is_blocked()
-        ):
-            self._on_modified(current_content)
+    def _watch_file(self) -> None:
+        """Watch the file itself, it's a new inode after an atomic-rename save."""
+        try:
+            self._file_wd = self._inotify.add_watch(  # type: ignore
+                self.filename,
+                inotify.IN_MODIFY
+                | inotify.IN_CLOSE_WRITE
+                | inotify.IN_MOVE_SELF
+                | inotify.IN_DELETE_SELF,
+            )
+        except FileNotFoundError:
+            self._file_wd = None
 
-    def start_watching(self) -> Observer:  # type: ignore
+    def _on_inotify(self, events: List[InotifyEvent]) -> None:
+        """
+        Schedule a read of the file, on its inotify events. Runs on the event loop.
+
+        Parameters
+        ----------
+        events : List[InotifyEvent]
+            A batch of inotify events.
+        """
+        changed = False
+        basename = os.path.basename(self.filename)
+        for event in events:
+            if event.wd == self._dir_wd and event.name == basename:
+                self._watch_file()
+                changed = True
+            elif event.wd == self._file_wd and event.mask & inotify.IN_IGNORED:
+                self._file_wd = None
+            elif event.wd == self._file_wd:
+                changed = True
+
+        if changed:
+            self._schedule()
+
+    def start_watching(self) -> Observer | Inotify:  # type: ignore
         """
         Start the observing, and begin watching for file modifications.
 
         Returns
         -------
-        Observer
-            The observer instance that is watching the file.
+        Observer | Inotify
+            The observer or inotify instance that is watching the file.
         """
+        if self._worker is None:
+            self._worker = self.loop.create_task(self._drain())
+
+        if self.backend == "inotify":
+            self._inotify = Inotify(self.loop, self._on_inotify)
+            self._dir_wd = self._inotify.add_watch(
+                os.path.dirname(os.path.abspath(self.filename)),
+                inotify.IN_MOVED_TO | inotify.IN_CREATE,
+            )
+            self._watch_file()
+            return self._inotify
+
         observer = Observer()
-        observer.schedule(self, ".", recursive=False)
+        observer.schedule(
+            self, os.path.dirname(os.path.abspath(self.filename)), recursive=False
+        )
         observer.start()
         return observer
@@ -0,0 +1,114 @@
+"""Test the web LLM client, against a local stub of its endpoint."""
+
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+import httpx
+import pytest
+from aiohttp import web
+from openai import AsyncOpenAI
+
+from src.libs.ask_webllm import WebLlm
+
+StubTest = Callable[[WebLlm, Dict[str, Any]], Awaitable[None]]
+
+
+def run_against_stub(
+    monkeypatch: pytest.MonkeyPatch, web_llm: WebLlm, test: StubTest
+) -> Dict[str, Any]:
+    """
+    Run a test, with the client pointed to a stub of the chat completions endpoint.
+
+    The stub answers each question with itself, after a short delay, and counts the
+    requests and the most requests served at the same time.
+
+    Parameters
+    ----------
+    monkeypatch : pytest.MonkeyPatch
+        Points the client to the stub.
+    web_llm : WebLlm
+        The client to test.
+    test : StubTest
+        The test, awaited with the client and the counters of the stub.
+
+    Returns
+    -------
+    : Dict[str, Any]
+        The counters of the stub.
+    """
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+
+    async def completions(request: web.Request) -> web.Response:
+        question = (await request.json())["messages"][-1]["content"]
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        await asyncio.sleep(0.05)
+        stats["in_flight"] -= 1
+        completion = {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "stub",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": f"About {question}"},
+                }
+            ],
+        }
+        return web.json_response(text=json.dumps(completion))
+
+    async def main() -> None:
+        app = web.Application()
+        app.router.add_post("/chat/completions", completions)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        monkeypatch.setenv("LLM_BASE_URL", f"http://{host}:{port}")
+        monkeypatch.setenv("LLM_API_KEY", "stub")
+        try:
+            await test(web_llm, stats)
+        finally:
+            await web_llm.client.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+    return stats
+
+
+def test_answers_are_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A question asked again is answered from the cache."""
+
+    async def test(web_llm: WebLlm, stats: Dict[str, Any]) -> None:
+        assert await web_llm.ask("a question") == "About a question"
+        assert await web_llm.ask("  a question\n") == "About a question"
+
+    stats = run_against_stub(monkeypatch, WebLlm(), test)
+
+    assert stats["requests"] == 1
+
+
+def test_concurrency_is_bounded(monkeypatch: pytest.MonkeyPatch) -> None:
+    """No more than `concurrency` questions are asked at the same time."""
+
+    async def test(web_llm: WebLlm, stats: Dict[str, Any]) -> None:
+        # Without the pool limits, only the semaphore bounds the requests
+        web_llm._client = AsyncOpenAI(
+            api_key="stub",
+            base_url=os.environ["LLM_BASE_URL"],
+            http_client=httpx.AsyncClient(),
+        )
+        questions = [f"question {i}" for i in range(6)]
+        answers = await asyncio.gather(*map(web_llm.ask, questions))
+        assert answers == [f"About {question}" for question in questions]
+
+    stats = run_against_stub(monkeypatch, WebLlm(concurrency=2), test)
+
+    assert stats["requests"] == 6
+    assert stats["max_in_flight"] == 2
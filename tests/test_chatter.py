@@ -0,0 +1,177 @@
+"""Test the streaming of the answers, the cancellation of the turns and the cache."""
+
+import asyncio
+import contextlib
+from typing import AsyncIterator, List, cast
+
+from langchain_core.messages.base import BaseMessage, BaseMessageChunk
+
+from src.chatter import Chatter
+from src.libs.fair_scheduler import LLM_SCHEDULER
+from src.libs.metrics import METRICS
+from src.libs.ttl_cache import TTLCache
+from src.logger import Logger
+from src.models.literals_types_constants import (
+    STREAM_TRUNCATED_MARKER,
+    TopicsLiteral,
+)
+from src.models.message_event import MessageEvent
+
+
+async def publish(
+    topics: List[TopicsLiteral], event: MessageEvent  # noqa: U100
+) -> None:
+    """Drop the published events."""
+
+
+def chatter(interrupt: bool) -> Chatter:
+    """
+    Build a chatter, with a logger.
+
+    Parameters
+    ----------
+    interrupt : bool
+        Whether its answers can be cancelled.
+
+    Returns
+    -------
+    : Chatter
+        The chatter.
+    """
+    chat = Chatter(publish, interrupt=interrupt)
+    chat.logger = Logger(lambda _: None)
+    return chat
+
+
+async def tokens(
+    closed: List[bool], delay: float = 0
+) -> AsyncIterator[BaseMessageChunk]:
+    """
+    Stream ten tokens.
+
+    Parameters
+    ----------
+    closed : List[bool]
+        Set once the stream is closed, like the HTTP request of an answer.
+    delay : float
+        The seconds between tokens.
+
+    Yields
+    ------
+    : BaseMessageChunk
+        The tokens.
+    """
+    try:
+        for i in range(10):
+            await asyncio.sleep(delay)
+            yield BaseMessageChunk(type="ai", content=f"{i} ")
+    finally:
+        closed.append(True)
+
+
+def test_an_answer_is_relayed_whole() -> None:
+    """Without a cancel, all the tokens are relayed, interruptible or not."""
+    for interrupt in (True, False):
+        closed: List[bool] = []
+
+        async def main() -> List[str]:
+            chat = chatter(interrupt)
+            relayed = chat._scheduled(tokens(closed))
+            return [str(chunk.content) async for chunk in relayed]
+
+        assert "".join(asyncio.run(main())) == "0 1 2 3 4 5 6 7 8 9 "
+        assert closed == [True]
+
+
+def test_a_cancelled_answer_is_truncated() -> None:
+    """A cancel closes the stream, and marks the answer as truncated."""
+    closed: List[bool] = []
+
+    async def main() -> List[str]:
+        chat = chatter(True)
+        await chat.block(True)  # The turn starts
+        chunks = []
+        async for chunk in chat._scheduled(tokens(closed, delay=0.01)):
+            chunks.append(str(chunk.content))
+            if len(chunks) == 3:
+                assert chat.cancel_stream()
+        assert not chat.cancel_stream()
+        assert chat.cancelled == 1
+        return chunks
+
+    chunks = asyncio.run(main())
+
+    assert chunks == ["0 ", "1 ", "2 ", STREAM_TRUNCATED_MARKER]
+    assert closed == [True]
+
+
+def test_a_turn_cancelled_before_its_answer_isnt_asked() -> None:
+    """A turn cancelled while enriching or recording, gets only the marker."""
+    closed: List[bool] = []
+
+    async def main() -> List[str]:
+        chat = chatter(True)
+        await chat.block(True)
+        interrupt = chat.turn_cancel()
+        assert chat.cancel_stream()
+        relayed = chat._scheduled(tokens(closed), interrupt=interrupt)
+        return [str(chunk.content) async for chunk in relayed]
+
+    assert asyncio.run(main()) == [STREAM_TRUNCATED_MARKER]
+    assert closed == []  # Never asked
+
+
+def test_a_turn_cancelled_waiting_for_a_slot_gives_it_up() -> None:
+    """A turn cancelled while the LLM slots are busy doesn't wait for one."""
+    closed: List[bool] = []
+
+    async def main() -> List[str]:
+        chat = chatter(True)
+        await chat.block(True)
+        async with contextlib.AsyncExitStack() as busy:
+            for _ in range(LLM_SCHEDULER.concurrency):
+                await busy.enter_async_context(LLM_SCHEDULER.slot("other"))
+
+            async def relay() -> List[str]:
+                relayed = chat._scheduled(tokens(closed))
+                return [str(chunk.content) async for chunk in relayed]
+
+            relaying = asyncio.ensure_future(relay())
+            await asyncio.sleep(0.01)
+            assert LLM_SCHEDULER.waiting == 1
+            assert chat.cancel_stream()
+            chunks = await asyncio.wait_for(relaying, 1)
+            assert LLM_SCHEDULER.waiting == 0
+        return chunks
+
+    assert asyncio.run(main()) == [STREAM_TRUNCATED_MARKER]
+    assert closed == []
+
+
+def test_a_turn_asked_before_is_replayed() -> None:
+    """A cached answer is replayed, and the hits and misses are counted."""
+    answers: List[str] = []
+
+    async def printer(topics: List[TopicsLiteral], event: MessageEvent) -> None:
+        """Read the streamed answers, like the printer."""
+        stream = cast(AsyncIterator[BaseMessageChunk], event.contents)
+        answers.append("".join([str(chunk.content) async for chunk in stream]))
+
+    async def main() -> None:
+        chat = Chatter(printer, response_cache=TTLCache(60, 10))
+        chat.logger = Logger(lambda _: None)
+        chat.mock_delay = 0
+        for prompt in ("Hello", "Hello  \n"):
+            messages = [BaseMessage(type="human", content=prompt)]
+            await chat.listen(MessageEvent("human_message", "user", messages))
+
+    def count(outcome: str) -> float:
+        """Read the cache counter of the mock model."""
+        series = METRICS.counters.get(f"llm_response_cache_{outcome}_total", {})
+        return series.get((("model", "mock"),), 0)
+
+    hits, misses = count("hits"), count("misses")
+    asyncio.run(main())
+
+    assert answers == ["hola mundo.", "hola mundo."]
+    assert (count("hits") - hits, count("misses") - misses) == (1, 1)
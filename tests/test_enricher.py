@@ -0,0 +1,36 @@
+"""Test the concurrent resolution, and the memo, of the prompt tags."""
+
+import asyncio
+from typing import List
+
+from src.libs.enricher import Enricher
+from src.libs.prompt_tokenizer import TagNode
+
+PROMPT = """Hello
+<-- include: file://notes.txt -->
+<-- search: a needle -->"""
+
+
+def test_only_fingerprinted_tags_are_memoized() -> None:
+    """A tag without fingerprint reaches its handler, and its cache, every time."""
+    resolved: List[str] = []
+    version = ["v1"]
+
+    def handler(node: TagNode) -> str:
+        resolved.append(node.kind)
+        return f"{node.kind} {node.argument} {version[0]}"
+
+    enricher = Enricher(
+        {"include-file": handler, "search": handler},
+        fingerprints={"include-file": lambda node: version[0]},
+    )
+
+    first = asyncio.run(enricher.enrich(PROMPT))
+    second = asyncio.run(enricher.enrich(PROMPT))
+    version[0] = "v2"
+    third = asyncio.run(enricher.enrich(PROMPT))
+
+    assert first == second == "Hello\ninclude-file notes.txt v1\nsearch a needle v1"
+    assert third == "Hello\ninclude-file notes.txt v2\nsearch a needle v2"
+    assert (resolved.count("include-file"), resolved.count("search")) == (2, 3)
+    assert enricher.reused == 0
@@ -0,0 +1,161 @@
+"""Test the websites cache, against a local stub server."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pytest
+import requests
+
+from src.libs import http_include
+from src.libs.http_include import HttpIncludeCache, extract_text, read_capped
+
+PAGE = b"""<html><body>
+<nav>Home | About</nav>
+<main><h1>Title</h1><p>The main content.</p></main>
+<script>var tracking = true;</script>
+<footer>Copyright</footer>
+</body></html>"""
+ETAG = '"v1"'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serve a page with an ETag, a large body, and a body trickling in."""
+
+    requests: List[Dict[str, str]] = []
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Answer the request, with a 304 when the ETag matches."""
+        self.requests.append(dict(self.headers))
+        if self.path == "/slow":
+            self.trickle()
+            return
+        if self.path == "/large":
+            body = b"x" * 1024 * 1024
+        elif self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        else:
+            body = PAGE
+
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def trickle(self) -> None:
+        """Send a body a byte every 0.1s, until the client hangs up."""
+        self.send_response(200)
+        self.send_header("Content-Length", "50")
+        self.end_headers()
+        try:
+            for _ in range(50):
+                self.wfile.write(b"x")
+                self.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass
+
+    def log_message(self, *args: object) -> None:
+        """Keep the test output quiet."""
+
+
+@pytest.fixture
+def server() -> Iterator[str]:
+    """
+    Serve the stub on a free local port.
+
+    Yields
+    ------
+    : str
+        The base url of the stub.
+    """
+    StubHandler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_revalidates_with_the_etag(server: str, tmp_path: Path) -> None:
+    """A stale website is revalidated, and a 304 reuses its cached text."""
+    cache = HttpIncludeCache(directory=str(tmp_path), fresh_for=0)
+
+    first = cache.fetch(f"{server}/page")
+    second = cache.fetch(f"{server}/page")
+
+    assert "The main content." in first
+    assert second == first
+    assert (cache.misses, cache.revalidated, cache.hits) == (1, 1, 0)
+    assert "If-None-Match" not in StubHandler.requests[0]
+    assert StubHandler.requests[1]["If-None-Match"] == ETAG
+
+
+def test_fetch_uses_a_fresh_website(server: str, tmp_path: Path) -> None:
+    """A fresh website is neither fetched nor revalidated, even after a restart."""
+    HttpIncludeCache(directory=str(tmp_path)).fetch(f"{server}/page")
+    cache = HttpIncludeCache(directory=str(tmp_path))
+
+    assert "The main content." in cache.fetch(f"{server}/page")
+    assert cache.hits == 1
+    assert cache.validator(f"{server}/page") == ETAG
+    assert len(StubHandler.requests) == 1
+
+
+def test_read_capped_truncates_the_body(server: str) -> None:
+    """Only the first bytes of a large body are read."""
+    session = http_include.pooled_session()
+    response = session.get(f"{server}/large", stream=True, timeout=5)
+
+    assert len(read_capped(response, 1000)) == 1000
+
+
+def test_fetch_caps_the_text(server: str, tmp_path: Path) -> None:
+    """The extracted text is truncated, and marked so."""
+    cache = HttpIncludeCache(directory=str(tmp_path), max_bytes=4096, max_chars=100)
+
+    text = cache.fetch(f"{server}/large")
+
+    assert text == "x" * 100 + "\n[...]"
+
+
+@pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+def test_extract_text_drops_the_boilerplate(
+    monkeypatch: pytest.MonkeyPatch, parser: str
+) -> None:
+    """The main content is kept, with or without lxml."""
+    if parser == "lxml":
+        pytest.importorskip("lxml")
+    monkeypatch.setattr(http_include, "HTML_PARSER", parser)
+
+    text = extract_text(PAGE, 1000)
+
+    assert text == "Title\nThe main content."
+
+
+def test_fetch_gives_up_on_a_slow_website(server: str, tmp_path: Path) -> None:
+    """A body trickling in is cut at the deadline, from when the request was sent."""
+    cache = HttpIncludeCache(directory=str(tmp_path), timeout=(1, 0.5))
+
+    started = time.monotonic()
+    text = cache.fetch(f"{server}/slow")
+
+    assert time.monotonic() - started < 1
+    assert 0 < len(text) < 10
+
+
+def test_the_pool_wait_is_bounded(monkeypatch: pytest.MonkeyPatch, server: str) -> None:
+    """A request waiting for a busy host fails, instead of blocking its worker."""
+    monkeypatch.setattr(http_include, "HTTP_POOL_TIMEOUT", 0.2)
+    session = http_include.pooled_session(pool_per_host=1)
+    busy = session.get(f"{server}/slow", stream=True, timeout=5)
+
+    with pytest.raises(requests.ConnectionError):
+        session.get(f"{server}/page", timeout=5)
+    busy.close()
@@ -0,0 +1,54 @@
+"""Test the journal of the published events."""
+
+import asyncio
+from pathlib import Path
+
+from src.libs.journal import Journal, decode_event, read_journal
+from src.models.message_event import MessageEvent
+
+
+def test_events_round_trip(tmp_path: Path) -> None:
+    """A journaled event is read back as an equivalent event."""
+    path = str(tmp_path / "events.jsonl")
+
+    async def main() -> None:
+        events = Journal(path)
+        events.append(
+            "session", ["record"], MessageEvent("human_raw_message", "me", "Hi")
+        )
+        events.close()
+
+    asyncio.run(main())
+
+    (record,) = read_journal(path)
+    event = decode_event(record)
+    assert record["session"] == "session"
+    assert record["topics"] == ["record"]
+    assert (event.event_type, event.author, event.contents) == (
+        "human_raw_message",
+        "me",
+        "Hi",
+    )
+
+
+def test_a_write_in_flight_outlives_close(tmp_path: Path) -> None:
+    """A batch written after the journal was closed, by a flush in flight, is kept."""
+    path = str(tmp_path / "events.jsonl")
+
+    async def main() -> None:
+        events = Journal(path)
+        events.append(
+            "session", ["record"], MessageEvent("human_raw_message", "me", "1")
+        )
+        # A flush hands the first batch to a thread, that gets the lock after close
+        lines, events._pending = events._pending, []
+        events._in_flight.append(lines)
+        events.append(
+            "session", ["record"], MessageEvent("human_raw_message", "me", "2")
+        )
+        events.close()
+        await asyncio.get_running_loop().run_in_executor(None, events._write, lines)
+
+    asyncio.run(main())
+
+    assert [record["contents"] for record in read_journal(path)] == ["1", "2"]
@@ -0,0 +1,62 @@
+"""Test the recording of the turns, and of their summaries."""
+
+import asyncio
+from pathlib import Path
+from typing import List
+
+from langchain_core.messages.base import BaseMessage
+
+from src.logger import Logger
+from src.models.literals_types_constants import SUMMARIZE_EVERY, TopicsLiteral
+from src.models.message_event import MessageEvent
+from src.recorder import Recorder
+
+
+def test_a_slow_summary_doesnt_hold_the_turn(tmp_path: Path) -> None:
+    """The turn is released once its answer is recorded, the summary comes later."""
+    released = asyncio.Event()
+
+    async def publish(topics: List[TopicsLiteral], event: MessageEvent) -> None:
+        """Summarize once released, like a slow LLM."""
+        if "summarize" in topics:
+            await released.wait()
+            await recorder.listen(MessageEvent("chat_summary", "mock", "A summary"))
+
+    recorder = Recorder("test", f"sqlite:///{tmp_path / 'db.sqlite'}", publish)
+    recorder.logger = Logger(lambda _: None)
+    for i in range(SUMMARIZE_EVERY - 1):
+        recorder._add_message("processed", BaseMessage(type="human", content=str(i)))
+
+    async def main() -> List[str]:
+        await recorder.block(True)
+        await recorder.listen(MessageEvent("ai_message", "mock", "An answer"))
+        assert not recorder.is_blocked()
+        assert len(recorder._summarizing) == 1
+
+        released.set()
+        await asyncio.gather(*recorder._summarizing)
+        return [str(m.content) for m in recorder.history["processed"].messages]
+
+    assert asyncio.run(main())[-2:] == ["An answer", "A summary"]
+
+
+def test_the_summaries_are_asked_in_order(tmp_path: Path) -> None:
+    """A summary is only asked once the one before was recorded."""
+    steps: List[str] = []
+
+    async def publish(topics: List[TopicsLiteral], event: MessageEvent) -> None:
+        """Summarize slowly, noting when each summary starts and ends."""
+        name = str(event.author)
+        steps.append(f"{name} started")
+        await asyncio.sleep(0.01)
+        steps.append(f"{name} recorded")
+
+    recorder = Recorder("test", f"sqlite:///{tmp_path / 'db.sqlite'}", publish)
+    recorder.logger = Logger(lambda _: None)
+
+    async def main() -> None:
+        await asyncio.gather(recorder._summarize("1", []), recorder._summarize("2", []))
+
+    asyncio.run(main())
+
+    assert steps == ["1 started", "1 recorded", "2 started", "2 recorded"]
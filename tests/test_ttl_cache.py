@@ -0,0 +1,104 @@
+"""Test the expiring cache, in memory and on SQLite."""
+
+import sqlite3
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from src.libs import ttl_cache
+from src.libs.ttl_cache import TTLCache
+
+
+class Clock(object):
+    """A clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        """Start the clock."""
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        """
+        Get the current time.
+
+        Returns
+        -------
+        : float
+            The time, as a timestamp.
+        """
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    """
+    Freeze the time of the cache.
+
+    Returns
+    -------
+    : Clock
+        The clock of the cache.
+    """
+    clock = Clock()
+    monkeypatch.setattr(ttl_cache.time, "time", clock.time)
+    return clock
+
+
+def test_get_or_compute_computes_once() -> None:
+    """A miss computes the value, a hit reuses it."""
+    cache: TTLCache[str] = TTLCache(60, 8)
+    computed: List[str] = []
+
+    def compute() -> str:
+        computed.append("value")
+        return "value"
+
+    assert cache.get_or_compute("key", compute) == "value"
+    assert cache.get_or_compute("key", compute) == "value"
+    assert computed == ["value"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire(clock: Clock) -> None:
+    """An entry is a miss once its TTL elapsed."""
+    cache: TTLCache[str] = TTLCache(60, 8)
+    cache.put("key", "value")
+
+    clock.now += 59
+    assert cache.get("key") == "value"
+    clock.now += 2
+    assert cache.get("key") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_are_evicted() -> None:
+    """The memory holds up to `max_entries`, evicting the least recently used."""
+    cache: TTLCache[int] = TTLCache(60, 2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_sqlite_survives_restarts(tmp_path: Path) -> None:
+    """The persisted entries are read by another cache on the same database."""
+    path = str(tmp_path / "cache.db")
+    TTLCache(60, 8, path=path).put("key", ["a", "value"])
+
+    assert TTLCache(60, 8, path=path).get("key") == ["a", "value"]
+
+
+def test_sqlite_is_trimmed(tmp_path: Path, clock: Clock) -> None:
+    """The database drops the expired entries, then holds up to `max_entries`."""
+    path = str(tmp_path / "cache.db")
+    cache: TTLCache[str] = TTLCache(60, 3, path=path, table="trimmed")
+    cache.put("expired", "value")
+    clock.now += 61
+    for key in "abcd":
+        clock.now += 1
+        cache.put(key, "value")
+
+    rows = sqlite3.connect(path).execute("SELECT key FROM trimmed ORDER BY key")
+    assert [row[0] for row in rows] == ['"b"', '"c"', '"d"']
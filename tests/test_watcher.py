@@ -0,0 +1,85 @@
+"""Test the debounced reads of the prompt file."""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import List
+
+from src.logger import Logger
+from src.models.literals_types_constants import TopicsLiteral
+from src.models.message_event import MessageEvent
+from src.watcher import Watcher
+
+QUIET_WINDOW = 0.02
+
+
+async def watch(path: Path, messages: List[MessageEvent]) -> Watcher:
+    """
+    Build a watcher of a file, driven by hand instead of by file events.
+
+    Parameters
+    ----------
+    path : Path
+        The prompt file.
+    messages : List[MessageEvent]
+        Collects the logged messages.
+
+    Returns
+    -------
+    : Watcher
+        The watcher.
+    """
+
+    async def publish(topics: List[TopicsLiteral], event: MessageEvent) -> None:
+        """Drop the published events."""
+
+    watcher = Watcher(
+        str(path),
+        "user",
+        asyncio.get_running_loop(),
+        publish,
+        quiet_window=QUIET_WINDOW,
+    )
+    watcher.logger = Logger(messages.append, debug_level="trace")
+    return watcher
+
+
+def test_a_missing_file_drops_the_pending_events(tmp_path: Path) -> None:
+    """A file deleted during the quiet window isn't polled until it's back."""
+    path = tmp_path / "prompt.md"
+    messages: List[MessageEvent] = []
+
+    async def main() -> Watcher:
+        watcher = await watch(path, messages)
+        path.write_text("A prompt")
+        watcher._schedule()
+        os.remove(path)
+        await asyncio.sleep(QUIET_WINDOW * 5)
+        return watcher
+
+    watcher = asyncio.run(main())
+
+    assert watcher._timer is None
+    assert watcher._pending_events == 0
+    assert watcher.queue.depth == 0
+    assert [message.contents for message in messages] == [f'"{path}" is missing']
+
+
+def test_a_failed_read_is_logged(tmp_path: Path) -> None:
+    """A file that can't be read is skipped, with a warning."""
+    path = tmp_path / "prompt.md"
+    path.mkdir()
+    messages: List[MessageEvent] = []
+
+    async def main() -> Watcher:
+        watcher = await watch(path, messages)
+        watcher._schedule()
+        await asyncio.sleep(QUIET_WINDOW * 5)
+        return watcher
+
+    watcher = asyncio.run(main())
+
+    assert watcher._timer is None
+    assert watcher.queue.depth == 0
+    assert [message.system_type for message in messages] == ["warning"]
+    assert "IsADirectoryError" in str(messages[0].contents)